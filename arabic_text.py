@@ -0,0 +1,50 @@
+"""Arabic-aware normalization and tokenization for the search indexes.
+
+The transcripts are dialect speech-to-text output, so the same word shows up
+with different spellings ("المضاضه" / "المضادة", "أمينية" / "امينية").
+Normalizing both the transcripts and the questions the same way lets them
+match:
+
+- diacritics (harakat, shadda, sukun, superscript alef) and tatweel are removed
+- alef variants (أ إ آ ٱ) become ا
+- taa marbuta (ة) becomes ه and alef maqsura (ى) becomes ي
+- hamza carriers (ؤ ئ) become و ي
+- consonants the Egyptian speech-to-text mixes up are folded together
+  (ض -> د, ذ -> ز, ظ -> ز), so "الضقيقة" matches "الدقيقة"
+- the definite article and its common prefixes (ال، وال، بال، فال، كال، لل)
+  are stripped from words long enough to keep a stem
+- Latin text is lowercased
+"""
+import re
+
+DIACRITICS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]')
+TATWEEL = '\u0640'
+CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+    'ؤ': 'و', 'ئ': 'ي',
+    'ض': 'د', 'ذ': 'ز', 'ظ': 'ز',
+})
+TOKEN_PATTERN = re.compile(r'\w+')
+ARTICLE_PREFIXES = ('وال', 'بال', 'فال', 'كال', 'لل', 'ال')
+MIN_STEM_LENGTH = 3
+
+
+def normalize_arabic(text: str) -> str:
+    """Normalize spelling variants so dialect and formal spellings compare equal"""
+    text = DIACRITICS.sub('', text).replace(TATWEEL, '')
+    return text.translate(CHAR_MAP).lower()
+
+
+def strip_article(token: str) -> str:
+    """Drop a leading definite article if a stem of MIN_STEM_LENGTH remains"""
+    for prefix in ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= MIN_STEM_LENGTH:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Normalized word tokens, in order"""
+    return [strip_article(token) for token in TOKEN_PATTERN.findall(normalize_arabic(text))]
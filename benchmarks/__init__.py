@@ -0,0 +1 @@
+"""Benchmarks for the retrieval code (run with `python -m benchmarks.<name>`)"""
@@ -0,0 +1,100 @@
+"""Per-session chat memory over a long conversation: full message list vs Conversation
+
+    python -m benchmarks.bench_conversation
+    python -m benchmarks.bench_conversation --turns 5000 --visible 40
+
+Answers ``--turns`` labelled questions (suffixed so that each one misses the
+query cache; every fifth is a follow-up such as "اشرح أكثر") and stores
+each exchange twice: the way the app used to (every message, answers with
+their full source results) and in a Conversation.  At checkpoints prints the
+pickled size of both, i.e. what a session holds, and how many messages a
+rerun renders.  Conversation memory must stop growing once its window and
+summary are full.  The run fails (exit status 1) when, after any turn, the
+window holds more than ``--visible`` messages, the summary is over its
+budget, a standalone question gained more than TOPIC_WORDS words, or the
+session size grew by more than ``--max-growth`` from turn 100 on.
+"""
+import argparse
+import pickle
+import sys
+
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.load_web_search import FIXTURES
+from conversation import SUMMARY_BUDGET, TOPIC_WORDS, VISIBLE_TURNS, Conversation
+from engine import VideoChatEngine
+from web_search import FixtureBackend
+
+FOLLOW_UPS = ["اشرح أكثر", "ليه؟", "why is it important?", "explain more"]
+CHECKPOINTS = (10, 100, 250, 500, 1000, 2500, 5000, 10000)
+# The window and summary are full well before this exchange
+STEADY_FROM = 100
+
+
+def bound_violations(conversation: Conversation, prompt: str, query: str) -> list:
+    """What is over its bound after one exchange"""
+    problems = []
+    if len(conversation.messages) > conversation.visible_turns:
+        problems.append(f"{len(conversation.messages)} messages in the window")
+    summary_chars = sum(len(line) for line in conversation.summary)
+    # One line is always kept, even if it alone is over the budget
+    if summary_chars > conversation.summary_budget and len(conversation.summary) > 1:
+        problems.append(f"summary of {summary_chars} characters")
+    if len(query.split()) > len(prompt.split()) + TOPIC_WORDS:
+        problems.append(f"standalone question of {len(query.split())} words")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000, help="question/answer exchanges")
+    parser.add_argument("--visible", type=int, default=VISIBLE_TURNS, help="messages kept in full")
+    parser.add_argument("--summary-budget", type=int, default=SUMMARY_BUDGET, help="characters of summary")
+    parser.add_argument("--max-growth", type=float, default=0.10,
+                        help=f"session size growth allowed from turn {STEADY_FROM} on")
+    args = parser.parse_args()
+
+    engine = VideoChatEngine(web_backend=FixtureBackend(FIXTURES))
+    questions = [q["question"] for q in load_queries()]
+    messages = []
+    conversation = Conversation(args.visible, args.summary_budget)
+    sizes = {}
+    failures = []
+
+    print(f"{'turns':>7} {'message list':>14} {'conversation':>14} {'rendered':>10}")
+    for turn in range(1, args.turns + 1):
+        if turn % 5 == 0:
+            prompt = FOLLOW_UPS[turn // 5 % len(FOLLOW_UPS)]
+        else:
+            prompt = f"{questions[turn % len(questions)]} {turn}"
+        query = conversation.standalone_question(prompt)
+        answer = engine.answer(query)
+
+        messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "assistant", "content": answer["content"], "source": answer["source"],
+                         "sources": answer["sources"], "timings": answer["timings"]})
+        conversation.add_user(prompt, query)
+        conversation.add_assistant(answer["content"], answer["source"], answer["sources"], answer["timings"])
+        failures += [f"turn {turn}: {problem}" for problem in bound_violations(conversation, prompt, query)]
+
+        if turn in CHECKPOINTS or turn == args.turns:
+            sizes[turn] = len(pickle.dumps(conversation))
+            print(f"{turn:>7} {len(pickle.dumps(messages)) / 1024:>12.1f}KB {sizes[turn] / 1024:>12.1f}KB "
+                  f"{len(conversation.messages):>10}")
+
+    steady = [size for turn, size in sizes.items() if turn >= STEADY_FROM]
+    if len(steady) > 1:
+        growth = max(steady) / min(steady) - 1
+        print(f"conversation size from turn {STEADY_FROM} on: {min(steady) / 1024:.1f}-{max(steady) / 1024:.1f} KB "
+              f"({growth:+.0%}), {'flat' if growth <= args.max_growth else 'GROWING'}")
+        if growth > args.max_growth:
+            failures.append(f"session size grew {growth:.0%} from turn {STEADY_FROM} on")
+
+    for failure in failures[:20]:
+        print(f"❌ {failure}")
+    if failures:
+        print(f"{len(failures)} bound violations")
+        sys.exit(1)
+    print("✅ window, summary, standalone questions and session size stayed bounded")
+
+if __name__ == "__main__":
+    main()
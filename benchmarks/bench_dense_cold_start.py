@@ -0,0 +1,83 @@
+"""Cold start of dense retrieval: dense_index/ (NumPy + mmap) vs LangChain FAISS.load_local
+
+    python dense_index.py convert
+    python -m benchmarks.bench_dense_cold_start
+    python -m benchmarks.bench_dense_cold_start --langchain-python /path/to/venv/bin/python
+
+Each run is a fresh interpreter that imports its libraries, loads the index
+and answers one query.  The query is a stored vector, so neither side needs
+the Ollama server.  The LangChain side needs an interpreter with
+langchain-community and faiss-cpu installed (``--langchain-python``); it is
+skipped when they are missing.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from dense_index import DENSE_FOLDER, FAISS_FOLDER
+
+DENSE_CHILD = f"""
+import time, json
+start = time.perf_counter()
+import numpy as np
+from dense_index import DenseIndex
+imported = time.perf_counter()
+index = DenseIndex.load({DENSE_FOLDER!r})
+loaded = time.perf_counter()
+query = np.asarray(index.vectors[0])
+top = np.argsort(-(index.vectors @ query))[:3]
+done = time.perf_counter()
+print(json.dumps([imported - start, loaded - imported, done - loaded]))
+"""
+
+LANGCHAIN_CHILD = f"""
+import time, json
+start = time.perf_counter()
+from langchain_community.vectorstores import FAISS
+imported = time.perf_counter()
+store = FAISS.load_local({FAISS_FOLDER!r}, None, allow_dangerous_deserialization=True)
+loaded = time.perf_counter()
+query = store.index.reconstruct(0)
+store.similarity_search_with_score_by_vector(query, k=3)
+done = time.perf_counter()
+print(json.dumps([imported - start, loaded - imported, done - loaded]))
+"""
+
+
+def run(python: str, code: str, repeats: int):
+    """Median wall time and (import, load, query) seconds over fresh processes, or None"""
+    walls, stages = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run([python, "-W", "ignore", "-c", code], capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        stages.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    medians = [statistics.median(s[i] for s in stages) for i in range(3)]
+    return (statistics.median(walls), medians), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--langchain-python", default=sys.executable,
+                        help="interpreter with langchain-community and faiss-cpu")
+    args = parser.parse_args()
+
+    print(f"{'':>16} {'process':>9} {'import':>9} {'load':>9} {'query':>9}")
+    for name, python, code in (("dense_index", sys.executable, DENSE_CHILD),
+                               ("langchain+faiss", args.langchain_python, LANGCHAIN_CHILD)):
+        result, error = run(python, code, args.repeats)
+        if result is None:
+            print(f"{name:>16}  skipped: {error}")
+            continue
+        wall, (imported, loaded, query) = result
+        print(f"{name:>16} {wall * 1000:>7.0f}ms {imported * 1000:>7.0f}ms "
+              f"{loaded * 1000:>7.1f}ms {query * 1000:>7.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Answer-vs-fallback decisions of the hybrid ranker against the single-index modes
+
+    python -m benchmarks.bench_hybrid
+    python -m benchmarks.bench_hybrid --calibrate
+
+On-topic questions are the labelled ones in benchmarks/queries.json; a
+"needless fallback" is one of them getting no transcript result (so the app
+would wait for the web).  Off-topic questions (benchmarks/off_topic.json)
+should fall back; a "wrong answer" is one answered from the video instead.
+--calibrate prints, per lexical weight, the threshold that gets the most of
+these decisions right.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.corpus import load_bundled_transcriptions
+from dense_index import DenseIndex, best_threshold
+from hybrid_search import HybridRanker
+from transcript_index import TfidfIndex
+
+OFF_TOPIC_FILE = os.path.join(os.path.dirname(__file__), "off_topic.json")
+
+
+def load_off_topic(path: str = OFF_TOPIC_FILE) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def decisions(search, queries: list, off_topic: list) -> dict:
+    """Hit rate, needless fallbacks, wrong answers and latency of one search function"""
+    hits, needless, wrong, latencies = 0, 0, 0, []
+    for q in queries:
+        start = time.perf_counter()
+        results = search(q["question"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        needless += not results
+        hits += any(r["metadata"]["source"] in q["relevant"] for r in results)
+    for question in off_topic:
+        start = time.perf_counter()
+        wrong += bool(search(question))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"hit_rate": hits / len(queries), "needless": needless, "wrong": wrong,
+            "p50_ms": statistics.median(latencies)}
+
+
+def calibrate(tfidf, dense, queries: list, off_topic: list):
+    """Best threshold per lexical weight: the most correct answer/fallback decisions"""
+    print(f"{'weight':>7} {'threshold':>10} {'correct':>8}")
+    for weight in np.arange(0.0, 1.01, 0.1):
+        ranker = HybridRanker(tfidf, dense, lexical_weight=weight)
+        on = np.array([ranker.scores(q["question"]).max() for q in queries])
+        off = np.array([ranker.scores(q).max() for q in off_topic])
+        threshold, correct = best_threshold(on, off)
+        print(f"{weight:>7.1f} {threshold:>10.3f} {correct:>5}/{len(on) + len(off)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calibrate", action="store_true")
+    args = parser.parse_args()
+
+    transcriptions = load_bundled_transcriptions()
+    queries, off_topic = load_queries(), load_off_topic()
+    tfidf = TfidfIndex.build(transcriptions)
+    dense = DenseIndex.build(transcriptions)
+    print(f"{len(queries)} on-topic and {len(off_topic)} off-topic questions")
+
+    if args.calibrate:
+        calibrate(tfidf, dense, queries, off_topic)
+        return
+
+    modes = {
+        "tfidf": lambda q: tfidf.search(q, transcriptions),
+        "dense": lambda q: dense.search(q, transcriptions),
+        "hybrid": lambda q: HybridRanker(tfidf, dense).search(q, transcriptions),
+        "hybrid-rrf": lambda q: HybridRanker(tfidf, dense, fusion="rrf").search(q, transcriptions),
+    }
+    print(f"{'mode':>11} {'hit@3':>6} {'needless fallbacks':>19} {'wrong answers':>14} {'p50':>8}")
+    for name, search in modes.items():
+        r = decisions(search, queries, off_topic)
+        print(f"{name:>11} {r['hit_rate']:>6.0%} {r['needless']:>19} {r['wrong']:>14} {r['p50_ms']:>6.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Per-query time of the keyword fallback: inverted index vs scanning every segment
+
+    python -m benchmarks.bench_keyword_index
+    python -m benchmarks.bench_keyword_index --sizes 35 1000 10000 100000
+
+Before timing, checks that the index returns exactly the same top-k as the
+old scan on the bundled transcriptions.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from benchmarks.bench_tfidf_index import QUERIES, time_queries
+from benchmarks.corpus import load_bundled_transcriptions, synthetic_transcriptions
+from keyword_index import KeywordIndex
+
+
+def scan_search(question: str, transcriptions: list, top_k: int = 3):
+    """The old simple_keyword_search: tokenize every segment on every query"""
+    question_words = set(re.findall(r'\b\w+\b', question.lower()))
+    results = []
+    for trans in transcriptions:
+        content_words = set(re.findall(r'\b\w+\b', trans["content"].lower()))
+        overlap = len(question_words.intersection(content_words))
+        score = overlap / len(question_words) if question_words else 0
+        if score > 0.1:
+            results.append({
+                "text": trans["content"],
+                "metadata": {"source": trans["filename"]},
+                "score": score,
+                "word_count": trans["word_count"]
+            })
+    results.sort(key=lambda x: x["score"], reverse=True)
+    return results[:top_k]
+
+
+def check_same_results(transcriptions: list):
+    """Raise if the index and the scan disagree on any benchmark query"""
+    index = KeywordIndex.build(transcriptions)
+    for question in QUERIES + ["", "xyz", "المناعة"]:
+        for top_k in (1, 3, 10):
+            expected = scan_search(question, transcriptions, top_k)
+            actual = index.search(question, transcriptions, top_k)
+            if actual != expected:
+                raise AssertionError(f"top-{top_k} differs for {question!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[35, 1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    check_same_results(load_bundled_transcriptions())
+    print("✅ Same top-k as the old scan on the bundled transcriptions")
+
+    print(f"{'segments':>9} {'build ms':>10} {'index p50':>10} {'scan p50':>10} {'speedup':>8}")
+    for size in args.sizes:
+        if size == 35:
+            transcriptions = load_bundled_transcriptions()
+        else:
+            transcriptions = synthetic_transcriptions(size)
+
+        start = time.perf_counter()
+        index = KeywordIndex.build(transcriptions)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        indexed = time_queries(lambda q: index.search(q, transcriptions), args.queries)
+        scanned = time_queries(lambda q: scan_search(q, transcriptions), max(1, args.queries // 4))
+
+        index_p50 = statistics.median(indexed)
+        scan_p50 = statistics.median(scanned)
+        print(f"{len(transcriptions):>9} {build_ms:>10.1f} {index_p50:>10.3f} {scan_p50:>10.1f} "
+              f"{scan_p50 / index_p50:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Sharded video library: shard load times, routed vs library-wide queries, memory budget
+
+    python -m benchmarks.bench_library
+    python -m benchmarks.bench_library --videos 100 --segments 300 --budget-mb 20
+
+Builds a temporary library of ``--videos`` synthetic videos with
+``--segments`` transcript segments each, then measures:
+
+- building a shard from scratch vs loading it again from its saved index
+- a question routed to one video's shard (hybrid mode, query cache cleared)
+- a library-wide question fanned out over every shard, serially and in
+  parallel, with every shard in memory
+- the same fan-out under ``--budget-mb``: shards that do not fit are
+  loaded from disk for each search and dropped again, while the shard of
+  the watched video stays loaded
+"""
+import argparse
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_tfidf_index import QUERIES
+from benchmarks.load_sessions import write_corpus
+from benchmarks.load_web_search import FIXTURES
+from engine import VideoChatEngine
+from transcript_manifest import TranscriptUpdater
+from video_library import FANOUT_WORKERS, VideoLibrary, add_video
+from web_search import FixtureBackend
+
+
+def p50_ms(times: list) -> float:
+    return statistics.median(times) * 1000
+
+
+def time_queries(search, repeats: int) -> list:
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        search(QUERIES[i % len(QUERIES)])
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def uncached(engine: VideoChatEngine, search):
+    """``search`` with the engine's transcript results cleared first"""
+    def run(question):
+        engine.query_cache.invalidate("video")
+        return search(question)
+    return run
+
+
+def engine_for(root: str, budget_mb: float, max_workers: int = FANOUT_WORKERS) -> VideoChatEngine:
+    library = VideoLibrary(root, memory_budget_mb=budget_mb, max_workers=max_workers)
+    return VideoChatEngine(library, web_backend=FixtureBackend(FIXTURES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--segments", type=int, default=300, help="segments per video")
+    parser.add_argument("--budget-mb", type=float, help="memory budget for the evicting run (default: a quarter of the library)")
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        for i in range(args.videos):
+            write_corpus(add_video(root, f"video-{i:03d}", f"https://example.com/{i}"), args.segments)
+        print(f"{args.videos} videos x {args.segments} segments")
+
+        library = VideoLibrary(root)
+        builds = []
+        for video_id in library.videos:
+            start = time.perf_counter()
+            TranscriptUpdater(*library.folders(video_id)).refresh()
+            builds.append(time.perf_counter() - start)
+
+        engine = engine_for(root, budget_mb=1e9)
+        loads = []
+        for video_id in engine.library.videos:
+            start = time.perf_counter()
+            engine.load_transcriptions(video_id)
+            loads.append(time.perf_counter() - start)
+        total_mb = engine.library.stats()["loaded_mb"]
+        print(f"shard build p50 {p50_ms(builds):.0f} ms, reload from disk p50 {p50_ms(loads):.0f} ms, "
+              f"all shards {total_mb:.1f} MB")
+
+        video_id = next(iter(engine.library.videos))
+        routed = time_queries(uncached(engine, lambda q: engine.search(q, video_id=video_id)), args.repeats)
+        parallel = time_queries(uncached(engine, lambda q: engine.search(q, scope="library")), args.repeats)
+        serial_engine = engine_for(root, budget_mb=1e9, max_workers=1)
+        for other_id in serial_engine.library.videos:
+            serial_engine.load_transcriptions(other_id)
+        serial = time_queries(uncached(serial_engine, lambda q: serial_engine.search(q, scope="library")),
+                              args.repeats)
+
+        budget_mb = args.budget_mb or total_mb / 4
+        budget_engine = engine_for(root, budget_mb=budget_mb)
+        watched = next(iter(budget_engine.library.videos))
+        budget_engine.load_transcriptions(watched)
+        evicting = time_queries(uncached(budget_engine, lambda q: budget_engine.search(q, scope="library")),
+                                args.repeats)
+        stats = budget_engine.library.stats()
+
+        print(f"{'routed to one video':>28}: p50 {p50_ms(routed):7.1f} ms")
+        print(f"{'library, serial fan-out':>28}: p50 {p50_ms(serial):7.1f} ms")
+        print(f"{'library, parallel fan-out':>28}: p50 {p50_ms(parallel):7.1f} ms ({FANOUT_WORKERS} threads)")
+        print(f"{'library, ' + f'{budget_mb:.1f} MB budget':>28}: p50 {p50_ms(evicting):7.1f} ms "
+              f"({stats['loaded']} shards / {stats['loaded_mb']:.1f} MB resident, "
+              f"{stats['loads']} loads, {stats['evictions']} evictions, "
+              f"watched shard {'kept' if watched in budget_engine.library.loaded() else 'evicted'})")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Generated answers under concurrent users: batching, queueing and the answer cache
+
+    python -m benchmarks.bench_llm
+    python -m benchmarks.bench_llm --clients 32 --call-ms 400 --prompt-ms 30
+
+The model is StubBackend behind a lock, so like a single GPU it runs one
+call at a time; a call costs ``--call-ms`` plus ``--prompt-ms`` per prompt
+in the batch.  ``--clients`` threads each ask ``--questions`` distinct
+labelled questions (contexts retrieved once up front) through an
+AnswerGenerator, with and without micro-batching, then once more with every
+question asked twice.  Prints answers/s, end-to-end p50/p95, queue wait
+p95, model calls, mean batch size and rejected requests.
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.bench_retrieval_modes import load_queries
+from engine import VideoChatEngine, result_snippet
+from llm_answer import AnswerGenerator, LLMOverloaded, StubBackend
+
+
+class SerialStub(StubBackend):
+    """StubBackend that, like a model on one GPU, runs one call at a time"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._busy = threading.Lock()
+
+    def generate(self, prompts: list, emit) -> list:
+        with self._busy:
+            return super().generate(prompts, emit)
+
+
+def run(generator: AnswerGenerator, requests: list, clients: int) -> dict:
+    """Every client thread submits its share of ``requests`` one after another"""
+    latencies, rejected = [], []
+    lock = threading.Lock()
+
+    def client(share):
+        for question, segment_ids, contexts in share:
+            start = time.perf_counter()
+            try:
+                generator.submit(question, segment_ids, contexts).text()
+            except LLMOverloaded:
+                with lock:
+                    rejected.append(question)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(requests[i::clients],)) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = generator.stats()
+    p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (float("nan"),) * 2
+    return {"answers": len(latencies), "rps": len(latencies) / elapsed, "p50_ms": p50, "p95_ms": p95,
+            "wait_p95": stats["wait"]["p95_ms"], "calls": generator.backend.calls,
+            "mean_batch": stats["mean_batch"] or 0.0, "cache_hits": stats["cache"]["hits"],
+            "rejected": len(rejected)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=4, help="distinct questions per client")
+    parser.add_argument("--call-ms", type=float, default=200.0, help="fixed cost of one model call")
+    parser.add_argument("--prompt-ms", type=float, default=20.0, help="extra cost per prompt in a batch")
+    parser.add_argument("--workers", type=int, default=2, help="generation worker threads")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=64)
+    args = parser.parse_args()
+
+    engine = VideoChatEngine()
+    base = [q["question"] for q in load_queries()]
+    requests = []
+    for i in range(args.clients * args.questions):
+        question = f"{base[i % len(base)]} {i}"
+        results = engine.search(base[i % len(base)])
+        requests.append((question, [r["metadata"]["source"] for r in results],
+                         [result_snippet(r) for r in results]))
+    print(f"{args.clients} clients x {args.questions} questions, model call {args.call_ms:g} ms "
+          f"+ {args.prompt_ms:g} ms/prompt, {args.workers} workers")
+    print(f"{'':>16} {'answers/s':>10} {'p50':>9} {'p95':>9} {'wait p95':>9} {'calls':>6} "
+          f"{'batch':>6} {'cached':>7} {'rejected':>9}")
+
+    def report(name, max_batch, requests):
+        backend = SerialStub(latency=args.call_ms / 1000, per_prompt=args.prompt_ms / 1000, max_batch=max_batch)
+        generator = AnswerGenerator(backend, workers=args.workers, max_queue=args.max_queue, max_batch=max_batch)
+        r = run(generator, requests, args.clients)
+        print(f"{name:>16} {r['rps']:>10.1f} {r['p50_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms "
+              f"{'≤' + format(r['wait_p95'], 'g'):>7}ms {r['calls']:>6} {r['mean_batch']:>6.1f} "
+              f"{r['cache_hits']:>7} {r['rejected']:>9}")
+
+    report("no batching", 1, requests)
+    report("micro-batching", args.max_batch, requests)
+    # Each client asks its questions twice; the second round never reaches the model
+    repeated = [r for i in range(0, len(requests), args.clients)
+                for r in requests[i:i + args.clients] * 2]
+    report("asked twice", args.max_batch, repeated)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Speed and hit-rate of each retrieval mode on the labelled query set
+
+    python -m benchmarks.bench_retrieval_modes
+    python -m benchmarks.bench_retrieval_modes --top-k 5
+
+The queries in benchmarks/queries.json were written against the bundled
+transcriptions; "relevant" lists the segments that answer each one.  Some
+use formal spelling and some the dialect spelling of the transcripts.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from benchmarks.corpus import load_bundled_transcriptions
+from bm25_index import BM25Index
+from keyword_index import KeywordIndex
+from transcript_index import TfidfIndex
+
+QUERIES_FILE = os.path.join(os.path.dirname(__file__), "queries.json")
+
+MODES = {
+    "tfidf": TfidfIndex,
+    "bm25": BM25Index,
+    "keyword": KeywordIndex,
+}
+
+
+def load_queries(path: str = QUERIES_FILE) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def evaluate(index, transcriptions: list, queries: list, top_k: int) -> dict:
+    """Hit rate, MRR and latency of one index over the labelled queries"""
+    hits, reciprocal_ranks, latencies = 0, [], []
+    for q in queries:
+        start = time.perf_counter()
+        results = index.search(q["question"], transcriptions, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        sources = [r["metadata"]["source"] for r in results]
+        ranks = [i for i, source in enumerate(sources, 1) if source in q["relevant"]]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+    return {
+        "hit_rate": hits / len(queries),
+        "mrr": statistics.mean(reciprocal_ranks),
+        "p50_ms": statistics.median(latencies),
+        "max_ms": max(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    transcriptions = load_bundled_transcriptions()
+    queries = load_queries()
+    print(f"{len(queries)} labelled queries, {len(transcriptions)} segments, top-{args.top_k}")
+    print(f"{'mode':>8} {'hit rate':>9} {'MRR':>6} {'p50 ms':>8} {'max ms':>8}")
+    for mode, index_class in MODES.items():
+        index = index_class.build(transcriptions)
+        stats = evaluate(index, transcriptions, queries, args.top_k)
+        print(f"{mode:>8} {stats['hit_rate']:>9.0%} {stats['mrr']:>6.3f} {stats['p50_ms']:>8.3f} {stats['max_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Answer latency of sequential vs speculative web fallback
+
+    python -m benchmarks.bench_retrieval_pipeline
+    python -m benchmarks.bench_retrieval_pipeline --segments 50000 --latency 0.5
+
+Asks the labelled transcript questions (benchmarks/queries.json) and the
+off-topic questions recorded in benchmarks/web_fixtures.json, with TF-IDF
+over the bundled transcriptions (or ``--segments`` synthetic ones) and a
+fixture web backend that sleeps ``--latency`` seconds per call.  Reports
+p50/p95 of the total retrieval time for hits and misses under both
+strategies, and how many speculative web searches were thrown away.
+"""
+import argparse
+import json
+import statistics
+
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.corpus import load_bundled_transcriptions, synthetic_transcriptions
+from benchmarks.load_web_search import FIXTURES
+from bm25_index import BM25Index
+from retrieval_pipeline import STRATEGIES, RetrievalOrchestrator, vocabulary_coverage
+from transcript_index import TfidfIndex
+from web_search import FixtureBackend
+
+
+def percentiles(times: list) -> str:
+    p95 = statistics.quantiles(times, n=20)[-1] if len(times) > 1 else times[0]
+    return f"p50 {statistics.median(times):7.1f} ms  p95 {p95:7.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, help="synthetic corpus size (default: bundled transcriptions)")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per web search")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.segments:
+        transcriptions = synthetic_transcriptions(args.segments)
+    else:
+        transcriptions = load_bundled_transcriptions()
+    index = TfidfIndex.build(transcriptions)
+    vocabulary = BM25Index.build(transcriptions).vocabulary
+    backend = FixtureBackend(FIXTURES, latency=args.latency)
+
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        off_topic = list(json.load(f))
+    questions = [q["question"] for q in load_queries()] + off_topic
+    print(f"{len(transcriptions)} segments, {len(questions)} questions x {args.repeats}, "
+          f"web search {args.latency:.2f}s")
+
+    def search_video(question):
+        return index.search(question, transcriptions)
+
+    def search_web(question):
+        return backend.search(question)
+
+    for strategy in STRATEGIES:
+        orchestrator = RetrievalOrchestrator()
+        totals = {"hit": [], "miss": []}
+        for _ in range(args.repeats):
+            for question in questions:
+                outcome = orchestrator.retrieve(question, search_video, search_web,
+                                                coverage=vocabulary_coverage(question, vocabulary),
+                                                strategy=strategy)
+                kind = "hit" if outcome["video_results"] else "miss"
+                totals[kind].append(outcome["timings"]["total"])
+        stats = orchestrator.stats()
+        print(f"{strategy:>11}: transcript hits ({len(totals['hit'])}) {percentiles(totals['hit'])}")
+        if totals["miss"]:
+            print(f"{'':>11}  web fallback ({len(totals['miss'])})    {percentiles(totals['miss'])}")
+        print(f"{'':>11}  speculative web searches {stats['speculated']}, discarded {stats['discarded']}, "
+              f"deadline hits {stats['deadline_hits']}")
+
+if __name__ == "__main__":
+    main()
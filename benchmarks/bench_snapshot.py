@@ -0,0 +1,87 @@
+"""Cold start of a transcript folder: raw files and saved index vs compiled snapshot
+
+    python -m benchmarks.bench_snapshot
+    python -m benchmarks.bench_snapshot --sizes 1000 10000 --repeats 3
+
+For each size writes a temporary folder of synthetic segments and times the
+first refresh of a new TranscriptUpdater:
+
+- first build: nothing saved yet, every index built from the files
+- saved index: the TF-IDF index and manifest from the previous run, which
+  still reads and hashes every file and rebuilds the other indexes
+- snapshot: corpus.snap written by compile_snapshot, only stats the files
+
+Also prints the compile time and snapshot size, and checks that every
+retrieval mode returns the same results from the snapshot as from the
+folder.  Dense vectors are saved by the first build and reused by both
+later starts, so they do not take part.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.bench_tfidf_index import QUERIES
+from benchmarks.load_sessions import write_corpus
+from corpus_snapshot import compile_snapshot, snapshot_path
+from engine import RETRIEVAL_MODES, VideoChatEngine
+from transcript_manifest import TranscriptUpdater
+
+
+def first_refresh(folders: tuple) -> tuple:
+    """(seconds, updater) of a new updater's first refresh"""
+    updater = TranscriptUpdater(*folders)
+    start = time.perf_counter()
+    updater.refresh()
+    return time.perf_counter() - start, updater
+
+
+def same_results(engine: VideoChatEngine, expected, actual) -> bool:
+    for mode in RETRIEVAL_MODES:
+        for question in QUERIES:
+            # Both corpora are the same video: keep every search off the result cache
+            engine.query_cache.invalidate("video")
+            a = engine.search_transcriptions(question, expected, mode)
+            engine.query_cache.invalidate("video")
+            b = engine.search_transcriptions(question, actual, mode)
+            if a != b:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="segments")
+    parser.add_argument("--repeats", type=int, default=3, help="starts timed per path (median)")
+    args = parser.parse_args()
+
+    engine = VideoChatEngine()
+    print(f"{'segments':>9} {'first build':>12} {'saved index':>12} {'compile':>9} {'snapshot':>9} "
+          f"{'speedup':>8} {'size':>8} {'same results':>13}")
+    for size in args.sizes:
+        root = tempfile.mkdtemp()
+        try:
+            folders = tuple(os.path.join(root, name) for name in ("transcriptions", "tfidf_index", "dense_index"))
+            write_corpus(folders[0], size)
+            build, updater = first_refresh(folders)
+            saved = statistics.median(first_refresh(folders)[0] for _ in range(args.repeats))
+
+            start = time.perf_counter()
+            compile_snapshot(updater.corpus, updater.manifest, snapshot_path(folders[1]))
+            compiled = time.perf_counter() - start
+
+            starts = [first_refresh(folders) for _ in range(args.repeats)]
+            snapshot = statistics.median(seconds for seconds, _ in starts)
+            loaded = starts[-1][1]
+            assert loaded.from_snapshot, "snapshot did not validate"
+            same = same_results(engine, updater.corpus, loaded.corpus)
+            print(f"{size:>9} {build * 1000:>10.0f}ms {saved * 1000:>10.0f}ms {compiled * 1000:>7.0f}ms "
+                  f"{snapshot * 1000:>7.0f}ms {saved / snapshot:>7.1f}x "
+                  f"{os.path.getsize(snapshot_path(folders[1])) / 2 ** 20:>6.1f}MB {'yes' if same else 'NO':>13}")
+        finally:
+            shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""End-to-end answer latency with long transcripts: precomputed windows vs rescanning
+
+    python -m benchmarks.bench_snippets
+    python -m benchmarks.bench_snippets --segments 200 --words 3000
+
+"before" is TF-IDF search followed by the old snippet loop (lowercase and
+.find() each question word on each result, keep the first hit).  "after" is
+TF-IDF search plus picking the best precomputed window.  Coverage is the
+share of the question's normalized words that appear in the snippet.
+"""
+import argparse
+import statistics
+import time
+
+from arabic_text import tokenize
+from benchmarks.bench_tfidf_index import QUERIES
+from benchmarks.corpus import synthetic_transcriptions
+from chunking import WindowIndex, window_snippet
+from transcript_index import TfidfIndex
+
+
+def rescan_snippet(question: str, text: str) -> str:
+    """The old generate_response snippet search"""
+    if len(text) <= 400:
+        return text
+    words = question.lower().split()
+    best_snippet = text[:400]
+    for word in words:
+        if word in text.lower():
+            pos = text.lower().find(word)
+            start = max(0, pos - 200)
+            end = min(len(text), pos + 200)
+            best_snippet = text[start:end]
+            if start > 0:
+                best_snippet = "..." + best_snippet
+            if end < len(text):
+                best_snippet = best_snippet + "..."
+            break
+    return best_snippet
+
+
+def window_snippets(question: str, results: list, windows: WindowIndex) -> list:
+    windows.attach_snippets(question, results)
+    return [window_snippet(r["text"], r["snippet_start"], r["snippet_end"]) for r in results]
+
+
+def coverage(question: str, snippet: str) -> float:
+    wanted = set(tokenize(question))
+    return len(wanted & set(tokenize(snippet))) / len(wanted) if wanted else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000, help="words per transcript")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    transcriptions = synthetic_transcriptions(args.segments, words_per_segment=args.words)
+    index = TfidfIndex.build(transcriptions)
+    start = time.perf_counter()
+    windows = WindowIndex.build(transcriptions)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"{args.segments} transcripts x {args.words} words, {len(windows)} windows (built in {build_ms:.0f} ms)")
+
+    timings = {"search": [], "before": [], "after": []}
+    coverages = {"before": [], "after": []}
+    for i in range(args.repeats):
+        question = QUERIES[i % len(QUERIES)]
+
+        start = time.perf_counter()
+        results = index.search(question, transcriptions)[:2]
+        timings["search"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        snippets = [rescan_snippet(question, r["text"]) for r in results]
+        timings["before"].append((time.perf_counter() - start) * 1000)
+        coverages["before"].extend(coverage(question, s) for s in snippets)
+
+        start = time.perf_counter()
+        snippets = window_snippets(question, results, windows)
+        timings["after"].append((time.perf_counter() - start) * 1000)
+        coverages["after"].extend(coverage(question, s) for s in snippets)
+
+    search_p50 = statistics.median(timings["search"])
+    print(f"{'':>7} {'snippet p50':>12} {'answer p50':>11} {'coverage':>9}")
+    for name in ("before", "after"):
+        snippet_p50 = statistics.median(timings[name])
+        answer_p50 = statistics.median(a + b for a, b in zip(timings["search"], timings[name]))
+        print(f"{name:>7} {snippet_p50:>10.3f}ms {answer_p50:>9.2f}ms {statistics.mean(coverages[name] or [0]):>9.0%}")
+    print(f"(TF-IDF search alone: {search_p50:.2f} ms p50)")
+
+if __name__ == "__main__":
+    main()
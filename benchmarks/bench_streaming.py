@@ -0,0 +1,86 @@
+"""Time to first response part vs complete answer, buffered and streamed
+
+    python -m benchmarks.bench_streaming
+    python -m benchmarks.bench_streaming --workers 2 --repeats 5
+
+Asks the labelled and off-topic questions through the engine in-process and
+through engine_api.py (fixture web backend, started on a free port), once
+with ``answer`` / POST /answer and once with ``answer_stream`` /
+POST /answer/stream.  Buffered answers show nothing until they are
+complete.  Also prints what the old 30 ms-per-word typing effect would
+have added on top of each complete answer.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from benchmarks.bench_hybrid import load_off_topic
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.load_api import free_port, start_server
+from benchmarks.load_web_search import FIXTURES
+from engine import VideoChatEngine
+from engine_api import EngineClient
+from web_search import FixtureBackend
+
+TYPING_DELAY = 0.03
+
+
+def timed_answer(engine, question: str, stream: bool) -> tuple:
+    """(first part ms, complete ms, words) of one answer"""
+    start = time.perf_counter()
+    first = None
+    if stream:
+        for event in engine.answer_stream(question):
+            if first is None:
+                first = time.perf_counter() - start
+            if "done" in event:
+                answer = event["done"]
+    else:
+        answer = engine.answer(question)
+    complete = time.perf_counter() - start
+    words = len(re.sub(r"<[^>]+>", " ", answer["content"]).split())
+    return (first if first is not None else complete) * 1000, complete * 1000, words
+
+
+def report(name: str, engine, questions: list, stream: bool) -> list:
+    """Print p50 first-part and complete times; returns the word count of every answer"""
+    engine.answer(questions[0])  # warm-up
+    rows = [timed_answer(engine, q, stream) for q in questions]
+    first = statistics.median(r[0] for r in rows)
+    complete = statistics.median(r[1] for r in rows)
+    print(f"{name:>22} {first:>10.1f}ms {complete:>10.1f}ms")
+    return [r[2] for r in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1, help="engine_api.py worker processes")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # Distinct per repeat, so every answer misses the query cache
+    questions = [q["question"] for q in load_queries()] + load_off_topic()
+    questions = [f"{q} {i}" for i in range(args.repeats) for q in questions]
+    print(f"{len(questions)} questions, p50")
+    print(f"{'':>22} {'first part':>12} {'complete':>12}")
+
+    engine = VideoChatEngine(web_backend=FixtureBackend(FIXTURES))
+    words = report("in-process, buffered", engine, questions, stream=False)
+    engine.query_cache.invalidate()
+    report("in-process, streamed", engine, questions, stream=True)
+
+    port = free_port()
+    server = start_server(args.workers, port)
+    try:
+        client = EngineClient(f"http://127.0.0.1:{port}")
+        report("HTTP /answer", client, questions, stream=False)
+        report("HTTP /answer/stream", client, [f"{q} again" for q in questions], stream=True)
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"old typing effect: +{statistics.median(words) * TYPING_DELAY * 1000:.0f} ms per answer "
+          f"(p50 of {statistics.median(words):.0f} words x {TYPING_DELAY * 1000:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Offline retrieval suite: stage latencies, throughput, memory and relevance of every mode
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --sizes 100 1000 10000 100000 --out after.json
+    python -m benchmarks.bench_suite --compare before.json after.json
+
+Runs every retrieval mode of the engine over several corpora, each in its
+own process so that peak memory is per corpus:
+
+- "bundled": the bundled transcriptions with the golden questions of
+  benchmarks/queries.json, whose "relevant" lists are hand-labelled
+- "synthetic-N": N segments of Arabic-like text (benchmarks/corpus.py)
+  with known-item questions: a few distinctive words drawn from one
+  segment, which is then the only relevant one
+
+A corpus is loaded through TranscriptUpdater into a temporary index folder
+(the dense vectors use the offline hashing embedder).  Each question goes
+through the steps of VideoChatEngine.search_transcriptions plus the
+response, timed separately: retrieve (the mode's search function, e.g.
+smart_text_search), annotate (timestamps and snippet windows) and compose
+(generate_response).  Per corpus and mode the suite reports p50/p95/p99 of
+each stage, questions per second, recall@k, hit@k and MRR; per corpus the
+load time, index size and peak RSS.
+
+``--out`` writes all of it as JSON.  ``--compare`` diffs two such files
+and exits with status 1 when relevance dropped or a p95 grew by more than
+``--tolerance`` (and ``--min-delta-ms``, below which it is timer noise), so
+a change to retrieval can be checked against a run from before it.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.corpus import TRANSCRIPTIONS_FOLDER
+from benchmarks.load_sessions import write_corpus
+from engine import RETRIEVAL_MODES, generate_response
+from transcript_manifest import TranscriptUpdater
+from video_library import corpus_nbytes
+
+STAGES = ("retrieve", "annotate", "compose", "total")
+# Words drawn from a segment for its known-item question, and the shortest word used
+QUERY_WORDS = 4
+MIN_WORD_LENGTH = 4
+SUITE_VERSION = 1
+
+
+def known_item_queries(transcriptions, n_queries: int, seed: int = 0) -> list:
+    """Questions made of distinctive words of one segment, which is their only relevant one"""
+    rng = random.Random(seed)
+    queries = []
+    for t in rng.sample(list(transcriptions), min(n_queries, len(transcriptions))):
+        words = sorted({w for w in t["content"].split() if len(w) >= MIN_WORD_LENGTH})
+        if len(words) >= QUERY_WORDS:
+            queries.append({"question": " ".join(rng.sample(words, QUERY_WORDS)), "relevant": [t["filename"]]})
+    return queries
+
+
+def percentiles(times: list) -> dict:
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "mean_ms": float(np.mean(times))}
+
+
+def run_mode(corpus, search, queries: list, top_k: int, repeats: int = 1) -> dict:
+    """Stage timings and relevance of one retrieval mode, asking ``queries`` ``repeats`` times"""
+    times = {stage: [] for stage in STAGES}
+    recalls, hits, reciprocal_ranks, errors = [], 0, [], []
+    # The first question pays lazy setup (e.g. the hybrid ranker's norms); keep it out of the numbers
+    search(queries[0]["question"], corpus, top_k, [])
+    for i, q in enumerate(queries * repeats):
+        question = q["question"]
+        start = time.perf_counter()
+        results = search(question, corpus, top_k, errors)
+        retrieved = time.perf_counter()
+        corpus.segments.annotate(results)
+        corpus.windows.attach_snippets(question, results)
+        annotated = time.perf_counter()
+        generate_response(question, results)
+        composed = time.perf_counter()
+        for stage, seconds in (("retrieve", retrieved - start), ("annotate", annotated - retrieved),
+                               ("compose", composed - annotated), ("total", composed - start)):
+            times[stage].append(seconds * 1000)
+        if i >= len(queries):
+            continue
+
+        relevant = set(q["relevant"])
+        sources = [r["metadata"]["source"] for r in results]
+        ranks = [i for i, source in enumerate(sources, 1) if source in relevant]
+        recalls.append(len(ranks) / len(relevant))
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+    return {
+        "stages": {stage: percentiles(times[stage]) for stage in STAGES},
+        "qps": len(times["total"]) / (sum(times["total"]) / 1000),
+        f"recall@{top_k}": float(np.mean(recalls)),
+        f"hit@{top_k}": hits / len(queries),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "errors": len(errors),
+    }
+
+
+def child(args):
+    """Measure one corpus and print its results as JSON"""
+    workdir = tempfile.mkdtemp()
+    try:
+        if args.segments:
+            folder = os.path.join(workdir, "transcriptions")
+            write_corpus(folder, args.segments)
+        else:
+            folder = TRANSCRIPTIONS_FOLDER
+        updater = TranscriptUpdater(folder, os.path.join(workdir, "tfidf_index"), os.path.join(workdir, "dense_index"))
+        start = time.perf_counter()
+        updater.refresh()
+        load_s = time.perf_counter() - start
+        corpus = updater.corpus
+
+        if args.segments:
+            queries = known_item_queries(corpus, args.queries)
+        else:
+            queries = load_queries()
+        modes = {mode: run_mode(corpus, search, queries, args.top_k, args.repeats)
+                 for mode, (_, search) in RETRIEVAL_MODES.items()}
+    finally:
+        shutil.rmtree(workdir)
+
+    print(json.dumps({
+        "segments": len(corpus),
+        "queries": len(queries),
+        "load_s": load_s,
+        "index_mb": corpus_nbytes(corpus) / 2 ** 20,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "modes": modes,
+    }))
+
+
+def print_corpus(name: str, result: dict, top_k: int):
+    print(f"\n{name}: {result['segments']} segments, {result['queries']} questions, "
+          f"load {result['load_s']:.2f}s, index {result['index_mb']:.1f}MB, peak RSS {result['peak_rss_mb']:.0f}MB")
+    print(f"{'mode':>8} {'retrieve p50/p95':>17} {'annotate p95':>13} {'compose p95':>12} {'total p99':>10} "
+          f"{'q/s':>8} {'recall@' + str(top_k):>9} {'hit@' + str(top_k):>6} {'MRR':>6}")
+    for mode, m in result["modes"].items():
+        s = m["stages"]
+        retrieve = f"{s['retrieve']['p50_ms']:.2f}/{s['retrieve']['p95_ms']:.2f}ms"
+        print(f"{mode:>8} {retrieve:>17} "
+              f"{s['annotate']['p95_ms']:>11.2f}ms {s['compose']['p95_ms']:>10.2f}ms {s['total']['p99_ms']:>8.2f}ms "
+              f"{m['qps']:>8.0f} {m[f'recall@{top_k}']:>9.3f} {m[f'hit@{top_k}']:>6.0%} {m['mrr']:>6.3f}"
+              + (f"  ({m['errors']} errors)" if m["errors"] else ""))
+
+
+def compare(before_path: str, after_path: str, tolerance: float, min_delta_ms: float) -> int:
+    """Print per-mode changes between two result files; the number of regressions"""
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = json.load(f)
+    top_k = after["top_k"]
+    recall = f"recall@{top_k}"
+    if before["top_k"] != top_k:
+        print(f"❌ top-k differs ({before['top_k']} vs {top_k}); relevance is not comparable")
+        return 1
+
+    regressions = 0
+    print(f"{'corpus':>18} {'mode':>8} {'p95 before':>11} {'p95 after':>10} {'change':>7} "
+          f"{recall + ' Δ':>11} {'MRR Δ':>7}")
+    for name, a in after["corpora"].items():
+        b = before["corpora"].get(name)
+        if b is None:
+            continue
+        for mode, am in a["modes"].items():
+            bm = b["modes"].get(mode)
+            if bm is None:
+                continue
+            p95_before, p95_after = bm["stages"]["total"]["p95_ms"], am["stages"]["total"]["p95_ms"]
+            change = p95_after / p95_before - 1
+            d_recall, d_mrr = am[recall] - bm[recall], am["mrr"] - bm["mrr"]
+            # Known-item questions are regenerated from the same seed, so relevance is exact too
+            slower = change > tolerance and p95_after - p95_before > min_delta_ms
+            flags = [label for label, bad in (("slower", slower),
+                                              ("recall", d_recall < -1e-9), ("MRR", d_mrr < -1e-9)) if bad]
+            regressions += bool(flags)
+            print(f"{name:>18} {mode:>8} {p95_before:>9.2f}ms {p95_after:>8.2f}ms {change:>+7.0%} "
+                  f"{d_recall:>+11.3f} {d_mrr:>+7.3f}" + (f"  ❌ {', '.join(flags)}" if flags else ""))
+    print(f"{regressions} regressions (p95 tolerance {tolerance:.0%} and {min_delta_ms:g} ms)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="synthetic segments")
+    parser.add_argument("--queries", type=int, default=50, help="known-item questions per synthetic corpus")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3, help="timed passes over the questions")
+    parser.add_argument("--out", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two result files")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="p95 growth counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="smaller p95 growth is timer noise, never a regression")
+    parser.add_argument("--segments", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.tolerance, args.min_delta_ms) else 0)
+    if args.segments is not None:
+        child(args)
+        return
+
+    results = {
+        "suite_version": SUITE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "top_k": args.top_k,
+        "repeats": args.repeats,
+        "corpora": {},
+    }
+    for size in [0] + args.sizes:
+        name = f"synthetic-{size}" if size else "bundled"
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_suite", "--segments", str(size),
+             "--queries", str(args.queries), "--top-k", str(args.top_k), "--repeats", str(args.repeats)],
+            check=True, capture_output=True, text=True
+        )
+        results["corpora"][name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print_corpus(name, results["corpora"][name], args.top_k)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Per-query latency: persistent TF-IDF index vs refitting the vectorizer
+
+    python -m benchmarks.bench_tfidf_index
+    python -m benchmarks.bench_tfidf_index --sizes 35 1000 50000 --queries 20
+
+Before timing, a missing folder, an empty folder and a folder whose files
+were all deleted must each refresh to an empty, searchable index; the run
+fails (exit status 1) otherwise.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.corpus import load_bundled_transcriptions, synthetic_transcriptions
+from transcript_index import TfidfIndex
+from transcript_manifest import TranscriptUpdater
+
+QUERIES = [
+    "ما هي المناعة في النبات",
+    "شرح المناعة التركيبية",
+    "البروتينات المضادة للميكروبات",
+    "الجدار الخلوي والكيوتيكل",
+    "What is plant immunity",
+]
+
+
+def refit_search(question: str, transcriptions: list, top_k: int = 3):
+    """The old smart_text_search: refit TF-IDF over the corpus plus the question"""
+    documents = [t["content"] for t in transcriptions]
+    documents.append(question)
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words=None, ngram_range=(1, 2))
+    tfidf_matrix = vectorizer.fit_transform(documents)
+    similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1]).flatten()
+    top_indices = np.argsort(similarities)[::-1][:top_k]
+    return [int(i) for i in top_indices if similarities[i] > 0.05]
+
+
+def empty_folder_problems() -> list:
+    """What goes wrong refreshing and searching a folder with no transcripts"""
+    problems = []
+    root = tempfile.mkdtemp()
+    try:
+        folder = os.path.join(root, "transcriptions")
+        updater = TranscriptUpdater(folder, os.path.join(root, "index"), os.path.join(root, "dense_index"))
+        for case in ("missing folder", "empty folder", "every file deleted"):
+            if case == "empty folder":
+                os.makedirs(folder)
+            elif case == "every file deleted":
+                for t in synthetic_transcriptions(20):
+                    with open(os.path.join(folder, t["filename"]), "w", encoding="utf-8") as f:
+                        f.write(t["content"])
+                updater.refresh()
+                for fn in os.listdir(folder):
+                    os.remove(os.path.join(folder, fn))
+            try:
+                updater.refresh()
+                results = updater.index.search(QUERIES[0], list(updater.transcriptions))
+            except Exception as e:
+                problems.append(f"{case}: {type(e).__name__}: {e}")
+                continue
+            if len(updater.corpus) or results:
+                problems.append(f"{case}: {len(updater.corpus)} transcripts, {len(results)} results")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return problems
+
+
+def time_queries(search, n_queries: int, offset: int = 0):
+    """Run n_queries searches and return the latencies in milliseconds"""
+    latencies = []
+    for i in range(offset, offset + n_queries):
+        question = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        search(question)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[35, 1000, 50000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--refit-budget", type=float, default=60.0,
+                        help="stop timing the refit path after this many seconds per size")
+    args = parser.parse_args()
+
+    problems = empty_folder_problems()
+    for problem in problems:
+        print(f"  {problem}")
+    if problems:
+        sys.exit(1)
+
+    print(f"{'segments':>9} {'build ms':>10} {'index p50':>10} {'refit p50':>10} {'speedup':>8}")
+    for size in args.sizes:
+        if size == 35:
+            transcriptions = load_bundled_transcriptions()
+        else:
+            transcriptions = synthetic_transcriptions(size)
+
+        start = time.perf_counter()
+        index = TfidfIndex.build(transcriptions)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        indexed = time_queries(lambda q: index.search(q, transcriptions), args.queries)
+
+        # Refitting gets slow on big corpora, so cap the number of timed queries
+        refit = []
+        deadline = time.perf_counter() + args.refit_budget
+        while len(refit) < args.queries and (not refit or time.perf_counter() < deadline):
+            refit.extend(time_queries(lambda q: refit_search(q, transcriptions), 1, len(refit)))
+
+        index_p50 = statistics.median(indexed)
+        refit_p50 = statistics.median(refit)
+        print(f"{len(transcriptions):>9} {build_ms:>10.1f} {index_p50:>10.2f} {refit_p50:>10.1f} "
+              f"{refit_p50 / index_p50:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Per-query TF-IDF top-k: exhaustive scoring vs pruned postings traversal
+
+    python -m benchmarks.bench_tfidf_topk
+    python -m benchmarks.bench_tfidf_topk --sizes 1000 10000 100000 --queries 200
+
+For each size builds a TfidfIndex over synthetic segments and asks the
+fixed QUERIES plus known-item questions (distinctive words of one segment),
+once through ``top_k_exhaustive`` (every document scored, then selected)
+and once through ``top_k`` (the search path).  Prints p50/p95 of both and
+how the per-query cost grew against the corpus: a growth factor below the
+size factor is sublinear.  Every question is also checked at several k and
+thresholds: the pruned rows and scores must be identical to exhaustive.
+Pruning is forced at every size unless ``--prune-from`` sets the corpus
+size where the search path starts using it (PRUNE_MIN_DOCUMENTS).
+"""
+import argparse
+import time
+
+import numpy as np
+
+import transcript_index
+from benchmarks.bench_suite import known_item_queries
+from benchmarks.bench_tfidf_index import QUERIES
+from benchmarks.corpus import synthetic_transcriptions
+from transcript_index import MIN_SIMILARITY, PRUNE_MIN_DOCUMENTS, TfidfIndex
+
+# (k, min_score) combinations checked for identical results
+CHECKS = [(1, MIN_SIMILARITY), (3, MIN_SIMILARITY), (10, MIN_SIMILARITY), (3, 0.0), (50, 0.2)]
+
+
+def timed(search, questions: list, k: int) -> list:
+    """Milliseconds per question"""
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        search(question, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def mismatches(index: TfidfIndex, questions: list) -> int:
+    bad = 0
+    for question in questions:
+        for k, min_score in CHECKS:
+            rows, scores = index.top_k(question, k, min_score)
+            expected_rows, expected_scores = index.top_k_exhaustive(question, k, min_score)
+            bad += not (np.array_equal(rows, expected_rows) and np.array_equal(scores, expected_scores))
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="segments")
+    parser.add_argument("--queries", type=int, default=100, help="known-item questions per corpus")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--prune-from", type=int, default=0,
+                        help=f"smallest corpus top_k prunes (the search path uses {PRUNE_MIN_DOCUMENTS})")
+    args = parser.parse_args()
+    transcript_index.PRUNE_MIN_DOCUMENTS = args.prune_from
+
+    print(f"{'segments':>9} {'build':>7} {'exhaustive p50/p95':>19} {'pruned p50/p95':>16} "
+          f"{'speedup':>8} {'size x':>7} {'pruned cost x':>14} {'identical':>10}")
+    previous = None
+    for size in args.sizes:
+        transcriptions = synthetic_transcriptions(size)
+        start = time.perf_counter()
+        index = TfidfIndex.build(transcriptions)
+        build = time.perf_counter() - start
+        questions = QUERIES + [q["question"] for q in known_item_queries(transcriptions, args.queries)]
+
+        index.top_k(questions[0], args.top_k)
+        exhaustive = timed(index.top_k_exhaustive, questions, args.top_k)
+        pruned = timed(index.top_k, questions, args.top_k)
+        bad = mismatches(index, questions)
+
+        p50 = np.median(pruned)
+        growth = (f"{size / previous[0]:>6.0f}x {p50 / previous[1]:>13.1f}x" if previous
+                  else f"{'':>7} {'':>14}")
+        full = f"{np.median(exhaustive):.2f}/{np.percentile(exhaustive, 95):.2f}ms"
+        fast = f"{p50:.2f}/{np.percentile(pruned, 95):.2f}ms"
+        print(f"{size:>9} {build:>6.1f}s {full:>19} {fast:>16} {np.median(exhaustive) / p50:>7.1f}x {growth} "
+              f"{'yes' if not bad else f'{bad} DIFFER':>10}")
+        previous = (size, p50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Per-query web reranking latency: one embed call per result vs one batched call
+
+    python -m benchmarks.bench_web_rerank
+    python -m benchmarks.bench_web_rerank --sizes 5 20 50 --embed-latency 0.02
+
+"per-result" is the notebook's rerank_web_results: embed the question, then
+embed each body separately and compute a 1 x d cosine_similarity for it.
+"batched" is WebReranker with an empty embedding cache, "cached" the same
+question asked again, "lexical" the no-embedder fallback.  Result bodies are
+windows of the bundled transcripts.  ``--embed-latency`` adds a fixed delay
+to every embed call to stand in for the HTTP round-trip to an embedding
+server (the hashing embedder itself is local).
+"""
+import argparse
+import statistics
+import time
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.bench_tfidf_index import QUERIES
+from benchmarks.corpus import load_bundled_transcriptions
+from chunking import window_spans
+from dense_index import HashingEmbedder
+from web_rerank import EmbeddingCache, WebReranker
+
+
+class RoundTripEmbedder:
+    """Wraps an embedder, sleeping once per call like a remote embedding server"""
+
+    def __init__(self, embedder, latency: float):
+        self.embedder = embedder
+        self.latency = latency
+        self.name = embedder.name
+        self.calls = 0
+
+    def embed(self, texts: list):
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.embedder.embed(texts)
+
+
+def per_result_rerank(question: str, results: list, embedder) -> list:
+    """The notebook's loop: one embedding call and one cosine_similarity per result"""
+    question_vector = embedder.embed([question])
+    scored = []
+    for r in results:
+        body_vector = embedder.embed([r["body"]])
+        scored.append((float(cosine_similarity(question_vector, body_vector)[0][0]), r))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [r for _, r in scored]
+
+
+def web_results(n: int) -> list:
+    """n fake search results whose bodies are transcript windows"""
+    bodies = []
+    for t in load_bundled_transcriptions():
+        bodies.extend(t["content"][start:end] for start, end in window_spans(t["content"]))
+    return [{"title": f"Result {i}", "body": bodies[i % len(bodies)], "href": f"https://example.com/{i}"}
+            for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="seconds per embed call")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    embedder = RoundTripEmbedder(HashingEmbedder(), args.embed_latency)
+    print(f"{args.embed_latency * 1000:.0f} ms per embed call; p50 per query")
+    print(f"{'results':>8} {'per-result':>11} {'batched':>9} {'cached':>9} {'lexical':>9}")
+    for n in args.sizes:
+        results = web_results(n)
+        timings = {"per-result": [], "batched": [], "cached": [], "lexical": []}
+        for i in range(args.repeats):
+            question = QUERIES[i % len(QUERIES)]
+
+            start = time.perf_counter()
+            per_result_rerank(question, results, embedder)
+            timings["per-result"].append(time.perf_counter() - start)
+
+            reranker = WebReranker(EmbeddingCache())
+            start = time.perf_counter()
+            reranker.rerank(question, results, embedder)
+            timings["batched"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            reranker.rerank(question, results, embedder)
+            timings["cached"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            reranker.rerank(question, results)
+            timings["lexical"].append(time.perf_counter() - start)
+
+        row = " ".join(f"{statistics.median(timings[name]) * 1000:>7.1f}ms" for name in timings)
+        print(f"{n:>8} {row}")
+
+if __name__ == "__main__":
+    main()
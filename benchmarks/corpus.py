@@ -0,0 +1,44 @@
+"""Corpus helpers shared by the benchmark scripts"""
+import os
+import random
+import re
+
+TRANSCRIPTIONS_FOLDER = r"./transcriptions"
+
+
+def load_bundled_transcriptions(folder: str = TRANSCRIPTIONS_FOLDER):
+    """Read the bundled transcripts the same way the app does"""
+    transcriptions = []
+    for fn in sorted(os.listdir(folder)):
+        if fn.endswith(".txt"):
+            with open(os.path.join(folder, fn), "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                transcriptions.append({
+                    "filename": fn,
+                    "content": content,
+                    "word_count": len(content.split())
+                })
+    return transcriptions
+
+
+def synthetic_transcriptions(n_segments: int, words_per_segment: int = 90, seed: int = 0):
+    """Segments of Arabic-like text sampled from the bundled vocabulary
+
+    Word frequencies follow the bundled transcripts, so the term statistics
+    look like the real corpus at any size.
+    """
+    rng = random.Random(seed)
+    words = []
+    for t in load_bundled_transcriptions():
+        words.extend(re.findall(r"\w+", t["content"]))
+
+    transcriptions = []
+    for i in range(n_segments):
+        content = " ".join(rng.choices(words, k=words_per_segment))
+        transcriptions.append({
+            "filename": f"{i * 30}.txt",
+            "content": content,
+            "word_count": words_per_segment
+        })
+    return transcriptions
@@ -0,0 +1,147 @@
+"""Load test of the engine API: requests/s and latency percentiles of POST /answer
+
+    python -m benchmarks.load_api
+    python -m benchmarks.load_api --workers 1 4 --clients 16 --segments 5000
+    python -m benchmarks.load_api --url http://127.0.0.1:8600 --clients 8
+
+For every ``--workers`` count, starts engine_api.py on a free port (fixture
+web backend, so off-topic questions never leave the machine) and waits for
+/health; ``--url`` targets a server that is already running instead.
+``--clients`` processes then post the labelled and off-topic questions for
+``--duration`` seconds, each suffixed with a request number so that every
+request misses the query cache (``--cached`` asks them verbatim).
+``--segments`` serves a one-video library of that many synthetic segments
+from a temp folder.
+"""
+import argparse
+import multiprocessing
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_hybrid import load_off_topic
+from benchmarks.bench_retrieval_modes import load_queries
+from benchmarks.load_sessions import write_corpus
+from benchmarks.load_web_search import FIXTURES
+from video_library import add_video
+
+STARTUP_TIMEOUT = 120.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int, library: str = None) -> subprocess.Popen:
+    """engine_api.py in a child process, once it answers /health"""
+    import requests
+
+    command = [sys.executable, "engine_api.py", "--port", str(port), "--workers", str(workers),
+               "--web-backend", "fixture", "--web-fixtures", FIXTURES]
+    if library:
+        command += ["--library", library]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"engine_api.py exited with code {server.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1).raise_for_status()
+            return server
+        except requests.RequestException:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("engine_api.py did not start in time")
+
+
+def client(url: str, questions: list, duration: float, cached: bool, offset: int, results):
+    """Post /answer in a loop; puts (latencies in ms, failures) on the queue"""
+    import requests
+
+    session = requests.Session()
+    latencies, failures, n = [], 0, offset
+    stop = time.perf_counter() + duration
+    while time.perf_counter() < stop:
+        question = questions[n % len(questions)]
+        if not cached:
+            question = f"{question} {n}"
+        n += 1
+        start = time.perf_counter()
+        try:
+            session.post(f"{url}/answer", json={"question": question}, timeout=30).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except requests.RequestException:
+            failures += 1
+    results.put((latencies, failures))
+
+
+def run_load(url: str, questions: list, clients: int, duration: float, cached: bool) -> dict:
+    """Requests/s and latency percentiles of ``clients`` concurrent client processes"""
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=client, args=(url, questions, duration, cached, i * 100_000, results))
+                 for i in range(clients)]
+    for p in processes:
+        p.start()
+    latencies, failures = [], 0
+    for _ in processes:
+        client_latencies, client_failures = results.get()
+        latencies.extend(client_latencies)
+        failures += client_failures
+    for p in processes:
+        p.join()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (float("nan"),) * 3
+    return {"requests": len(latencies), "failures": failures, "rps": len(latencies) / duration,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="running engine server (default: start one per --workers count)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--segments", type=int, help="synthetic corpus size (default: bundled transcriptions)")
+    parser.add_argument("--cached", action="store_true", help="repeat questions verbatim (query cache hits)")
+    args = parser.parse_args()
+
+    questions = [q["question"] for q in load_queries()] + load_off_topic()
+    print(f"{args.clients} clients x {args.duration:g} s, {len(questions)} questions, "
+          f"{'cached' if args.cached else 'cache-busting'}")
+    print(f"{'server':>10} {'requests':>9} {'failed':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+
+    def report(name, r):
+        print(f"{name:>10} {r['requests']:>9} {r['failures']:>7} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms")
+
+    if args.url:
+        report("url", run_load(args.url.rstrip("/"), questions, args.clients, args.duration, args.cached))
+        return
+
+    library = None
+    if args.segments:
+        library = tempfile.mkdtemp()
+        write_corpus(add_video(library, "synthetic", "https://example.com/synthetic"), args.segments)
+    try:
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(workers, port, library)
+            try:
+                r = run_load(f"http://127.0.0.1:{port}", questions, args.clients, args.duration, args.cached)
+            finally:
+                server.terminate()
+                server.wait()
+            report(f"{workers} worker{'s' if workers > 1 else ''}", r)
+    finally:
+        if library:
+            shutil.rmtree(library, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
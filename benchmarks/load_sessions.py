@@ -0,0 +1,166 @@
+"""Resident memory with 50 concurrent sessions: per-session copies vs a shared corpus
+
+    python -m benchmarks.load_sessions
+    python -m benchmarks.load_sessions --sessions 50 --segments 3000
+
+"per-session" reproduces the old app: @st.cache_data hands every session its
+own copy of the transcripts (a pickle round trip) and each question refits
+TF-IDF.  "shared" is the current app: one Corpus from TranscriptUpdater that
+sessions only reference, with a reload swapped in while queries run.  Each
+mode runs in its own process so the RSS numbers don't mix.
+"""
+import argparse
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_tfidf_index import QUERIES, refit_search
+from benchmarks.corpus import synthetic_transcriptions
+
+
+def rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2 ** 20
+    except ImportError:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def write_corpus(folder: str, n_segments: int):
+    """Write synthetic segments as offset-named .txt files"""
+    os.makedirs(folder, exist_ok=True)
+    for t in synthetic_transcriptions(n_segments):
+        with open(os.path.join(folder, t["filename"]), "w", encoding="utf-8") as f:
+            f.write(t["content"])
+
+
+def read_folder(folder: str) -> list:
+    """The old load_transcriptions body"""
+    transcriptions = []
+    for fn in os.listdir(folder):
+        if fn.endswith(".txt"):
+            with open(os.path.join(folder, fn), "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                transcriptions.append({"filename": fn, "content": content, "word_count": len(content.split())})
+    return transcriptions
+
+
+def run_sessions(n_sessions: int, session_main):
+    """Start n_sessions threads together and wait for them all"""
+    barrier = threading.Barrier(n_sessions)
+    errors = []
+
+    def target(i):
+        barrier.wait()
+        try:
+            session_main(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n_sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+
+def per_session_mode(folder: str, n_sessions: int, n_queries: int):
+    cached = pickle.dumps(read_folder(folder))
+    sessions = [None] * n_sessions
+
+    def session_main(i):
+        # st.cache_data returns a fresh copy to every caller
+        sessions[i] = {"transcriptions_data": pickle.loads(cached)}
+        for q in range(n_queries):
+            refit_search(QUERIES[(i + q) % len(QUERIES)], sessions[i]["transcriptions_data"])
+
+    run_sessions(n_sessions, session_main)
+    return sessions
+
+
+def shared_mode(folder: str, n_sessions: int, n_queries: int):
+    from transcript_manifest import TranscriptUpdater
+
+    # Dense vectors too stay in the temporary folder, not the app's ./dense_index
+    updater = TranscriptUpdater(folder, os.path.join(folder, "index"), os.path.join(folder, "dense_index"))
+    updater.refresh()
+    sessions = [None] * n_sessions
+    versions = set()
+
+    def session_main(i):
+        sessions[i] = {}
+        for q in range(n_queries):
+            # Each query keeps the snapshot it started with, even across a swap
+            corpus = updater.corpus
+            corpus.index.search(QUERIES[(i + q) % len(QUERIES)], corpus)
+            versions.add(corpus.version)
+            if i == 0 and q == 0:
+                # Reload while the other sessions are querying
+                with open(os.path.join(folder, "999999.txt"), "w", encoding="utf-8") as f:
+                    f.write("المناعة في النبات")
+                updater.refresh()
+
+    run_sessions(n_sessions, session_main)
+    sessions.append(updater)
+    print(f"corpus versions seen by queries: {sorted(versions)}", file=sys.stderr)
+    return sessions
+
+
+def child(args):
+    before = rss_mb()
+    start = time.perf_counter()
+    mode = per_session_mode if args.mode == "per-session" else shared_mode
+    keep_alive = mode(args.folder, args.sessions, args.queries)
+    elapsed = time.perf_counter() - start
+    after = rss_mb()
+    print(f"{before:.1f} {after:.1f} {elapsed:.2f}")
+    del keep_alive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--segments", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2, help="questions asked per session")
+    parser.add_argument("--mode", choices=["per-session", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        child(args)
+        return
+
+    folder = tempfile.mkdtemp()
+    try:
+        write_corpus(folder, args.segments)
+        print(f"{args.sessions} sessions, {args.segments} segments, {args.queries} questions each")
+        print(f"{'mode':>12} {'RSS before':>11} {'RSS after':>10} {'growth':>8} {'seconds':>8}")
+        for mode in ["per-session", "shared"]:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.load_sessions", "--mode", mode, "--folder", folder,
+                 "--sessions", str(args.sessions), "--queries", str(args.queries)],
+                check=True, capture_output=True, text=True
+            )
+            before, after, elapsed = (float(x) for x in proc.stdout.split())
+            print(f"{mode:>12} {before:>9.1f}MB {after:>8.1f}MB {after - before:>6.1f}MB {elapsed:>8.2f}")
+            reload_file = os.path.join(folder, "999999.txt")
+            if os.path.exists(reload_file):
+                os.remove(reload_file)
+            if proc.stderr:
+                print(f"{'':>12} {proc.stderr.strip()}")
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
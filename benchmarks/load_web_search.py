@@ -0,0 +1,74 @@
+"""Offline load test of the web-search fallback: fixture backend behind the SQLite cache
+
+    python -m benchmarks.load_web_search
+    python -m benchmarks.load_web_search --clients 32 --latency 0.8 --timeout 2
+
+Concurrent clients ask the recorded questions in benchmarks/web_fixtures.json
+(plus a few unknown ones) through a FixtureBackend that sleeps ``--latency``
+seconds per call, mimicking DuckDuckGo without the network.  The first
+round starts from an empty on-disk cache, the second is served from it.
+Prints per-backend latency histograms, timeouts and cache hits.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from web_search import FixtureBackend, SQLiteCacheBackend, WebSearchError
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "web_fixtures.json")
+UNKNOWN_QUESTIONS = ["how do plants sense fungal chitin", "what is a hypersensitive response"]
+
+
+def run_round(backend, questions: list, clients: int) -> dict:
+    """Ask every question once from `clients` threads; count answers and failures"""
+    def ask(question):
+        try:
+            return "answered" if backend.search(question) else "empty"
+        except WebSearchError:
+            return "failed"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(ask, questions))
+    elapsed = time.perf_counter() - start
+    return {name: outcomes.count(name) for name in ("answered", "empty", "failed")} | {"seconds": elapsed}
+
+
+def print_stats(backend):
+    for b in backend.backends():
+        stats = b.stats()
+        extra = f" · hits {stats['hits']} · misses {stats['misses']}" if "hits" in stats else ""
+        print(f"  {b.name:>12}: {stats['count']} calls · p50 ≤{stats['p50_ms']} ms · p95 ≤{stats['p95_ms']} ms"
+              f" · timeouts {stats['timeouts']} · errors {stats['errors']}{extra}")
+        print(f"  {'':>12}  {stats['buckets']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16, help="concurrent searches")
+    parser.add_argument("--repeats", type=int, default=8, help="times each question is asked per round")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per fixture call")
+    parser.add_argument("--timeout", type=float, default=3.0)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        questions = (list(json.load(f)) + UNKNOWN_QUESTIONS) * args.repeats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = FixtureBackend(FIXTURES, latency=args.latency, timeout=args.timeout,
+                                 max_concurrency=args.max_concurrency)
+        backend = SQLiteCacheBackend(fixture, path=os.path.join(tmp, "web_cache.sqlite3"))
+        print(f"{len(questions)} searches per round, {args.clients} clients, "
+              f"{args.latency:.2f}s per fixture call, limit {args.max_concurrency} in flight")
+        for name in ("cold cache", "warm cache"):
+            outcome = run_round(backend, questions, args.clients)
+            print(f"{name}: {outcome['seconds']:.2f}s · answered {outcome['answered']} · "
+                  f"empty {outcome['empty']} · failed {outcome['failed']}")
+            print_stats(backend)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""BM25 ranking over Arabic-normalized tokens.
+
+Every transcript is tokenized once with arabic_text.tokenize and kept as a
+stream of term ids.  The BM25 weight of every (segment, term) pair is
+precomputed into a sparse column-major matrix, so scoring a question is one
+column slice and one matrix-vector product in NumPy/SciPy, and scoring a
+few ranges of segments reads only their part of each term's postings.  ``updated``
+reuses the token streams of unchanged segments, so a refresh only tokenizes
+new or changed transcripts.
+"""
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from arabic_text import tokenize
+
+K1 = 1.5
+B = 0.75
+# Scores are divided by the best score the question could reach, so this
+# threshold means the same thing for short and long questions
+MIN_SCORE = 0.1
+
+
+def row_positions(offsets: np.ndarray, rows) -> np.ndarray:
+    """Positions in a flat array of rows ``rows`` (in that order), where row r is offsets[r]..offsets[r + 1]"""
+    rows = np.asarray(rows, dtype=np.int64)
+    lengths = offsets[rows + 1] - offsets[rows]
+    firsts = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=firsts[1:])
+    return np.repeat(offsets[rows] - firsts, lengths) + np.arange(int(lengths.sum()))
+
+
+class BM25Index:
+    """Normalized token streams plus precomputed BM25 term weights"""
+
+    def __init__(self, vocabulary: dict, token_ids: np.ndarray, offsets: np.ndarray):
+        self.vocabulary = vocabulary
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self._compute_weights()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def build(cls, transcriptions):
+        """Tokenize every segment once into one contiguous id stream"""
+        vocabulary = {}
+        token_ids, lengths = _tokenize(transcriptions, vocabulary)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(vocabulary, token_ids, offsets)
+
+    def updated(self, keep_rows, transcriptions):
+        """New index over the segments ``keep_rows`` (in that order) followed by ``transcriptions``
+
+        Only ``transcriptions`` are tokenized.  Terms that no segment uses any
+        more are dropped, so the weights and scores are those of a fresh build
+        over the same segments.
+        """
+        vocabulary = dict(self.vocabulary)
+        new_ids, new_lengths = _tokenize(transcriptions, vocabulary)
+        kept_ids = self.token_ids[row_positions(self.offsets, keep_rows)]
+        token_ids = np.concatenate([kept_ids, new_ids])
+        lengths = np.concatenate([np.diff(self.offsets)[np.asarray(keep_rows, dtype=np.int64)], new_lengths])
+
+        used = np.bincount(token_ids, minlength=len(vocabulary)) > 0
+        if not used.all():
+            new_id = (np.cumsum(used) - 1).astype(np.int32)
+            vocabulary = {term: int(new_id[i]) for term, i in vocabulary.items() if used[i]}
+            token_ids = new_id[token_ids]
+
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return BM25Index(vocabulary, token_ids.astype(np.int32), offsets)
+
+    def tokens(self, doc_id: int) -> np.ndarray:
+        """Term ids of one segment, in reading order"""
+        return self.token_ids[self.offsets[doc_id]:self.offsets[doc_id + 1]]
+
+    def _compute_weights(self):
+        n_docs = len(self)
+        doc_len = np.diff(self.offsets).astype(np.float64)
+        rows = np.repeat(np.arange(n_docs), np.diff(self.offsets))
+        # Duplicate (row, term) entries are summed into term frequencies
+        tf = sparse.csr_matrix(
+            (np.ones(len(self.token_ids)), (rows, self.token_ids)),
+            shape=(n_docs, len(self.vocabulary))
+        )
+        tf.sum_duplicates()
+
+        doc_freq = np.bincount(tf.indices, minlength=len(self.vocabulary))
+        self.idf = np.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        avg_len = doc_len.mean() if n_docs else 0.0
+        length_norm = K1 * (1 - B + B * doc_len / avg_len) if avg_len else np.full(n_docs, K1)
+        row_of_entry = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+        tf.data = self.idf[tf.indices] * tf.data * (K1 + 1) / (tf.data + length_norm[row_of_entry])
+        self.weights = tf.tocsc()
+
+    def _query(self, question: str):
+        """(term ids, counts) of the question's known terms, or None"""
+        query = Counter(self.vocabulary[t] for t in tokenize(question) if t in self.vocabulary)
+        if not query:
+            return None
+        return (np.fromiter(query.keys(), dtype=np.int64, count=len(query)),
+                np.fromiter(query.values(), dtype=np.float64, count=len(query)))
+
+    def scores(self, question: str) -> np.ndarray:
+        """BM25 score of every segment, divided by the question's best possible score"""
+        query = self._query(question)
+        if query is None:
+            return np.zeros(len(self))
+
+        term_ids, query_tf = query
+        scores = self.weights[:, term_ids] @ query_tf
+        # Each term contributes less than idf * (K1 + 1) per occurrence in the question
+        return scores / (self.idf[term_ids] * (K1 + 1) * query_tf).sum()
+
+    def range_scores(self, question: str, firsts: np.ndarray, lasts: np.ndarray) -> np.ndarray:
+        """``scores(question)`` of rows firsts[i]..lasts[i] of every range, concatenated
+
+        Each question term's postings are binary-searched for the ranges, so
+        only the entries inside them are read.
+        """
+        firsts, lasts = np.asarray(firsts, dtype=np.int64), np.asarray(lasts, dtype=np.int64)
+        lengths = lasts - firsts
+        scores = np.zeros(int(lengths.sum()))
+        query = self._query(question)
+        if query is None or not len(scores):
+            return scores
+
+        term_ids, query_tf = query
+        # Where each range's rows start in ``scores``
+        bases = (np.concatenate([[0], np.cumsum(lengths)[:-1]]) - firsts).tolist()
+        indptr, indices, data = self.weights.indptr, self.weights.indices, self.weights.data
+        bounds = np.concatenate([firsts, lasts])
+        for term, tf in zip(term_ids.tolist(), query_tf.tolist()):
+            lo, hi = int(indptr[term]), int(indptr[term + 1])
+            found = (np.searchsorted(indices[lo:hi], bounds) + lo).tolist()
+            for base, begin, end in zip(bases, found[:len(firsts)], found[len(firsts):]):
+                if end > begin:
+                    scores[base + indices[begin:end]] += data[begin:end] * tf
+        # Each term contributes less than idf * (K1 + 1) per occurrence in the question
+        return scores / (self.idf[term_ids] * (K1 + 1) * query_tf).sum()
+
+    def search(self, question: str, transcriptions, top_k: int = 3, min_score: float = MIN_SCORE):
+        """Top segments by BM25, in the same format as smart_text_search"""
+        if len(self) == 0:
+            return []
+
+        scores = self.scores(question)
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        results = []
+        for idx in candidates:
+            results.append({
+                "text": transcriptions[idx]["content"],
+                "metadata": {"source": transcriptions[idx]["filename"]},
+                "score": float(scores[idx]),
+                "word_count": transcriptions[idx]["word_count"]
+            })
+        return results
+
+
+def _tokenize(transcriptions, vocabulary: dict) -> tuple:
+    """(term ids, tokens per segment) of some segments, adding new terms to ``vocabulary``"""
+    streams = [[vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(t["content"])]
+               for t in transcriptions]
+    lengths = np.fromiter((len(s) for s in streams), dtype=np.int64, count=len(streams))
+    token_ids = np.fromiter((i for s in streams for i in s), dtype=np.int32, count=int(lengths.sum()))
+    return token_ids, lengths
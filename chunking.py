@@ -0,0 +1,138 @@
+"""Overlapping sub-segment windows for snippet extraction.
+
+At ingest every transcript is cut into ~400-character windows that overlap
+by half, aligned to word boundaries.  The character offsets of each window
+are stored in NumPy arrays next to its normalized text, and the windows are
+indexed with BM25.  Answering a question then scores just the windows of
+the retrieved segments, from their stored tokens, and picks the best one of
+each, so the response builder only slices ``content[start:end]``.  Segments,
+not windows, stay the unit every retrieval mode ranks.  A refresh keeps the
+windows of unchanged transcripts (``updated``) and only cuts new ones.
+"""
+import re
+
+import numpy as np
+
+from arabic_text import normalize_arabic
+from bm25_index import BM25Index, row_positions
+
+WINDOW_CHARS = 400
+STRIDE_CHARS = 200
+WORD_PATTERN = re.compile(r'\S+')
+
+
+def window_spans(text: str, size: int = WINDOW_CHARS, stride: int = STRIDE_CHARS) -> list:
+    """(start, end) character offsets of overlapping windows over whole words"""
+    words = [(m.start(), m.end()) for m in WORD_PATTERN.finditer(text)]
+    if not words:
+        return []
+
+    spans = []
+    first = 0
+    while True:
+        start = words[first][0]
+        last = first
+        while last + 1 < len(words) and words[last + 1][1] - start <= size:
+            last += 1
+        spans.append((start, words[last][1]))
+        if last == len(words) - 1:
+            return spans
+        # Next window starts at the first word at least `stride` characters in
+        nxt = first + 1
+        while nxt <= last and words[nxt][0] - start < stride:
+            nxt += 1
+        first = nxt
+
+
+def window_snippet(text: str, start: int, end: int) -> str:
+    """Slice a window out of a transcript, marking cut-off ends with ..."""
+    snippet = text[start:end]
+    if start > 0:
+        snippet = "..." + snippet
+    if end < len(text):
+        snippet = snippet + "..."
+    return snippet
+
+
+def _cut(transcriptions) -> tuple:
+    """(windows per transcript, starts, ends, normalized texts) of some transcripts"""
+    counts, starts, ends, texts = [], [], [], []
+    for t in transcriptions:
+        content = t["content"]
+        spans = window_spans(content)
+        counts.append(len(spans))
+        for start, end in spans:
+            starts.append(start)
+            ends.append(end)
+            texts.append(normalize_arabic(content[start:end]))
+    return counts, starts, ends, texts
+
+
+class WindowIndex:
+    """Windows of every transcript, with offsets and a BM25 index over them
+
+    The windows of corpus document ``d`` are rows
+    ``doc_offsets[d]``..``doc_offsets[d + 1]``.
+    """
+
+    def __init__(self, doc_offsets: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 texts: list, filenames: list, bm25: BM25Index = None):
+        self.doc_offsets = doc_offsets
+        self.starts = starts
+        self.ends = ends
+        self.texts = texts
+        self.bm25 = bm25 if bm25 is not None else BM25Index.build({"content": text} for text in texts)
+        self._doc_of = {fn: doc_id for doc_id, fn in enumerate(filenames)}
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def build(cls, transcriptions):
+        """Cut every transcript into windows and store their offsets and normalized text"""
+        counts, starts, ends, texts = _cut(transcriptions)
+        doc_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=doc_offsets[1:])
+        return cls(doc_offsets, np.array(starts, dtype=np.int32), np.array(ends, dtype=np.int32),
+                   texts, [t["filename"] for t in transcriptions])
+
+    def updated(self, keep_rows, transcriptions, filenames: list):
+        """New index over the documents ``keep_rows`` (in that order) followed by ``transcriptions``
+
+        Kept documents reuse their windows and window tokens; ``filenames``
+        are those of the new corpus, in order.
+        """
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+        kept = row_positions(self.doc_offsets, keep_rows)
+        counts, starts, ends, texts = _cut(transcriptions)
+        lengths = np.concatenate([np.diff(self.doc_offsets)[keep_rows], np.array(counts, dtype=np.int64)])
+        doc_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=doc_offsets[1:])
+        return WindowIndex(
+            doc_offsets,
+            np.concatenate([self.starts[kept], np.array(starts, dtype=np.int32)]),
+            np.concatenate([self.ends[kept], np.array(ends, dtype=np.int32)]),
+            [self.texts[i] for i in kept.tolist()] + texts, filenames,
+            self.bm25.updated(kept, ({"content": text} for text in texts))
+        )
+
+    def attach_snippets(self, question: str, results: list) -> list:
+        """Add snippet_start/snippet_end of the best window to each search result"""
+        if not results or len(self) == 0:
+            return results
+
+        hits = [(result, self._doc_of.get(result["metadata"]["source"])) for result in results]
+        hits = [(result, doc_id) for result, doc_id in hits if doc_id is not None]
+        doc_ids = np.array([doc_id for _, doc_id in hits], dtype=np.int64)
+        firsts, lasts = self.doc_offsets[doc_ids], self.doc_offsets[doc_ids + 1]
+        # Only the hits' windows are scored, not the whole corpus's
+        window_scores = self.bm25.range_scores(question, firsts, lasts)
+
+        offset = 0
+        for (result, _), first, last in zip(hits, firsts.tolist(), lasts.tolist()):
+            if last > first:
+                # argmax keeps the earliest window on ties (and when nothing matched)
+                best = first + int(np.argmax(window_scores[offset:offset + last - first]))
+                result["snippet_start"], result["snippet_end"] = int(self.starts[best]), int(self.ends[best])
+            offset += last - first
+        return results
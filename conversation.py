@@ -0,0 +1,145 @@
+"""Bounded chat history of one session.
+
+The app used to keep every message in ``st.session_state.messages``, each
+answer with full copies of the transcript texts behind it, and redrew all of
+them on every rerun.  A Conversation keeps only:
+
+- the last ``visible_turns`` messages, which are the ones rendered; their
+  sources are references (file, video, timestamps, score) rather than
+  copies of the segment text
+- a rolling summary of older messages: as a message leaves the window it is
+  condensed to one short line, and the oldest lines are dropped once the
+  summary passes ``summary_budget`` characters
+
+So a session's memory stops growing once the window and the summary are
+full, however long the chat runs.  ``standalone_question`` rewrites a short
+follow-up ("why is it important?", "اشرح أكثر") with the topic of the previous
+question, the job of the notebook's condense prompt, without a model.
+"""
+import re
+from collections import deque
+
+from arabic_text import TOKEN_PATTERN, tokenize
+
+VISIBLE_TURNS = 20
+SUMMARY_BUDGET = 2000
+# Words kept of a message when it is condensed into the summary
+GIST_WORDS = 20
+# Words of the previous question added to a follow-up
+TOPIC_WORDS = 4
+# Topic words a question that refers back may name and still be a follow-up
+FOLLOW_UP_TOPICS = 2
+# Metadata kept in a transcript source reference: enough to label it and play from it
+REF_KEYS = ("source", "video_id", "video_title", "start_sec", "end_sec")
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+# Pronouns and demonstratives that point back at the previous exchange
+FOLLOW_UP_MARKERS = frozenset(tokenize(
+    "هذا هذه ذلك تلك ده دي دا دول وده ودي كده عنه عنها منه منها فيه فيها كمان ايضا أكثر تاني "
+    "it its they them their this that these those more also else"
+))
+# Words that carry no topic of their own ("ما هي" asks, it does not refer back)
+QUESTION_WORDS = frozenset(tokenize(
+    "هو هي هم ما ماذا لماذا ليه ازاي إزاي كيف هل متى فين أين من مين اشرح اشرحها وضح يعني و في على عن "
+    "what why how when where who which is are was were do does did can the a an of to and in on "
+    "explain tell me about please"
+))
+
+
+def source_ref(result: dict) -> dict:
+    """A search result without its text"""
+    if "metadata" in result:
+        metadata = result["metadata"]
+        return {
+            "metadata": {key: metadata[key] for key in REF_KEYS if key in metadata},
+            "word_count": result.get("word_count"),
+            "score": result.get("score"),
+        }
+    return {"title": result.get("title", ""), "href": result.get("href", "")}
+
+
+def gist(text: str, words: int = GIST_WORDS) -> str:
+    """First words of a message's plain text, without markup or source headings"""
+    lines = [line for line in _HTML_TAG.sub(" ", text).splitlines()
+             if line.strip() and "**" not in line and not line.rstrip().endswith(":")]
+    tokens = " ".join(lines).split()
+    return " ".join(tokens[:words]) + (" …" if len(tokens) > words else "")
+
+
+def topic_tokens(text: str) -> list:
+    """Normalized words of a question that are not question words or back-references"""
+    return [t for t in tokenize(text) if t not in QUESTION_WORDS and t not in FOLLOW_UP_MARKERS]
+
+
+class Conversation:
+    """Visible window of messages plus a size-bounded rolling summary of older ones"""
+
+    def __init__(self, visible_turns: int = VISIBLE_TURNS, summary_budget: int = SUMMARY_BUDGET):
+        self.visible_turns = visible_turns
+        self.summary_budget = summary_budget
+        self.messages = deque()
+        self.summary = deque()
+        self.turns = 0
+        self.condensed = 0
+        self.last_question = None  # standalone form of the latest question
+        self._summary_chars = 0
+
+    def __len__(self):
+        return self.turns
+
+    def add_user(self, content: str, query: str = None):
+        """Record a question; ``query`` is its standalone form when that differs"""
+        message = {"role": "user", "content": content}
+        if query and query != content:
+            message["query"] = query
+        self.last_question = query or content
+        self._append(message)
+
+    def add_assistant(self, content: str, source: str, sources: list, timings: dict = None):
+        message = {"role": "assistant", "content": content, "source": source,
+                   "sources": [source_ref(s) for s in sources]}
+        if timings:
+            message["timings"] = timings
+        self._append(message)
+
+    def _append(self, message: dict):
+        # Message number, stable while the window slides (widget keys use it)
+        message["n"] = self.turns
+        self.turns += 1
+        self.messages.append(message)
+        while len(self.messages) > self.visible_turns:
+            self._condense(self.messages.popleft())
+
+    def _condense(self, message: dict):
+        """Fold a message that left the window into the summary"""
+        if message["role"] == "user":
+            line = f"❓ {gist(message.get('query', message['content']))}"
+        else:
+            line = f"💬 {gist(message['content'])}"
+        self.summary.append(line)
+        self._summary_chars += len(line)
+        self.condensed += 1
+        while self._summary_chars > self.summary_budget and len(self.summary) > 1:
+            self._summary_chars -= len(self.summary.popleft())
+
+    def standalone_question(self, question: str) -> str:
+        """``question``, or a follow-up with the previous question's topic words added
+
+        A question reads as a follow-up when it names no topic of its own
+        ("why?", "اشرح أكثر"), or refers back ("it", "ده", "more") and names
+        at most FOLLOW_UP_TOPICS topic words.
+        """
+        if not self.last_question:
+            return question
+        own = topic_tokens(question)
+        refers_back = any(t in FOLLOW_UP_MARKERS for t in tokenize(question))
+        if own and not (refers_back and len(own) <= FOLLOW_UP_TOPICS):
+            return question
+        topic = []
+        for word in TOKEN_PATTERN.findall(self.last_question):
+            tokens = topic_tokens(word)
+            if tokens and tokens[0] not in own and word not in topic:
+                topic.append(word)
+        if not topic:
+            return question
+        return f"{question} {' '.join(topic[:TOPIC_WORDS])}"
@@ -0,0 +1,355 @@
+"""Binary snapshot of a corpus and all of its indexes, for fast cold starts.
+
+Loading a transcript folder the usual way reads and hashes every file, then
+tokenizes every segment again for the keyword, BM25 and snippet-window
+indexes.  ``compile`` writes everything that work produces into one file,
+tfidf_index/corpus.snap (per video shard in a library):
+
+    b"VCSNAP\\0\\0"  uint32 version  uint32 header length  JSON header  arrays
+
+The JSON header holds the fingerprint and, per array, its dtype, shape and
+offset.  Every array starts on a 64-byte boundary: the segment texts as one
+UTF-8 blob plus an offsets array, word counts, the file manifest (names,
+sizes, mtimes, hashes), the TF-IDF counts, derived matrix and its
+postings with each term's top weight (for pruned top-k), the keyword
+postings, the BM25 token streams and weights, the segment timestamps and the
+snippet windows with their own BM25 index.  Lists of strings are stored the
+same way as the texts.
+
+A load maps the file and wraps the arrays without copying them (pages are
+shared by every process that maps the file).  It only stats the transcript
+files to check them against the manifest.  Any file added, removed, resized
+or touched since the compile makes the snapshot stale, and the corpus is
+read from the folder as before.  Re-run the compile after changing
+transcripts.
+
+    python corpus_snapshot.py compile                 # ./transcriptions
+    python corpus_snapshot.py compile --library ./library
+    python corpus_snapshot.py check
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+from scipy import sparse
+
+from bm25_index import BM25Index
+from chunking import WindowIndex
+from keyword_index import KeywordIndex
+from segment_store import SegmentStore
+from transcript_index import INDEX_FOLDER, NGRAM_RANGE, TfidfIndex
+
+SNAPSHOT_FILE = "corpus.snap"
+SNAPSHOT_MAGIC = b"VCSNAP\0\0"
+SNAPSHOT_VERSION = 2
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGN = 64
+
+
+def snapshot_path(index_folder: str = INDEX_FOLDER) -> str:
+    return os.path.join(index_folder, SNAPSHOT_FILE)
+
+
+def _pack_strings(strings: list) -> tuple:
+    """(UTF-8 blob, byte offsets) of a list of strings"""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[a:b].decode("utf-8") for a, b in zip(bounds, bounds[1:])]
+
+
+def _restore(cls, **attributes):
+    """Instance of an index class with the attributes its __init__ would have computed"""
+    obj = cls.__new__(cls)
+    obj.__dict__.update(attributes)
+    return obj
+
+
+class _Writer:
+    """Collects named arrays and writes them after the header"""
+
+    def __init__(self):
+        self.arrays = {}
+
+    def add(self, name: str, array):
+        self.arrays[name] = np.ascontiguousarray(array)
+
+    def strings(self, name: str, strings: list):
+        blob, offsets = _pack_strings(strings)
+        self.add(name, blob)
+        self.add(name + ".offsets", offsets)
+
+    def matrix(self, name: str, matrix):
+        self.add(name + ".data", matrix.data)
+        self.add(name + ".indices", matrix.indices)
+        self.add(name + ".indptr", matrix.indptr)
+
+    def bm25(self, name: str, index: BM25Index):
+        self.strings(name + ".vocabulary", list(index.vocabulary))
+        self.add(name + ".token_ids", index.token_ids)
+        self.add(name + ".offsets", index.offsets)
+        self.add(name + ".idf", index.idf)
+        self.matrix(name + ".weights", index.weights)
+
+    def write(self, path: str, header: dict):
+        layout, position = {}, 0
+        for name, array in self.arrays.items():
+            position = -(-position // _ALIGN) * _ALIGN
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+            position += array.nbytes
+        header = json.dumps(dict(header, arrays=layout), ensure_ascii=False).encode("utf-8")
+        start = -(-(_PREAMBLE.size + len(header)) // _ALIGN) * _ALIGN
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            for name, array in self.arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(array.tobytes())
+        # A running server may have the old snapshot mapped; it keeps the old inode
+        os.replace(tmp_path, path)
+
+
+class _Reader:
+    """Zero-copy views of the arrays of a mapped snapshot"""
+
+    def __init__(self, buffer, header: dict, start: int):
+        self.buffer = buffer
+        self.layout = header["arrays"]
+        self.start = start
+
+    def get(self, name: str) -> np.ndarray:
+        spec = self.layout[name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        offset = self.start + spec["offset"]
+        if offset + count * dtype.itemsize > len(self.buffer):
+            raise ValueError(f"Snapshot array {name} runs past the end of the file")
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset).reshape(spec["shape"])
+
+    def strings(self, name: str) -> list:
+        return _unpack_strings(self.get(name), self.get(name + ".offsets"))
+
+    def matrix(self, name: str, shape: tuple, kind=sparse.csr_matrix):
+        return kind((self.get(name + ".data"), self.get(name + ".indices"), self.get(name + ".indptr")),
+                    shape=shape, copy=False)
+
+    def bm25(self, name: str, n_docs: int) -> BM25Index:
+        vocabulary = {term: i for i, term in enumerate(self.strings(name + ".vocabulary"))}
+        return _restore(BM25Index, vocabulary=vocabulary, token_ids=self.get(name + ".token_ids"),
+                        offsets=self.get(name + ".offsets"), idf=self.get(name + ".idf"),
+                        weights=self.matrix(name + ".weights", (n_docs, len(vocabulary)), sparse.csc_matrix))
+
+
+def compile_snapshot(corpus, manifest: dict, path: str):
+    """Write ``corpus`` (a Corpus built by TranscriptUpdater) and its file manifest to ``path``"""
+    index = corpus.index
+    if index is None or corpus.keyword_index is None or corpus.windows is None:
+        raise ValueError("Only a corpus loaded by TranscriptUpdater can be compiled")
+    transcriptions = corpus.transcriptions
+    writer = _Writer()
+
+    writer.strings("docs.names", [t["filename"] for t in transcriptions])
+    writer.strings("docs.text", [t["content"] for t in transcriptions])
+    writer.add("docs.word_counts", np.array([t["word_count"] for t in transcriptions], dtype=np.int64))
+
+    names = sorted(manifest)
+    writer.strings("manifest.names", names)
+    writer.add("manifest.size", np.array([manifest[fn]["size"] for fn in names], dtype=np.int64))
+    writer.add("manifest.mtime", np.array([manifest[fn]["mtime"] for fn in names], dtype=np.int64))
+    writer.add("manifest.sha1", np.array([manifest[fn]["sha1"] for fn in names], dtype="S40"))
+
+    writer.strings("tfidf.terms", index.terms)
+    writer.matrix("tfidf.counts", index.counts)
+    writer.add("tfidf.idf", index.idf)
+    writer.matrix("tfidf.matrix", index.matrix)
+    writer.matrix("tfidf.postings", index.postings)
+    writer.add("tfidf.max_weights", index.max_weights)
+    term_ids = {term: col for col, term in enumerate(index.terms)}
+    writer.add("tfidf.features", np.array([term_ids[t] for t in index.vocabulary], dtype=np.int64))
+
+    keyword_index = corpus.keyword_index
+    writer.strings("keyword.terms", list(keyword_index.term_slots))
+    writer.add("keyword.offsets", keyword_index.offsets)
+    writer.add("keyword.postings", keyword_index.postings)
+
+    writer.bm25("bm25", corpus.bm25_index)
+
+    writer.add("segments.starts", corpus.segments.starts)
+    writer.add("segments.ends", corpus.segments.ends)
+    writer.add("segments.doc_ids", corpus.segments.doc_ids)
+
+    windows = corpus.windows
+    writer.add("windows.doc_offsets", windows.doc_offsets)
+    writer.add("windows.starts", windows.starts)
+    writer.add("windows.ends", windows.ends)
+    writer.strings("windows.texts", windows.texts)
+    writer.bm25("windows.bm25", windows.bm25)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer.write(path, {
+        "fingerprint": index.fingerprint,
+        "documents": len(transcriptions),
+        "counts_shape": list(index.counts.shape),
+        "matrix_shape": list(index.matrix.shape),
+    })
+
+
+def _open(path: str):
+    """(mapped buffer, header, data start), or None if the file is missing or not a snapshot"""
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            return None
+        header = json.loads(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    except (struct.error, ValueError):
+        return None
+    start = -(-(_PREAMBLE.size + header_length) // _ALIGN) * _ALIGN
+    return buffer, header, start
+
+
+def stale_files(manifest: dict, folder: str) -> list:
+    """Transcript files added, removed, resized or modified since ``manifest`` was taken"""
+    try:
+        on_disk = {entry.name: entry for entry in os.scandir(folder) if entry.name.endswith(".txt")}
+    except OSError:
+        on_disk = {}
+    stale = sorted(set(manifest) ^ set(on_disk))
+    for fn in sorted(set(manifest) & set(on_disk)):
+        try:
+            stat = on_disk[fn].stat()
+        except OSError:
+            stale.append(fn)
+            continue
+        if stat.st_size != manifest[fn]["size"] or stat.st_mtime_ns != manifest[fn]["mtime"]:
+            stale.append(fn)
+    return stale
+
+
+def load_snapshot(path: str, folder: str):
+    """(corpus parts, manifest, hashes) from a snapshot that matches ``folder``, else None
+
+    The parts are keyword arguments for Corpus (transcriptions, index,
+    keyword_index, bm25_index, segments, windows); ``hashes`` are the
+    content hashes of the transcriptions, in corpus order.
+    """
+    opened = _open(path)
+    if opened is None:
+        return None
+    buffer, header, start = opened
+    reader = _Reader(buffer, header, start)
+    try:
+        names = reader.strings("manifest.names")
+        sizes = reader.get("manifest.size").tolist()
+        mtimes = reader.get("manifest.mtime").tolist()
+        sha1s = [h.decode("ascii") for h in reader.get("manifest.sha1").tolist()]
+        manifest = {fn: {"path": os.path.join(folder, fn), "size": size, "mtime": mtime, "sha1": sha1}
+                    for fn, size, mtime, sha1 in zip(names, sizes, mtimes, sha1s)}
+        if stale_files(manifest, folder):
+            return None
+
+        filenames = reader.strings("docs.names")
+        transcriptions = [
+            {"filename": fn, "content": content, "word_count": words}
+            for fn, content, words in zip(filenames, reader.strings("docs.text"),
+                                          reader.get("docs.word_counts").tolist())
+        ]
+        n_docs = len(transcriptions)
+
+        terms = reader.strings("tfidf.terms")
+        vocabulary = {terms[col]: i for i, col in enumerate(reader.get("tfidf.features").tolist())}
+        from sklearn.feature_extraction.text import CountVectorizer
+        index = _restore(
+            TfidfIndex, terms=terms, filenames=filenames, fingerprint=header["fingerprint"],
+            counts=reader.matrix("tfidf.counts", tuple(header["counts_shape"])),
+            idf=reader.get("tfidf.idf"), matrix=reader.matrix("tfidf.matrix", tuple(header["matrix_shape"])),
+            postings=reader.matrix("tfidf.postings", tuple(header["matrix_shape"]), sparse.csc_matrix),
+            max_weights=reader.get("tfidf.max_weights"),
+            vocabulary=vocabulary, _counter=CountVectorizer(vocabulary=vocabulary, ngram_range=NGRAM_RANGE)
+        )
+
+        keyword_terms = reader.strings("keyword.terms")
+        keyword_index = _restore(
+            KeywordIndex, term_slots={term: slot for slot, term in enumerate(keyword_terms)},
+            offsets=reader.get("keyword.offsets"), postings=reader.get("keyword.postings"), n_docs=n_docs
+        )
+
+        segments = SegmentStore(reader.get("segments.starts"), reader.get("segments.ends"),
+                                reader.get("segments.doc_ids"), filenames)
+
+        window_texts = reader.strings("windows.texts")
+        windows = _restore(
+            WindowIndex, doc_offsets=reader.get("windows.doc_offsets"), starts=reader.get("windows.starts"),
+            ends=reader.get("windows.ends"), texts=window_texts,
+            bm25=reader.bm25("windows.bm25", len(window_texts)),
+            _doc_of={fn: doc_id for doc_id, fn in enumerate(filenames)}
+        )
+        parts = {
+            "transcriptions": transcriptions,
+            "index": index,
+            "keyword_index": keyword_index,
+            "bm25_index": reader.bm25("bm25", n_docs),
+            "segments": segments,
+            "windows": windows,
+        }
+    except (KeyError, ValueError, UnicodeDecodeError):
+        return None
+    return parts, manifest, [manifest[fn]["sha1"] for fn in filenames]
+
+
+def main():
+    # transcript_manifest imports this module
+    from dense_index import DENSE_FOLDER
+    from transcript_manifest import TRANSCRIPTIONS_FOLDER, TranscriptUpdater
+    from video_library import VideoLibrary
+
+    parser = argparse.ArgumentParser(description="Compile or check binary corpus snapshots")
+    parser.add_argument("command", choices=("compile", "check"))
+    parser.add_argument("--folder", default=TRANSCRIPTIONS_FOLDER)
+    parser.add_argument("--index-folder", default=INDEX_FOLDER)
+    parser.add_argument("--library", help="every video of this library instead of --folder")
+    args = parser.parse_args()
+
+    if args.library:
+        library = VideoLibrary(args.library)
+        shards = [(video_id,) + library.folders(video_id) for video_id in library.videos]
+    else:
+        shards = [(args.folder, args.folder, args.index_folder, DENSE_FOLDER)]
+
+    for name, folder, index_folder, dense_folder in shards:
+        path = snapshot_path(index_folder)
+        if args.command == "check":
+            opened = load_snapshot(path, folder)
+            state = "missing or stale" if opened is None else f"valid, {len(opened[0]['transcriptions'])} segments"
+            print(f"{'✅' if opened else '❌'} {name}: {path} {state}")
+            continue
+        updater = TranscriptUpdater(folder, index_folder, dense_folder)
+        updater.refresh()
+        if updater.errors:
+            # Unreadable files are not in the manifest, so the snapshot would never validate
+            for fn, error in updater.errors:
+                print(f"❌ Error loading {fn}: {error}")
+            print(f"❌ {name}: not compiled")
+            continue
+        compile_snapshot(updater.corpus, updater.manifest, path)
+        print(f"✅ {name}: {len(updater.transcriptions)} segments -> {path} "
+              f"({os.path.getsize(path) / 2 ** 20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+"""Dense-vector retrieval without LangChain, Ollama or pickle on the hot path.
+
+The index is a folder of plain files:
+
+- vectors.npy: float32 matrix, one L2-normalized row per transcript,
+  loaded with ``mmap_mode="r"`` so every process shares the page cache
+- docstore.json: filenames, content hashes and word counts of the rows
+- meta.json: format version, the name of the embedder the rows came from
+  and its answer-vs-web thresholds for dense and hybrid search
+
+A question is embedded once and scored against every row with one
+matrix-vector product (cosine similarity), followed by an argpartition
+top-k.  Embedders are pluggable: HashingEmbedder is a deterministic local
+stand-in that needs nothing but NumPy; OllamaEmbedder calls a local Ollama
+server over HTTP for the nomic-embed-text vectors of the old faiss_index.
+
+Each embedder scores on its own scale, so the thresholds below which a
+question falls back to the web are per embedder.  The hashing embedder's
+are built in; ``convert`` calibrates the converted vectors' on the labelled
+questions of benchmarks/queries.json and benchmarks/off_topic.json, and an
+index without thresholds cannot be searched until ``calibrate`` is run.
+
+    python dense_index.py convert    # faiss_index/ -> dense_index/ (one-time)
+    python dense_index.py calibrate  # re-pick dense_index/'s thresholds (needs its embedder)
+    python dense_index.py build      # embed ./transcriptions with the hashing embedder
+"""
+import argparse
+import json
+import os
+import pickle
+import struct
+import zlib
+
+import numpy as np
+
+from arabic_text import tokenize
+
+DENSE_FOLDER = r"./dense_index"
+FAISS_FOLDER = r"./faiss_index"
+DENSE_VERSION = 1
+# Calibrated for the hashing embedder on benchmarks/queries.json; off-topic
+# questions score below them and fall back to the web
+MIN_SIMILARITY = 0.15
+HYBRID_MIN_SCORE = 0.16
+CALIBRATION_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+HASHING_DIM = 512
+OLLAMA_URL = "http://localhost:11434"
+OLLAMA_MODEL = "nomic-embed-text"
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (words + character trigrams)
+
+    No model and no network: the same text always gives the same vector, so
+    it doubles as a test stand-in for a real embedding model.
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self._features = {}  # token -> (bucket ids, signs)
+
+    def _token_features(self, token: str):
+        cached = self._features.get(token)
+        if cached is None:
+            padded = f"<{token}>"
+            features = [token] + [padded[i:i + 3] for i in range(len(padded) - 2)] if len(token) > 3 else [token]
+            hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in features], dtype=np.int64)
+            weights = np.where((hashes // self.dim) % 2 == 0, 1.0, -1.0)
+            weights[1:] *= 0.5  # whole words count more than their trigrams
+            cached = self._features[token] = (hashes % self.dim, weights)
+        return cached
+
+    def embed(self, texts: list) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float64)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                buckets, weights = self._token_features(token)
+                np.add.at(vectors[row], buckets, weights)
+        # Sublinear term frequency, like TF-IDF's log scaling
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return _normalize_rows(vectors)
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama server (the model the faiss_index was built with)"""
+
+    def __init__(self, model: str = OLLAMA_MODEL, url: str = OLLAMA_URL, timeout: float = 30.0):
+        self.model = model
+        self.url = url
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        import requests
+        response = requests.post(f"{self.url}/api/embed", json={"model": self.model, "input": list(texts)},
+                                 timeout=self.timeout)
+        response.raise_for_status()
+        return _normalize_rows(np.array(response.json()["embeddings"], dtype=np.float64))
+
+
+def create_embedder(name: str):
+    """Embedder from its name in meta.json: "hashing-<dim>" or "ollama:<model>" """
+    if name.startswith("hashing-"):
+        return HashingEmbedder(int(name.split("-", 1)[1]))
+    if name.startswith("ollama:"):
+        return OllamaEmbedder(name.split(":", 1)[1])
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+def default_thresholds(name: str):
+    """{"dense", "hybrid"} thresholds of a built-in embedder, or None"""
+    if name.startswith("hashing-"):
+        return {"dense": MIN_SIMILARITY, "hybrid": HYBRID_MIN_SCORE}
+    return None
+
+
+class DenseIndex:
+    """Normalized document vectors plus the docstore that names their rows"""
+
+    def __init__(self, vectors: np.ndarray, filenames: list, hashes: list, word_counts: list, embedder,
+                 thresholds: dict = None):
+        self.vectors = vectors
+        self.filenames = filenames
+        self.hashes = hashes
+        self.word_counts = word_counts
+        self.embedder = embedder
+        self.thresholds = thresholds if thresholds is not None else default_thresholds(embedder.name)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    @classmethod
+    def build(cls, transcriptions, embedder=None):
+        """Embed every transcript"""
+        # Ingest-only imports keep loading an index cheap (transcript_index pulls in scikit-learn)
+        from transcript_index import content_hash
+        embedder = embedder or HashingEmbedder()
+        transcriptions = list(transcriptions)
+        vectors = embedder.embed([t["content"] for t in transcriptions]) if transcriptions \
+            else np.zeros((0, getattr(embedder, "dim", 0)), dtype=np.float32)
+        return cls(vectors, [t["filename"] for t in transcriptions],
+                   [content_hash(t["content"]) for t in transcriptions],
+                   [t["word_count"] for t in transcriptions], embedder)
+
+    def updated(self, transcriptions):
+        """Index for a new transcript set, embedding only new or changed texts
+
+        Rows come out in the order of ``transcriptions``.
+        """
+        from transcript_index import content_hash
+        transcriptions = list(transcriptions)
+        row_of = {(fn, sha1): row for row, (fn, sha1) in enumerate(zip(self.filenames, self.hashes))}
+        hashes = [content_hash(t["content"]) for t in transcriptions]
+        rows = [row_of.get((t["filename"], sha1)) for t, sha1 in zip(transcriptions, hashes)]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if not missing and rows == list(range(len(self))):
+            return self
+
+        vectors = np.empty((len(transcriptions), self.vectors.shape[1]), dtype=np.float32)
+        kept = [i for i, row in enumerate(rows) if row is not None]
+        vectors[kept] = self.vectors[[rows[i] for i in kept]]
+        if missing:
+            vectors[missing] = self.embedder.embed([transcriptions[i]["content"] for i in missing])
+        return DenseIndex(vectors, [t["filename"] for t in transcriptions], hashes,
+                          [t["word_count"] for t in transcriptions], self.embedder, self.thresholds)
+
+    def save(self, folder: str = DENSE_FOLDER):
+        """Write the three files, replacing old ones atomically (they may be memory-mapped)"""
+        os.makedirs(folder, exist_ok=True)
+        files = {
+            "vectors.npy": lambda f: np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32)),
+            "docstore.json": lambda f: f.write(json.dumps({
+                "filenames": self.filenames, "hashes": self.hashes, "word_counts": self.word_counts
+            }, ensure_ascii=False).encode("utf-8")),
+            "meta.json": lambda f: f.write(json.dumps({
+                "version": DENSE_VERSION, "embedder": self.embedder.name,
+                "count": len(self), "dim": int(self.vectors.shape[1]), "thresholds": self.thresholds
+            }).encode("utf-8")),
+        }
+        for name, write in files.items():
+            path = os.path.join(folder, name)
+            with open(path + ".tmp", "wb") as f:
+                write(f)
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, folder: str = DENSE_FOLDER, mmap: bool = True):
+        """Saved index with its vectors memory-mapped, or None if missing or outdated"""
+        try:
+            with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != DENSE_VERSION:
+                return None
+            with open(os.path.join(folder, "docstore.json"), "r", encoding="utf-8") as f:
+                docstore = json.load(f)
+            vectors = np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r" if mmap else None)
+            if vectors.shape[0] != len(docstore["filenames"]):
+                return None
+            thresholds = meta.get("thresholds")
+            if thresholds is not None:
+                thresholds = {mode: float(thresholds[mode]) for mode in ("dense", "hybrid")}
+            return cls(vectors, docstore["filenames"], docstore["hashes"], docstore["word_counts"],
+                       create_embedder(meta["embedder"]), thresholds)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Missing, truncated or hand-edited files: rebuild rather than fail
+            return None
+
+    def min_score(self, mode: str) -> float:
+        """This embedder's threshold for "dense" or "hybrid" search"""
+        if self.thresholds is None:
+            raise ValueError(f"No thresholds calibrated for {self.embedder.name}; run: python dense_index.py calibrate")
+        return self.thresholds[mode]
+
+    def scores(self, question: str) -> np.ndarray:
+        """Cosine similarity of the question to every row"""
+        query = self.embedder.embed([question])[0]
+        return self.vectors @ query
+
+    def search(self, question: str, transcriptions, top_k: int = 3, min_score: float = None):
+        """Top segments by cosine similarity, in the same format as smart_text_search
+
+        Rows are aligned with ``transcriptions`` (see ``updated``).  The
+        threshold defaults to the embedder's calibrated one.
+        """
+        if len(self) == 0:
+            return []
+        if min_score is None:
+            min_score = self.min_score("dense")
+
+        scores = self.scores(question)
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+
+        results = []
+        for idx in candidates:
+            results.append({
+                "text": transcriptions[idx]["content"],
+                "metadata": {"source": transcriptions[idx]["filename"]},
+                "score": float(scores[idx]),
+                "word_count": transcriptions[idx]["word_count"]
+            })
+        return results
+
+
+def best_threshold(on_topic: np.ndarray, off_topic: np.ndarray) -> tuple:
+    """(threshold, correct) that keeps the most on-topic best scores above it and off-topic ones at or below"""
+    edges = np.unique(np.concatenate([on_topic, off_topic]))
+    # Candidates halfway between neighbouring best scores, plus "answer all" and "answer none"
+    thresholds = np.concatenate([edges[:1] - 1e-6, (edges[:-1] + edges[1:]) / 2, edges[-1:]])
+    correct = [(on_topic > t).sum() + (off_topic <= t).sum() for t in thresholds]
+    best = int(np.argmax(correct))
+    return float(thresholds[best]), int(correct[best])
+
+
+def calibrate(index: DenseIndex, transcriptions: list, queries: list = None, off_topic: list = None) -> dict:
+    """Dense and hybrid thresholds for the index's embedder
+
+    ``transcriptions`` are the index's rows, from the bundled video: the
+    labelled questions (benchmarks/queries.json) should be answered from
+    them and the off-topic ones (benchmarks/off_topic.json) should not.
+    Every question is embedded once.
+    """
+    from hybrid_search import HybridRanker
+    from transcript_index import TfidfIndex
+    if queries is None:
+        with open(os.path.join(CALIBRATION_FOLDER, "queries.json"), "r", encoding="utf-8") as f:
+            queries = json.load(f)
+    if off_topic is None:
+        with open(os.path.join(CALIBRATION_FOLDER, "off_topic.json"), "r", encoding="utf-8") as f:
+            off_topic = json.load(f)
+
+    ranker = HybridRanker(TfidfIndex.build(transcriptions), index)
+    best = {"dense": [], "hybrid": []}
+    for question in [q["question"] for q in queries] + list(off_topic):
+        lexical, dense = ranker.component_scores(question)
+        best["dense"].append(dense.max())
+        best["hybrid"].append((ranker.lexical_weight * lexical + (1 - ranker.lexical_weight) * dense).max())
+    n = len(queries)
+    return {mode: best_threshold(np.array(scores[:n]), np.array(scores[n:]))[0] for mode, scores in best.items()}
+
+
+def read_faiss_flat(path: str) -> np.ndarray:
+    """Vectors of a faiss IndexFlatL2/IndexFlatIP file, read without faiss"""
+    with open(path, "rb") as f:
+        data = f.read()
+    fourcc = data[:4]
+    if fourcc not in (b"IxF2", b"IxFI"):
+        raise ValueError(f"Unsupported faiss index type {fourcc!r}; only flat indexes can be converted")
+    # Header: d, ntotal, two unused int64s, is_trained, metric_type; then the float count and floats
+    d, ntotal, _, _, _, _ = struct.unpack_from("<iqqqBi", data, 4)
+    (n_floats,) = struct.unpack_from("<Q", data, 37)
+    if n_floats != d * ntotal or len(data) < 45 + n_floats * 4:
+        raise ValueError("Corrupt faiss index: vector data does not match d * ntotal")
+    return np.frombuffer(data, dtype=np.float32, count=d * ntotal, offset=45).reshape(ntotal, d)
+
+
+class _PickledObject:
+    """Inert stand-in for the LangChain classes in index.pkl: keeps their state only"""
+
+    def __setstate__(self, state):
+        self.state = state
+
+
+class _DocstoreUnpickler(pickle.Unpickler):
+    """Reads LangChain's index.pkl without LangChain and without running its code"""
+
+    ALLOWED = {
+        ("langchain_community.docstore.in_memory", "InMemoryDocstore"),
+        ("langchain_core.documents.base", "Document"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) in self.ALLOWED:
+            return _PickledObject
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from index.pkl")
+
+
+def read_langchain_docstore(path: str) -> list:
+    """Page contents of a LangChain FAISS docstore, in vector order"""
+    with open(path, "rb") as f:
+        docstore, index_to_id = _DocstoreUnpickler(f).load()
+    documents = docstore.state["_dict"]
+    return [documents[index_to_id[i]].state["__dict__"]["page_content"] for i in range(len(index_to_id))]
+
+
+def read_transcriptions(folder: str) -> list:
+    """Non-empty transcripts of a folder, as the app reads them"""
+    transcriptions = []
+    for fn in sorted(os.listdir(folder)):
+        if fn.endswith(".txt"):
+            with open(os.path.join(folder, fn), "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                transcriptions.append({"filename": fn, "content": content, "word_count": len(content.split())})
+    return transcriptions
+
+
+def convert_faiss_index(faiss_folder: str = FAISS_FOLDER, transcriptions_folder: str = r"./transcriptions",
+                        out_folder: str = DENSE_FOLDER, embedder=None) -> DenseIndex:
+    """Convert faiss_index/ (index.faiss + index.pkl) into a dense_index/ folder
+
+    Each stored vector is matched to the transcript file with the same text.
+    Vectors whose text is no longer in ./transcriptions are dropped.  The
+    thresholds are calibrated with the embedder; if it cannot be reached the
+    index is saved without them (see ``calibrate``).
+    """
+    from transcript_index import content_hash
+    vectors = _normalize_rows(read_faiss_flat(os.path.join(faiss_folder, "index.faiss")))
+    contents = read_langchain_docstore(os.path.join(faiss_folder, "index.pkl"))
+
+    by_content = {}
+    for t in read_transcriptions(transcriptions_folder):
+        by_content.setdefault(t["content"], t)
+
+    rows, matched = [], []
+    for row, content in enumerate(contents):
+        t = by_content.get(content.strip())
+        if t is not None:
+            rows.append(row)
+            matched.append(t)
+    index = DenseIndex(vectors[rows], [t["filename"] for t in matched],
+                       [content_hash(t["content"]) for t in matched],
+                       [t["word_count"] for t in matched],
+                       embedder or OllamaEmbedder())
+    if index.thresholds is None:
+        try:
+            index.thresholds = calibrate(index, matched)
+        except (OSError, ValueError):
+            # e.g. the Ollama server is not running yet
+            pass
+    index.save(out_folder)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the dense_index/ folder")
+    parser.add_argument("command", choices=["convert", "calibrate", "build"])
+    parser.add_argument("--faiss-folder", default=FAISS_FOLDER)
+    parser.add_argument("--folder", default=r"./transcriptions")
+    parser.add_argument("--out", default=DENSE_FOLDER)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        index = convert_faiss_index(args.faiss_folder, args.folder, args.out)
+    elif args.command == "calibrate":
+        index = DenseIndex.load(args.out, mmap=False)
+        if index is None:
+            parser.error(f"No dense index in {args.out}")
+        by_name = {t["filename"]: t for t in read_transcriptions(args.folder)}
+        if any(fn not in by_name for fn in index.filenames):
+            parser.error(f"{args.out} has vectors for transcripts that are not in {args.folder}")
+        index.thresholds = calibrate(index, [by_name[fn] for fn in index.filenames])
+        index.save(args.out)
+    else:
+        index = DenseIndex.build(read_transcriptions(args.folder))
+        index.save(args.out)
+    print(f"✅ {len(index)} vectors ({index.embedder.name}, {index.vectors.shape[1]} dims) saved to {args.out}")
+    if index.thresholds is None:
+        print(f"⚠️ Thresholds not calibrated ({index.embedder.name} unreachable?); dense and hybrid search "
+              f"use TF-IDF until: python dense_index.py calibrate")
+    else:
+        print(f"   thresholds: dense {index.thresholds['dense']:.3f}, hybrid {index.thresholds['hybrid']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
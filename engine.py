@@ -0,0 +1,599 @@
+"""Headless retrieval and response engine of the Video Chat Assistant.
+
+Everything the chat needs except the UI: the video library and its index
+shards, the retrieval modes, the query cache, the web fallback and the
+response builders (transcript snippets, or an answer generated by the
+local LLM from them, see llm_answer.py).  Every answer is traced (see
+tracing.py); the spans and counters feed /stats and /metrics.  The Streamlit app and the HTTP API (engine_api.py) are
+both thin clients of VideoChatEngine; its public methods take and return
+plain JSON-compatible values.  Nothing here draws to the screen: problems
+are returned as messages in ``errors``/``warnings`` lists.
+"""
+import heapq
+import time
+
+from bm25_index import BM25Index
+from chunking import WindowIndex, window_snippet
+from hybrid_search import HybridRanker
+from keyword_index import KeywordIndex
+from llm_answer import DEFAULT_ANSWER_MODE, AnswerGenerator, LLMError
+from query_cache import QueryCache, lexical_query, normalize_query, verbatim_query
+from retrieval_pipeline import STRATEGIES, RetrievalOrchestrator, vocabulary_coverage
+from segment_store import SegmentStore, format_timestamp
+from shared_corpus import Corpus
+from tracing import Metrics, Trace, profiler_from_env
+from transcript_index import TfidfIndex
+from video_library import VideoLibrary
+from web_rerank import WebReranker
+from web_search import backend_from_env
+
+# Seconds between checks of a video's transcripts for added, changed or removed files
+TRANSCRIPT_REFRESH_INTERVAL = 10
+# Web results fetched per question; the best max_results after reranking are shown
+WEB_CANDIDATES = 10
+DEFAULT_MODE = "hybrid"
+DEFAULT_STRATEGY = "speculative"
+# "video" searches the video being watched, "library" every video in the library
+SCOPES = ("video", "library")
+# Characters of the segments before and after a retrieved one added to its generation context
+NEIGHBOUR_CHARS = 200
+
+
+def _report(errors, message: str):
+    if errors is not None:
+        errors.append(message)
+
+
+def smart_text_search(question: str, transcriptions: list, top_k: int = 3, errors: list = None):
+    """Smart text search using TF-IDF similarity"""
+    if not transcriptions:
+        return []
+
+    try:
+        # A shared Corpus carries its prebuilt index; each query is a transform plus a sparse dot product
+        if isinstance(transcriptions, Corpus):
+            index = transcriptions.index
+        else:
+            index = TfidfIndex.build(transcriptions)
+        return index.search(question, transcriptions, top_k=top_k)
+
+    except Exception as e:
+        _report(errors, f"Error in smart text search: {e}")
+        # Fallback to simple keyword search
+        return simple_keyword_search(question, transcriptions, top_k, errors)
+
+def simple_keyword_search(question: str, transcriptions: list, top_k: int = 3, errors: list = None):
+    """Simple keyword-based search as fallback"""
+    if not transcriptions:
+        return []
+
+    # The inverted index is built once per corpus; a query only reads the postings of its words
+    if isinstance(transcriptions, Corpus) and transcriptions.keyword_index is not None:
+        index = transcriptions.keyword_index
+    else:
+        index = KeywordIndex.build(transcriptions)
+
+    return index.search(question, transcriptions, top_k=top_k)
+
+def bm25_search(question: str, transcriptions: list, top_k: int = 3, errors: list = None):
+    """BM25 search with Arabic spelling normalization"""
+    if not transcriptions:
+        return []
+
+    if isinstance(transcriptions, Corpus) and transcriptions.bm25_index is not None:
+        index = transcriptions.bm25_index
+    else:
+        index = BM25Index.build(transcriptions)
+
+    return index.search(question, transcriptions, top_k=top_k)
+
+def dense_search(question: str, transcriptions: list, top_k: int = 3, errors: list = None):
+    """Dense-vector search: embed the question once, one matrix-vector product"""
+    if not transcriptions:
+        return []
+
+    # Embedding the corpus per question would take seconds, and with the hashing embedder rather
+    # than the configured one: without loaded vectors answer with TF-IDF instead
+    if not isinstance(transcriptions, Corpus) or transcriptions.dense_index is None:
+        _report(errors, "Dense index unavailable; dense search used TF-IDF instead")
+        return smart_text_search(question, transcriptions, top_k, errors)
+
+    try:
+        return transcriptions.dense_index.search(question, transcriptions, top_k=top_k)
+
+    except (OSError, ValueError) as e:
+        # e.g. the Ollama server for converted faiss vectors is not running
+        _report(errors, f"Error in dense search: {e}")
+        return smart_text_search(question, transcriptions, top_k, errors)
+
+def hybrid_search(question: str, transcriptions: list, top_k: int = 3, errors: list = None):
+    """TF-IDF and dense scores fused in one pass, with one calibrated threshold"""
+    if not transcriptions:
+        return []
+
+    # No dense vectors (e.g. the embedder failed at load time): rank with the corpus's TF-IDF index
+    # alone rather than refitting and re-embedding the whole corpus on every question
+    if not isinstance(transcriptions, Corpus) or transcriptions.dense_index is None:
+        _report(errors, "Dense index unavailable; hybrid search used TF-IDF only")
+        return smart_text_search(question, transcriptions, top_k, errors)
+
+    try:
+        ranker = HybridRanker(transcriptions.index, transcriptions.dense_index)
+        return ranker.search(question, transcriptions, top_k=top_k)
+
+    except (OSError, ValueError) as e:
+        _report(errors, f"Error in hybrid search: {e}")
+        return smart_text_search(question, transcriptions, top_k, errors)
+
+# Retrieval modes selectable in the UI
+RETRIEVAL_MODES = {
+    "hybrid": ("Hybrid (TF-IDF + dense)", hybrid_search),
+    "tfidf": ("TF-IDF similarity", smart_text_search),
+    "bm25": ("BM25 (Arabic-normalized)", bm25_search),
+    "keyword": ("Keyword overlap", simple_keyword_search),
+    "dense": ("Dense vectors (embeddings)", dense_search),
+}
+
+# Cache key form per mode: what its search reads of the question (TF-IDF and keyword overlap keep
+# the spelling; the embedders behind dense and hybrid may see every character)
+CACHE_KEY_FORMS = {
+    "hybrid": verbatim_query,
+    "tfidf": lexical_query,
+    "bm25": normalize_query,
+    "keyword": lexical_query,
+    "dense": verbatim_query,
+}
+
+STATUS_LINES = {
+    "video": '<div class="arabic-text">✅ **من محتوى الفيديو**</div>',
+    "web": '<div class="arabic-text">🌐 **من البحث على الإنترنت**</div>',
+}
+
+GENERATED_HEADERS = {
+    "video": "🤖 إجابة من محتوى الفيديو:",
+    "web": "🤖 إجابة من البحث في الإنترنت:",
+}
+
+def result_snippet(result: dict) -> str:
+    """At most ~400 characters of a transcript result, around its best-matching window"""
+    # The best-matching window was picked at search time; just slice it out
+    text = result['text']
+    if len(text) > 400 and "snippet_start" in result:
+        return window_snippet(text, result["snippet_start"], result["snippet_end"])
+    if len(text) > 400:
+        return window_snippet(text, 0, 400)
+    return text
+
+def response_parts(question: str, video_results: list, web_results: list = None):
+    """The response text piece by piece: header, then one piece per source
+
+    Pieces carry their own line breaks, so the text is "".join(parts); a
+    generative backend can stream tokens through the same interface.
+    """
+    if video_results:
+        yield "بناءً على محتوى الفيديو:"
+
+        for i, result in enumerate(video_results[:2], 1):
+            metadata = result['metadata']
+            # Library-wide results name the video they come from
+            video = f"🎬 {metadata['video_title']} · " if "video_title" in metadata else ""
+            if "start_sec" in metadata:
+                timestamp = f"{format_timestamp(metadata['start_sec'])} - {format_timestamp(metadata['end_sec'])}"
+                heading = f"{video}📄 **من الملف {metadata['source']}** (⏱ {timestamp})"
+            else:
+                heading = f"{video}📄 **من الملف {metadata['source']}**"
+
+            yield f"\n\n{heading}\n{result_snippet(result)}\n"
+
+    if web_results and not video_results:
+        yield "بناءً على البحث في الإنترنت:"
+
+        for i, result in enumerate(web_results[:2], 1):
+            yield f"\n\n🌐 **{result.get('title', 'مصدر ويب')}**\n{result['snippet']}\n"
+
+    if not video_results and not web_results:
+        yield "\n".join([
+            "عذراً، لم أجد معلومات متعلقة بسؤالك في محتوى الفيديو أو الإنترنت.",
+            "\n💡 نصائح للحصول على نتائج أفضل:",
+            "• استخدم كلمات مختلفة أو مرادفات",
+            "• اطرح أسئلة أكثر تحديداً",
+            "• جرب السؤال باللغة العربية إذا كان متعلقاً بالفيديو",
+        ])
+
+def segment_context(result: dict, corpus) -> str:
+    """A transcript result's snippet between the end of the segment before it and the start of the next
+
+    Speech runs on across the 30-second files, so a sentence a snippet starts
+    or ends in the middle of is usually finished in the neighbouring segment.
+    """
+    snippet = result_snippet(result)
+    if corpus is None or corpus.segments is None:
+        return snippet
+    source = result["metadata"]["source"]
+    rows = corpus.segments.neighbours(source)
+    names = [corpus[row]["filename"] for row in rows]
+    if source not in names:
+        return snippet
+    i = names.index(source)
+    parts = [snippet]
+    if i > 0:
+        text = corpus[rows[i - 1]]["content"]
+        parts.insert(0, text if len(text) <= NEIGHBOUR_CHARS else "..." + text[-NEIGHBOUR_CHARS:].split(" ", 1)[-1])
+    if i + 1 < len(rows):
+        text = corpus[rows[i + 1]]["content"]
+        parts.append(text if len(text) <= NEIGHBOUR_CHARS else text[:NEIGHBOUR_CHARS].rsplit(" ", 1)[0] + "...")
+    return "\n".join(parts)
+
+def format_response(text: str, source: str = None) -> str:
+    """Response text in its right-to-left wrapper, with the source line under it"""
+    # Format with proper Arabic direction
+    formatted_text = f'<div class="arabic-text">{text}</div>'
+    if source in STATUS_LINES:
+        formatted_text = f"{formatted_text}\n\n{STATUS_LINES[source]}"
+    return formatted_text
+
+def generate_response(question: str, video_results: list, web_results: list = None):
+    """Generate response based on search results"""
+    return format_response("".join(response_parts(question, video_results, web_results)))
+
+
+class VideoChatEngine:
+    """Library shards, caches and web fallback shared by every client of one process
+
+    Methods that take a ``video_id`` default to the library's first video.
+    """
+
+    def __init__(self, library: VideoLibrary = None, web_backend=None,
+                 refresh_interval: float = TRANSCRIPT_REFRESH_INTERVAL, generator: AnswerGenerator = None,
+                 profiler=None):
+        self.library = library if library is not None else VideoLibrary()
+        self.query_cache = QueryCache()
+        self.web_backend = web_backend if web_backend is not None else backend_from_env()
+        self.generator = generator if generator is not None else AnswerGenerator()
+        self.reranker = WebReranker()
+        self.orchestrator = RetrievalOrchestrator()
+        self.refresh_interval = refresh_interval
+        self.metrics = Metrics()
+        # Opt-in cProfile of slow answers (VIDEO_CHAT_PROFILE_MS)
+        self.profiler = profiler if profiler is not None else profiler_from_env()
+
+    @property
+    def web_search_available(self) -> bool:
+        return self.web_backend.available
+
+    def videos(self) -> list:
+        """Every video in the library (id, title, url)"""
+        return list(self.library.videos.values())
+
+    def load_transcriptions(self, video_id: str = None, force_refresh: bool = False, evict: bool = True) -> Corpus:
+        """One video's shared corpus, re-reading only files that changed"""
+        video_id = video_id or self.library.default_video_id
+        corpus, stats = self.library.corpus(video_id, self.refresh_interval, force_refresh, evict)
+
+        # Cached transcript results and answers generated from them belong to the old index;
+        # other videos' entries are still current
+        if stats and any(stats.values()):
+            self.query_cache.invalidate("video", lambda key: key[2] == video_id)
+            prefix = f"{video_id}/"
+            self.generator.cache.invalidate("llm", lambda key: any(s.startswith(prefix) for s in key[2]))
+        return corpus
+
+    def refresh(self, video_id: str = None) -> dict:
+        """Re-scan a video's transcriptions now; counts of added/updated/removed files"""
+        video_id = video_id or self.library.default_video_id
+        self.load_transcriptions(video_id, force_refresh=True)
+        return dict(self.library.updater(video_id).last_stats)
+
+    def status(self, video_id: str = None) -> dict:
+        """A video's corpus size and load errors, refreshing its corpus if it is stale"""
+        video_id = video_id or self.library.default_video_id
+        corpus = self.load_transcriptions(video_id)
+        return {
+            "video_id": video_id,
+            "videos": len(self.library.videos),
+            "files": len(corpus),
+            "total_words": corpus.total_words,
+            "version": corpus.version,
+            "from_snapshot": self.library.updater(video_id).from_snapshot,
+            "web_search_available": self.web_search_available,
+            "load_errors": [[fn, str(e)] for fn, e in self.library.updater(video_id).errors],
+        }
+
+    def transcript_at(self, seconds: float, video_id: str = None, before: int = 1, after: int = 1) -> list:
+        """The segment playing at second ``seconds`` and its neighbours, in time order
+
+        Each is its transcript plus start_sec/end_sec; ``current`` marks the
+        one playing at that second.  Empty past the end of the video.
+        """
+        video_id = video_id or self.library.default_video_id
+        corpus = self.load_transcriptions(video_id)
+        if corpus.segments is None:
+            return []
+        current = corpus.segments.segment_at(seconds)
+        segments = []
+        for row in corpus.segments.window(seconds, before, after):
+            start, end = corpus.segments.span(corpus[row]["filename"])
+            segments.append(dict(corpus[row], start_sec=start, end_sec=end, current=row == current))
+        return segments
+
+    def stats(self) -> dict:
+        """Cache, library, web backend, retrieval pipeline and answer generation counters"""
+        return {
+            "query_cache": self.query_cache.stats(),
+            "library": self.library.stats(),
+            "web_backends": [dict(backend.stats(), name=backend.name) for backend in self.web_backend.backends()],
+            "pipeline": self.orchestrator.stats(),
+            "llm": self.generator.stats(),
+            "tracing": dict(self.metrics.snapshot(), answers={
+                source: self.metrics.total("answers_total", source=source) for source in ("video", "web", "none")
+            }),
+            "profiler": self.profiler.stats() if self.profiler is not None else None,
+        }
+
+    def metrics_text(self) -> str:
+        """Span histograms, answer counters and the caches' and backends' counters, Prometheus format"""
+        stats = self.stats()
+        cache, library, llm = stats["query_cache"], stats["library"], stats["llm"]
+        samples = [
+            ("query_cache_hits_total", "counter", {}, cache["hits"]),
+            ("query_cache_misses_total", "counter", {}, cache["misses"]),
+            ("query_cache_evictions_total", "counter", {}, cache["evictions"]),
+            ("query_cache_entries", "gauge", {}, cache["entries"]),
+            ("library_shards_loaded", "gauge", {}, library["loaded"]),
+            ("library_loaded_bytes", "gauge", {}, int(library["loaded_mb"] * 2 ** 20)),
+            ("library_shard_loads_total", "counter", {}, library["loads"]),
+            ("library_shard_evictions_total", "counter", {}, library["evictions"]),
+            ("web_speculated_total", "counter", {}, stats["pipeline"]["speculated"]),
+            ("web_deadline_hits_total", "counter", {}, stats["pipeline"]["deadline_hits"]),
+            ("llm_queue_depth", "gauge", {}, llm["queue_depth"]),
+            ("llm_cache_hits_total", "counter", {}, llm["cache"]["hits"]),
+            ("llm_rejected_total", "counter", {}, llm["rejected"]),
+            ("llm_errors_total", "counter", {}, llm["errors"]),
+        ]
+        for backend in stats["web_backends"]:
+            labels = {"backend": backend["name"]}
+            samples += [
+                ("web_searches_total", "counter", labels, backend["count"]),
+                ("web_search_errors_total", "counter", labels, backend["errors"]),
+                ("web_search_timeouts_total", "counter", labels, backend["timeouts"]),
+            ]
+        if stats["profiler"] is not None:
+            samples.append(("slow_requests_total", "counter", {}, stats["profiler"]["slow"]))
+        return self.metrics.prometheus(samples)
+
+    def search_transcriptions(self, question: str, transcriptions=None, mode: str = DEFAULT_MODE,
+                              top_k: int = 3, errors: list = None, video_id: str = None):
+        """Search one video's transcriptions with one retrieval mode"""
+        video_id = video_id or self.library.default_video_id
+        if transcriptions is None:
+            transcriptions = self.load_transcriptions(video_id)
+        if mode not in RETRIEVAL_MODES:
+            mode = DEFAULT_MODE
+
+        # Only shared corpora are cached; the version ties hits to the shard's current index
+        cache_key, version = None, None
+        if isinstance(transcriptions, Corpus):
+            cache_key = QueryCache.make_key("video", question, video_id, mode, top_k, form=CACHE_KEY_FORMS[mode])
+            version = transcriptions.version
+            cached = self.query_cache.get(cache_key, version)
+            if cached is not None:
+                return list(cached)
+
+        _, search = RETRIEVAL_MODES[mode]
+        results = search(question, transcriptions, top_k, errors)
+
+        # Attach each segment's place in the video (start_sec/end_sec) and its best snippet window
+        if isinstance(transcriptions, Corpus) and transcriptions.segments is not None:
+            segments, windows = transcriptions.segments, transcriptions.windows
+        else:
+            segments, windows = SegmentStore.build(transcriptions), WindowIndex.build(transcriptions)
+        segments.annotate(results)
+        windows.attach_snippets(question, results)
+        for result in results:
+            result["metadata"]["video_id"] = video_id
+
+        if cache_key is not None:
+            self.query_cache.put(cache_key, results, version)
+        return results
+
+    def search_library(self, question: str, mode: str = DEFAULT_MODE, top_k: int = 3, errors: list = None):
+        """Best ``top_k`` segments of the whole library: every shard searched in parallel
+
+        Scores come from each shard's own index, so they are comparable only
+        as far as the shards' vocabularies are; the dense and hybrid modes,
+        whose scores are plain cosine similarities, merge most evenly.
+        """
+        def search_video(video_id):
+            # A scan over the library must not push the watched videos' shards out of memory
+            corpus = self.load_transcriptions(video_id, evict=False)
+            results = self.search_transcriptions(question, corpus, mode, top_k, errors, video_id) if corpus else []
+            title = self.library.videos[video_id]["title"]
+            return [dict(r, metadata=dict(r["metadata"], video_title=title)) for r in results]
+
+        merged = [r for results in self.library.map(search_video) for r in results]
+        # Ties keep library order
+        return heapq.nlargest(top_k, merged, key=lambda r: r["score"])
+
+    def search(self, question: str, mode: str = DEFAULT_MODE, top_k: int = 3,
+               video_id: str = None, scope: str = "video") -> list:
+        """Transcript results for a question from one video or the whole library"""
+        if scope == "library":
+            return self.search_library(question, mode, top_k)
+        return self.search_transcriptions(question, mode=mode, top_k=top_k, video_id=video_id)
+
+    def search_web(self, question: str, max_results: int = 3, embedder=None):
+        """Search the web through the configured backend, best results first
+
+        Runs on the retrieval worker threads; raises WebSearchError.
+        Without an embedder, results are reranked lexically.
+        """
+        cache_key = QueryCache.make_key("web", question, max_results)
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        candidates = self.web_backend.search(question, max(max_results, WEB_CANDIDATES))
+        web_results = self.reranker.rerank(question, candidates, embedder, top_n=max_results)
+
+        # Empty answers may be transient (rate limits), so only real results are cached
+        if web_results:
+            self.query_cache.put(cache_key, web_results)
+        return web_results
+
+    def retrieve(self, question: str, mode: str = DEFAULT_MODE, strategy: str = DEFAULT_STRATEGY,
+                 errors: list = None, video_id: str = None, scope: str = "video") -> dict:
+        """Transcript results, falling back to the web (see RetrievalOrchestrator.retrieve)"""
+        video_id = video_id or self.library.default_video_id
+        corpus = self.load_transcriptions(video_id)
+        web_search = None
+        if self.web_search_available:
+            # Web results are reranked with the same embedder as the dense index
+            embedder = corpus.dense_index.embedder if corpus.dense_index is not None else None
+            web_search = lambda q: self.search_web(q, max_results=3, embedder=embedder)
+
+        # Coverage of the watched video decides whether the web search starts early
+        coverage = 0.0
+        if corpus.bm25_index is not None:
+            coverage = vocabulary_coverage(question, corpus.bm25_index.vocabulary)
+
+        if scope == "library":
+            search_video = lambda q: self.search_library(q, mode, top_k=3, errors=errors)
+        else:
+            search_video = lambda q: self.search_transcriptions(q, corpus, mode, 3, errors, video_id) if corpus else []
+
+        return self.orchestrator.retrieve(
+            question,
+            search_video,
+            web_search,
+            coverage=coverage,
+            strategy=strategy if strategy in STRATEGIES else DEFAULT_STRATEGY
+        )
+
+    def generate_answer(self, question: str, source: str, sources: list):
+        """Generation of an answer from the retrieved sources (see AnswerGenerator.submit)"""
+        if source == "video":
+            segment_ids = [f"{r['metadata'].get('video_id')}/{r['metadata']['source']}" for r in sources]
+            # Each snippet with the adjacent speech from the segments around it
+            contexts = [segment_context(r, self.library.loaded_corpus(r["metadata"].get("video_id")))
+                        for r in sources]
+        else:
+            segment_ids = [r["href"] for r in sources]
+            contexts = [r["snippet"] for r in sources]
+        return self.generator.submit(question, segment_ids, contexts)
+
+    def generated_parts(self, question: str, video_results: list, web_results: list, errors: list,
+                        timings: dict):
+        """Generated response text as the model writes it
+
+        Falls back to the snippet response when generation fails (or the
+        queue is full) before its first piece; a failure after that keeps
+        what was generated and is reported in ``errors``.
+        """
+        source, sources = ("video", video_results) if video_results else ("web", web_results)
+        started = False
+        try:
+            generation = self.generate_answer(question, source, sources)
+            for piece in generation.stream(self.generator.timeout):
+                if not started:
+                    started = True
+                    yield f"{GENERATED_HEADERS[source]}\n\n"
+                yield piece
+            if not generation.cached:
+                timings["llm_wait"] = generation.wait_ms
+                timings["llm_generate"] = generation.generate_ms
+        except LLMError as e:
+            _report(errors, f"Answer generation error: {e}")
+
+        if not started:
+            yield from response_parts(question, video_results, web_results)
+        elif source == "video":
+            yield "\n\n📄 المصادر: " + "، ".join(r["metadata"]["source"] for r in sources)
+        else:
+            yield "\n\n🌐 المصادر: " + "، ".join(r.get("title") or r["href"] for r in sources)
+
+    def answer_stream(self, question: str, mode: str = DEFAULT_MODE, strategy: str = DEFAULT_STRATEGY,
+                      video_id: str = None, scope: str = "video", answer_mode: str = DEFAULT_ANSWER_MODE):
+        """Chat answer as it is produced
+
+        Yields {"part": text} for every piece of the response text as soon as
+        it is ready, then {"done": answer} with the same dict as ``answer``.
+        With ``answer_mode="generative"`` the text is written by the local
+        LLM from the retrieved sources.
+        """
+        trace = Trace()
+        profile = self.profiler.start() if self.profiler is not None else None
+        try:
+            yield from self._answer_stream(trace, question, mode, strategy, video_id, scope, answer_mode)
+        finally:
+            if profile is not None:
+                self.profiler.stop(profile, trace)
+
+    def _answer_stream(self, trace: Trace, question: str, mode: str, strategy: str, video_id: str,
+                       scope: str, answer_mode: str):
+        errors, warnings = [], []
+        with trace.span("load"):
+            self.load_transcriptions(video_id)
+        retrieve_start = time.perf_counter()
+        outcome = self.retrieve(question, mode, strategy, errors, video_id, scope)
+        # The orchestrator timed the transcript search and the wait for the web fallback
+        video_ms = outcome["timings"]["video"]
+        trace.add("retrieve", video_ms, retrieve_start)
+        if "web_wait" in outcome["timings"]:
+            trace.add("fallback", outcome["timings"]["web_wait"], retrieve_start + video_ms / 1000)
+        retrieve_errors = len(errors)
+        video_results = outcome["video_results"]
+        web_results = outcome["web_results"]
+        if outcome["error"]:
+            errors.append(f"Web search error: {outcome['error']}")
+        elif outcome["deadline_hit"]:
+            warnings.append("Web search took too long and was skipped.")
+
+        # Determine source and prepare data
+        if video_results:
+            source, sources = "video", video_results
+        elif web_results:
+            source, sources = "web", web_results
+        else:
+            source, sources = "none", []
+
+        timings = dict(outcome["timings"])
+        compose_errors = len(errors)
+        if answer_mode == "generative" and sources:
+            pieces = self.generated_parts(question, video_results, web_results, errors, timings)
+        else:
+            pieces = response_parts(question, video_results, web_results)
+
+        # Composing is the time spent producing parts, not the time the caller takes to show them
+        parts, compose_ms, compose_start = [], 0.0, time.perf_counter()
+        while True:
+            start = time.perf_counter()
+            part = next(pieces, None)
+            compose_ms += (time.perf_counter() - start) * 1000
+            if part is None:
+                break
+            parts.append(part)
+            yield {"part": part}
+        trace.add("compose", compose_ms, compose_start)
+
+        self.metrics.incr("answers_total", source=source, mode=mode, answer_mode=answer_mode)
+        for stage, n in (("retrieve", retrieve_errors), ("fallback", int(outcome["error"] is not None)),
+                         ("compose", len(errors) - compose_errors)):
+            if n:
+                self.metrics.incr("errors_total", n, stage=stage)
+        self.metrics.observe(trace)
+        yield {"done": {
+            "content": format_response("".join(parts), source),
+            "source": source,
+            "sources": sources,
+            "errors": errors,
+            "warnings": warnings,
+            "timings": timings,
+            "trace": trace.to_dict(),
+        }}
+
+    def answer(self, question: str, mode: str = DEFAULT_MODE, strategy: str = DEFAULT_STRATEGY,
+               video_id: str = None, scope: str = "video", answer_mode: str = DEFAULT_ANSWER_MODE) -> dict:
+        """Chat answer: response text, where it came from and the sources behind it"""
+        for event in self.answer_stream(question, mode, strategy, video_id, scope, answer_mode):
+            pass
+        return event["done"]
@@ -0,0 +1,383 @@
+"""HTTP/JSON API in front of VideoChatEngine, and a client for it.
+
+    python engine_api.py --port 8600 --workers 4
+    python engine_api.py --web-backend fixture --web-fixtures benchmarks/web_fixtures.json
+    python engine_api.py --llm-backend stub --llm-workers 2
+    python engine_api.py --profile-slow-ms 500    # keep cProfile stats of slow answers
+
+Routes (JSON in, JSON out):
+
+    GET  /health    {"ok": true}
+    GET  /videos    {"videos": [{"id", "title", "url"}, ...]}
+    GET  /status    corpus size, version, web search availability, load errors
+                    (?video_id=...; default: the library's first video)
+    GET  /transcript  {"segments": [...]} the segment playing at second ?t=
+                    and its neighbours (?video_id=... as for /status)
+    GET  /stats     query cache, library, web backend, retrieval pipeline,
+                    answer generation and tracing counters
+    GET  /metrics   the same counters and per-stage latency histograms in the
+                    Prometheus text format (of the worker that answers)
+    POST /refresh   {"video_id"?} re-scan a video's transcriptions
+    POST /search    {"question", "mode"?, "top_k"?, "video_id"?, "scope"?} -> {"results": [...]}
+    POST /answer    {"question", "mode"?, "strategy"?, "video_id"?, "scope"?, "answer_mode"?}
+                    -> VideoChatEngine.answer
+    POST /answer/stream  same body; newline-delimited JSON events of
+                    VideoChatEngine.answer_stream, sent as each is ready
+
+The parent process loads the first video's shard (``--preload``: as many
+shards as fit the memory budget; dense vectors are memory-mapped) and binds
+the socket, then forks ``--workers`` processes that accept on it.  Workers
+share the loaded indexes and the mapped pages copy-on-write; each keeps its
+own query cache, loads further shards on its own and refreshes them on its
+own.  Each worker also runs its own answer generation pool; size
+``--llm-workers`` so that workers x llm-workers is what the model server
+can run at once.  Without os.fork (Windows) one process serves.
+Set VIDEO_CHAT_ENGINE_URL to point the Streamlit app at a running server.
+"""
+import argparse
+import json
+import os
+import signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from engine import DEFAULT_MODE, DEFAULT_STRATEGY, RETRIEVAL_MODES, SCOPES, VideoChatEngine
+from llm_answer import ANSWER_MODES, DEFAULT_ANSWER_MODE, LLM_WORKERS, AnswerGenerator
+from llm_answer import backend_from_env as llm_backend_from_env, create_backend as create_llm_backend
+from retrieval_pipeline import STRATEGIES
+from tracing import PROFILE_FOLDER, SlowRequestProfiler
+from video_library import LIBRARY_FOLDER, MEMORY_BUDGET_MB, VideoLibrary
+from web_search import FIXTURES_PATH, create_backend
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8600
+MAX_BODY_BYTES = 64 * 1024
+CLIENT_TIMEOUT = 30.0
+
+
+class EngineAPIError(Exception):
+    """The engine server could not be reached or rejected the request"""
+
+
+class EngineRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to the process-wide engine"""
+
+    engine = None  # set by make_server
+    protocol_version = "HTTP/1.1"
+    # Headers, body and stream chunks are separate small writes; with Nagle's
+    # algorithm each answer would stall ~40 ms on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # One line per request would dominate the cost of a cached answer
+        pass
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, events):
+        """One JSON line per event, each flushed as its own chunk"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in events:
+            line = json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("Request body must be a JSON object")
+        return data
+
+    def _video_error(self, video_id):
+        """Error message for an unknown video id, or None"""
+        if video_id is not None and not isinstance(video_id, str):
+            return "video_id must be a string"
+        if video_id is not None and video_id not in self.engine.library.videos:
+            return f"Unknown video: {video_id}"
+        return None
+
+    @staticmethod
+    def _choice_error(name: str, label: str, value, choices):
+        """Error message unless ``value`` is one of the string ``choices``, or None"""
+        if not isinstance(value, str):
+            return f"{name} must be a string"
+        if value not in choices:
+            return f"Unknown {label}: {value}"
+        return None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send(200, {"ok": True})
+        elif url.path == "/videos":
+            self._send(200, {"videos": self.engine.videos()})
+        elif url.path == "/status":
+            video_id = parse_qs(url.query).get("video_id", [None])[0]
+            error = self._video_error(video_id)
+            if error:
+                self._send(400, {"error": error})
+            else:
+                self._send(200, self.engine.status(video_id))
+        elif url.path == "/transcript":
+            query = parse_qs(url.query)
+            video_id = query.get("video_id", [None])[0]
+            error = self._video_error(video_id)
+            try:
+                seconds = float(query.get("t", ["0"])[0])
+            except ValueError:
+                seconds, error = None, error or "t must be a number of seconds"
+            if error is None and not seconds >= 0:
+                error = "t must be a number of seconds"
+            if error:
+                self._send(400, {"error": error})
+            else:
+                self._send(200, {"segments": self.engine.transcript_at(seconds, video_id)})
+        elif url.path == "/stats":
+            self._send(200, self.engine.stats())
+        elif url.path == "/metrics":
+            body = self.engine.metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        try:
+            data = self._read_json()
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+            return
+
+        if self.path not in ("/refresh", "/search", "/answer", "/answer/stream"):
+            self._send(404, {"error": f"Unknown path: {self.path}"})
+            return
+        video_id = data.get("video_id")
+        error = self._video_error(video_id)
+        if error:
+            self._send(400, {"error": error})
+            return
+        if self.path == "/refresh":
+            self._send(200, self.engine.refresh(video_id))
+            return
+
+        question = data.get("question")
+        mode = data.get("mode", DEFAULT_MODE)
+        scope = data.get("scope", "video")
+        if not isinstance(question, str) or not question.strip():
+            self._send(400, {"error": "question must be a non-empty string"})
+        elif error := (self._choice_error("mode", "mode", mode, RETRIEVAL_MODES)
+                       or self._choice_error("scope", "scope", scope, SCOPES)):
+            self._send(400, {"error": error})
+        elif self.path == "/search":
+            top_k = data.get("top_k", 3)
+            # bool is an int subclass: reject true/false explicitly
+            if not isinstance(top_k, int) or isinstance(top_k, bool) or not 1 <= top_k <= 50:
+                self._send(400, {"error": "top_k must be an integer between 1 and 50"})
+                return
+            self._send(200, {"results": self.engine.search(question, mode, top_k, video_id, scope)})
+        else:
+            strategy = data.get("strategy", DEFAULT_STRATEGY)
+            answer_mode = data.get("answer_mode", DEFAULT_ANSWER_MODE)
+            if error := (self._choice_error("strategy", "strategy", strategy, STRATEGIES)
+                         or self._choice_error("answer_mode", "answer mode", answer_mode, ANSWER_MODES)):
+                self._send(400, {"error": error})
+            elif self.path == "/answer/stream":
+                self._send_stream(self.engine.answer_stream(question, mode, strategy, video_id, scope, answer_mode))
+            else:
+                self._send(200, self.engine.answer(question, mode, strategy, video_id, scope, answer_mode))
+
+
+def make_server(engine: VideoChatEngine, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+    """Bound (not yet serving) HTTP server for ``engine``"""
+    handler = type("BoundEngineRequestHandler", (EngineRequestHandler,), {"engine": engine})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def preload(engine: VideoChatEngine):
+    """Load shards in library order until the memory budget starts evicting them"""
+    # Sequential on purpose: thread pools started before a fork are unusable in the workers
+    for video_id in engine.library.videos:
+        engine.load_transcriptions(video_id)
+        if engine.library.evictions:
+            break
+
+
+def serve(engine: VideoChatEngine, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 1):
+    """Serve until interrupted, from ``workers`` forked processes"""
+    # Load (and memory-map) the default shard before forking so workers share it
+    engine.status()
+    server = make_server(engine, host, port)
+    if workers <= 1 or not hasattr(os, "fork"):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for pid in pids:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+    finally:
+        server.server_close()
+
+
+class EngineClient:
+    """VideoChatEngine's public interface over HTTP"""
+
+    def __init__(self, url: str, timeout: float = CLIENT_TIMEOUT):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._errors = (requests.RequestException, ValueError)
+
+    def _call(self, method: str, path: str, payload: dict = None, params: dict = None):
+        try:
+            response = self._session.request(method, self.url + path, json=payload, params=params,
+                                             timeout=self.timeout)
+            data = response.json()
+        except self._errors as e:
+            raise EngineAPIError(f"Engine server at {self.url} failed: {e}") from e
+        if response.status_code != 200:
+            raise EngineAPIError(data.get("error", f"HTTP {response.status_code}"))
+        return data
+
+    def videos(self) -> list:
+        return self._call("GET", "/videos")["videos"]
+
+    def status(self, video_id: str = None) -> dict:
+        return self._call("GET", "/status", params={"video_id": video_id} if video_id else None)
+
+    def transcript_at(self, seconds: float, video_id: str = None) -> list:
+        params = {"t": seconds}
+        if video_id:
+            params["video_id"] = video_id
+        return self._call("GET", "/transcript", params=params)["segments"]
+
+    def stats(self) -> dict:
+        return self._call("GET", "/stats")
+
+    def metrics_text(self) -> str:
+        try:
+            response = self._session.get(self.url + "/metrics", timeout=self.timeout)
+            response.raise_for_status()
+        except self._errors as e:
+            raise EngineAPIError(f"Engine server at {self.url} failed: {e}") from e
+        return response.text
+
+    def refresh(self, video_id: str = None) -> dict:
+        return self._call("POST", "/refresh", {"video_id": video_id})
+
+    def search(self, question: str, mode: str = DEFAULT_MODE, top_k: int = 3,
+               video_id: str = None, scope: str = "video") -> list:
+        return self._call("POST", "/search", {"question": question, "mode": mode, "top_k": top_k,
+                                              "video_id": video_id, "scope": scope})["results"]
+
+    def answer(self, question: str, mode: str = DEFAULT_MODE, strategy: str = DEFAULT_STRATEGY,
+               video_id: str = None, scope: str = "video", answer_mode: str = DEFAULT_ANSWER_MODE) -> dict:
+        return self._call("POST", "/answer", {"question": question, "mode": mode, "strategy": strategy,
+                                              "video_id": video_id, "scope": scope, "answer_mode": answer_mode})
+
+    def answer_stream(self, question: str, mode: str = DEFAULT_MODE, strategy: str = DEFAULT_STRATEGY,
+                      video_id: str = None, scope: str = "video", answer_mode: str = DEFAULT_ANSWER_MODE):
+        """Events of /answer/stream as the server sends them"""
+        payload = {"question": question, "mode": mode, "strategy": strategy, "video_id": video_id, "scope": scope,
+                   "answer_mode": answer_mode}
+        try:
+            with self._session.post(self.url + "/answer/stream", json=payload, timeout=self.timeout,
+                                    stream=True) as response:
+                if response.status_code != 200:
+                    raise EngineAPIError(response.json().get("error", f"HTTP {response.status_code}"))
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except self._errors as e:
+            raise EngineAPIError(f"Engine server at {self.url} failed: {e}") from e
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--library", default=LIBRARY_FOLDER,
+                        help="library folder (without library.json: the bundled ./transcriptions)")
+    parser.add_argument("--memory-budget-mb", type=float, default=MEMORY_BUDGET_MB)
+    parser.add_argument("--preload", action="store_true", help="load shards up to the budget before forking")
+    parser.add_argument("--web-backend", choices=("cached", "ddgs", "fixture"),
+                        help="default: WEB_SEARCH_BACKEND or cached")
+    parser.add_argument("--web-fixtures", default=FIXTURES_PATH)
+    parser.add_argument("--llm-backend", choices=("ollama", "stub"), help="default: LLM_BACKEND or ollama")
+    parser.add_argument("--llm-workers", type=int, default=LLM_WORKERS,
+                        help="concurrent generations per worker process")
+    parser.add_argument("--profile-slow-ms", type=float,
+                        help="profile answers and keep the cProfile stats of those slower than this "
+                             "(default: VIDEO_CHAT_PROFILE_MS, or off)")
+    parser.add_argument("--profile-dir", default=PROFILE_FOLDER)
+    args = parser.parse_args()
+
+    web_backend = None
+    if args.web_backend == "fixture":
+        web_backend = create_backend("fixture", path=args.web_fixtures)
+    elif args.web_backend:
+        web_backend = create_backend(args.web_backend)
+
+    llm_backend = create_llm_backend(args.llm_backend) if args.llm_backend else llm_backend_from_env()
+    profiler = SlowRequestProfiler(args.profile_slow_ms, args.profile_dir) if args.profile_slow_ms else None
+    engine = VideoChatEngine(VideoLibrary(args.library, args.memory_budget_mb), web_backend=web_backend,
+                             generator=AnswerGenerator(llm_backend, workers=args.llm_workers), profiler=profiler)
+    status = engine.status()
+    if args.preload:
+        preload(engine)
+    print(f"✅ {status['videos']} video(s), {len(engine.library.loaded())} loaded "
+          f"({status['files']} transcription files in {status['video_id']}); "
+          f"serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    serve(engine, args.host, args.port, args.workers)
+
+if __name__ == "__main__":
+    main()
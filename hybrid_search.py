@@ -0,0 +1,81 @@
+"""Hybrid lexical + dense ranking with one calibrated threshold.
+
+The TF-IDF index and the dense vectors each score every segment in one
+vectorized pass (a sparse and a dense matrix-vector product).  Both are
+cosine similarities on the same 0..1 scale, so the fused score is their
+weighted sum.  A single threshold on that score decides whether the video
+answers the question or the app falls back to the web.  It depends on the
+embedder, so it comes with the dense index (``DenseIndex.min_score``): the
+hashing embedder's was calibrated with ``python -m benchmarks.bench_hybrid
+--calibrate`` on the labelled questions plus off-topic ones, and converted
+vectors get theirs from ``python dense_index.py calibrate``.  Reciprocal-rank
+fusion can order the results instead; the threshold still applies to the
+weighted score, since RRF scores only encode ranks.
+"""
+import numpy as np
+
+LEXICAL_WEIGHT = 0.3
+RRF_K = 60
+FUSIONS = ("weighted", "rrf")
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """1-based rank of every entry, best first (ties keep corpus order)"""
+    ranks = np.empty(len(scores), dtype=np.float64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+class HybridRanker:
+    """Fuses a TfidfIndex and a DenseIndex that share the corpus order"""
+
+    def __init__(self, lexical, dense, lexical_weight: float = LEXICAL_WEIGHT, fusion: str = "weighted"):
+        if fusion not in FUSIONS:
+            raise ValueError(f"Unknown fusion: {fusion}")
+        self.lexical = lexical
+        self.dense = dense
+        self.lexical_weight = lexical_weight
+        self.fusion = fusion
+
+    def component_scores(self, question: str):
+        """(lexical, dense) cosine similarity of every segment"""
+        n_docs = len(self.dense)
+        lexical = self.lexical.scores(question) if self.lexical.vocabulary else np.zeros(n_docs)
+        return lexical, self.dense.scores(question)
+
+    def scores(self, question: str) -> np.ndarray:
+        """Weighted fused score of every segment"""
+        lexical, dense = self.component_scores(question)
+        return self.lexical_weight * lexical + (1 - self.lexical_weight) * dense
+
+    def search(self, question: str, transcriptions, top_k: int = 3, min_score: float = None):
+        """Top segments by fused score, in the same format as smart_text_search
+
+        Segments below ``min_score`` (default: the dense embedder's hybrid
+        threshold) are dropped, so an empty list means "fall back to the web".
+        """
+        if len(self.dense) == 0:
+            return []
+        if min_score is None:
+            min_score = self.dense.min_score("hybrid")
+
+        lexical, dense = self.component_scores(question)
+        fused = self.lexical_weight * lexical + (1 - self.lexical_weight) * dense
+        candidates = np.flatnonzero(fused > min_score)
+        if self.fusion == "rrf":
+            order_key = 1 / (RRF_K + _ranks(lexical)) + 1 / (RRF_K + _ranks(dense))
+        else:
+            order_key = fused
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-order_key[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.lexsort((candidates, -order_key[candidates]))]
+
+        results = []
+        for idx in candidates:
+            results.append({
+                "text": transcriptions[idx]["content"],
+                "metadata": {"source": transcriptions[idx]["filename"]},
+                "score": float(fused[idx]),
+                "word_count": transcriptions[idx]["word_count"]
+            })
+        return results
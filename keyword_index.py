@@ -0,0 +1,115 @@
+"""Inverted index for simple_keyword_search.
+
+Each distinct word maps to the sorted ids of the segments that contain it.
+All postings live in one int32 array with an offsets array per term, so the
+index is a handful of compact NumPy arrays.  A query only reads the postings
+of its own words and computes the same overlap score as the old full scan.
+``updated`` renumbers the postings of unchanged segments and only tokenizes
+new or changed ones.
+"""
+import re
+from itertools import chain
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+MIN_SCORE = 0.1
+
+
+def keyword_set(text: str) -> set:
+    """Distinct lowercased words, as simple_keyword_search has always split them"""
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+
+class KeywordIndex:
+    """term -> postings (segment ids) stored as offsets into one array"""
+
+    def __init__(self, term_slots: dict, offsets: np.ndarray, postings: np.ndarray, n_docs: int):
+        self.term_slots = term_slots
+        self.offsets = offsets
+        self.postings = postings
+        self.n_docs = n_docs
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, transcriptions):
+        """Tokenize every segment once and lay the postings out contiguously"""
+        term_docs = {}
+        for doc_id, t in enumerate(transcriptions):
+            for term in keyword_set(t["content"]):
+                term_docs.setdefault(term, []).append(doc_id)
+
+        term_slots = {term: slot for slot, term in enumerate(term_docs)}
+        lengths = np.fromiter((len(docs) for docs in term_docs.values()), dtype=np.int64, count=len(term_docs))
+        offsets = np.zeros(len(term_docs) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings = np.fromiter(chain.from_iterable(term_docs.values()), dtype=np.int32, count=int(offsets[-1]))
+        return cls(term_slots, offsets, postings, len(transcriptions))
+
+    def updated(self, keep_rows, transcriptions):
+        """New index over the segments ``keep_rows`` (in that order) followed by ``transcriptions``"""
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+        new_id = np.full(self.n_docs, -1, dtype=np.int64)
+        new_id[keep_rows] = np.arange(len(keep_rows))
+        slots = np.repeat(np.arange(len(self.term_slots)), np.diff(self.offsets))
+        docs = new_id[self.postings]
+        slots, docs = slots[docs >= 0], docs[docs >= 0]
+
+        term_slots = dict(self.term_slots)
+        added = [(term_slots.setdefault(term, len(term_slots)), doc_id)
+                 for doc_id, t in enumerate(transcriptions, len(keep_rows)) for term in keyword_set(t["content"])]
+        if added:
+            slots = np.concatenate([slots, np.array([slot for slot, _ in added], dtype=np.int64)])
+            docs = np.concatenate([docs, np.array([doc_id for _, doc_id in added], dtype=np.int64)])
+        order = np.lexsort((docs, slots))
+        slots, docs = slots[order], docs[order]
+
+        lengths = np.bincount(slots, minlength=len(term_slots))
+        used = lengths > 0
+        if not used.all():
+            # Terms only the dropped segments had
+            new_slot = np.cumsum(used) - 1
+            term_slots = {term: int(new_slot[slot]) for term, slot in term_slots.items() if used[slot]}
+            lengths = lengths[used]
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return KeywordIndex(term_slots, offsets, docs.astype(np.int32), len(keep_rows) + len(transcriptions))
+
+    def postings_for(self, term: str) -> np.ndarray:
+        """Ids of the segments containing ``term`` (empty if none)"""
+        slot = self.term_slots.get(term)
+        if slot is None:
+            return self.postings[:0]
+        return self.postings[self.offsets[slot]:self.offsets[slot + 1]]
+
+    def search(self, question: str, transcriptions, top_k: int = 3, min_score: float = MIN_SCORE):
+        """Top segments by word overlap, in the same format and order as simple_keyword_search"""
+        question_words = keyword_set(question)
+        if not question_words:
+            return []
+
+        hits = [self.postings_for(term) for term in question_words]
+        hits = [h for h in hits if len(h)]
+        if not hits:
+            return []
+
+        doc_ids, overlap = np.unique(np.concatenate(hits), return_counts=True)
+        scores = overlap / len(question_words)
+        passed = scores > min_score
+        doc_ids, scores = doc_ids[passed], scores[passed]
+
+        # Highest score first; ties keep corpus order like the old stable sort
+        order = np.lexsort((doc_ids, -scores))[:top_k]
+
+        results = []
+        for idx in order:
+            trans = transcriptions[doc_ids[idx]]
+            results.append({
+                "text": trans["content"],
+                "metadata": {"source": trans["filename"]},
+                "score": float(scores[idx]),
+                "word_count": trans["word_count"]
+            })
+        return results
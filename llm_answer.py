@@ -0,0 +1,362 @@
+"""Generated answers from a local language model, behind a bounded worker pool.
+
+The chat's default answer stitches the best transcript snippets together.
+The generative answer mode instead asks a model to explain them, with the
+tutor prompt prototyped in test-LLm.ipynb.  Backends share one interface,
+``generate(prompts, emit)``, which produces a whole batch of prompts and
+calls ``emit(i, piece)`` for every piece of text of prompt ``i`` as soon as
+it exists:
+
+- OllamaBackend: a local Ollama server (llama3.1, as in the notebook),
+  one prompt per call; the server's own parallelism serves concurrent calls
+- StubBackend: deterministic extractive "model" with a configurable fixed
+  and per-prompt cost, for offline runs, tests and benchmarks
+
+AnswerGenerator sits in front of the backend.  Requests wait in a bounded
+queue (a full queue is rejected at once instead of piling up on the model
+server), a few worker threads take them off it, and requests that arrive
+within ``batch_window`` of each other are generated in one backend call.
+Answers are cached by (normalized question, retrieved segment ids), and a
+request identical to one still being generated joins it, so a repeated
+question never reaches the model twice.  Queue depth, queue wait and
+generation time are kept for /stats.
+
+    LLM_BACKEND=stub streamlit run video_chat_lite.py
+"""
+import os
+import queue
+import re
+import threading
+import time
+
+from dense_index import OLLAMA_URL
+from query_cache import QueryCache
+from web_search import LatencyHistogram
+
+ANSWER_MODES = {
+    "extractive": "Transcript snippets",
+    "generative": "Generated by the local LLM",
+}
+DEFAULT_ANSWER_MODE = "extractive"
+LLM_MODEL = "llama3.1:latest"
+LLM_WORKERS = 2
+MAX_QUEUE = 16
+MAX_BATCH = 4
+# Seconds a worker waits for more requests to join the batch it is about to run
+BATCH_WINDOW = 0.01
+GENERATION_TIMEOUT = 60.0
+# Generated answers stay valid as long as cached transcript results
+CACHE_TTL = 30 * 60
+
+QA_PROMPT = """You are a helpful tutor for school students.
+Always explain in a simple way that a child can understand.
+Use clear examples, and avoid difficult academic words.
+
+Context:
+{context}
+
+Question:
+{question}
+
+Answer in the same language of the question:
+"""
+
+
+class LLMError(Exception):
+    """Generation failed; the message is safe to show to the user"""
+
+
+class LLMOverloaded(LLMError):
+    """The generation queue is full"""
+
+
+def build_prompt(question: str, contexts: list) -> str:
+    """The tutor prompt with one numbered context block per retrieved segment"""
+    context = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(contexts, 1))
+    return QA_PROMPT.format(context=context, question=question)
+
+
+class LLMBackend:
+    """Base class: ``generate(prompts, emit)`` returns one text per prompt"""
+
+    name = "base"
+    # Prompts one generate() call should receive; the pool batches up to this many
+    max_batch = 1
+
+    def generate(self, prompts: list, emit) -> list:
+        raise NotImplementedError
+
+
+class OllamaBackend(LLMBackend):
+    """Streaming completions from a local Ollama server"""
+
+    def __init__(self, model: str = LLM_MODEL, url: str = OLLAMA_URL, temperature: float = 0.2,
+                 num_predict: int = 300, timeout: float = GENERATION_TIMEOUT):
+        self.model = model
+        self.url = url
+        self.options = {"temperature": temperature, "num_predict": num_predict}
+        self.timeout = timeout
+        self.name = f"ollama:{model}"
+
+    def generate(self, prompts: list, emit) -> list:
+        import json
+
+        import requests
+
+        texts = []
+        for i, prompt in enumerate(prompts):
+            pieces = []
+            try:
+                with requests.post(f"{self.url}/api/generate", stream=True, timeout=self.timeout,
+                                   json={"model": self.model, "prompt": prompt, "options": self.options}) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise LLMError(f"{self.name}: {chunk['error']}")
+                        if chunk.get("response"):
+                            pieces.append(chunk["response"])
+                            emit(i, chunk["response"])
+            except requests.ConnectionError:
+                raise LLMError(f"No Ollama server at {self.url}") from None
+            texts.append("".join(pieces))
+        return texts
+
+
+class StubBackend(LLMBackend):
+    """Deterministic stand-in: the opening words of every context block, word by word
+
+    Each call sleeps ``latency`` plus ``per_prompt`` for every prompt in the
+    batch, like a model whose fixed per-call cost is shared by a batch.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, per_prompt: float = 0.0, max_batch: int = MAX_BATCH,
+                 words_per_context: int = 25):
+        self.latency = latency
+        self.per_prompt = per_prompt
+        self.max_batch = max_batch
+        self.words_per_context = words_per_context
+        self.calls = 0
+
+    def answer(self, prompt: str) -> str:
+        context = prompt.split("Context:\n", 1)[-1].split("\n\nQuestion:\n", 1)[0]
+        blocks = [re.sub(r"^\[\d+\]\s*", "", block).split() for block in context.split("\n\n")]
+        return "\n".join("• " + " ".join(words[:self.words_per_context]) for words in blocks if words)
+
+    def generate(self, prompts: list, emit) -> list:
+        self.calls += 1
+        if self.latency or self.per_prompt:
+            time.sleep(self.latency + self.per_prompt * len(prompts))
+        texts = [self.answer(prompt) for prompt in prompts]
+        for i, text in enumerate(texts):
+            for piece in re.findall(r"\S+\s*", text):
+                emit(i, piece)
+        return texts
+
+
+def create_backend(kind: str = "ollama", **kwargs) -> LLMBackend:
+    """Backend by name: "ollama" or "stub"; keyword arguments go to its constructor"""
+    if kind == "ollama":
+        return OllamaBackend(**kwargs)
+    if kind == "stub":
+        return StubBackend(**kwargs)
+    raise ValueError(f"Unknown LLM backend: {kind}")
+
+
+def backend_from_env() -> LLMBackend:
+    """Backend named by LLM_BACKEND (default "ollama"), model from LLM_MODEL"""
+    kind = os.environ.get("LLM_BACKEND", "ollama")
+    if kind == "ollama":
+        return create_backend(kind, model=os.environ.get("LLM_MODEL", LLM_MODEL))
+    return create_backend(kind)
+
+
+class Generation:
+    """One requested answer; any number of readers can stream it"""
+
+    def __init__(self, key: tuple, prompt: str):
+        self.key = key
+        self.prompt = prompt
+        self.submitted = time.perf_counter()
+        self.cached = False
+        self.wait_ms = 0.0
+        self.generate_ms = 0.0
+        self._pieces = []
+        self._done = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def emit(self, piece: str):
+        with self._cond:
+            self._pieces.append(piece)
+            self._cond.notify_all()
+
+    def finish(self, text: str):
+        with self._cond:
+            # Backends that do not stream deliver the whole text at the end
+            if not self._pieces and text:
+                self._pieces.append(text)
+            self._done = True
+            self._cond.notify_all()
+
+    def fail(self, error: LLMError):
+        with self._cond:
+            self._error = error
+            self._done = True
+            self._cond.notify_all()
+
+    def stream(self, timeout: float = GENERATION_TIMEOUT):
+        """Pieces of the answer as they are generated; raises LLMError"""
+        deadline = time.monotonic() + timeout
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self._pieces) and not self._done:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMError(f"No answer within {timeout:.0f}s")
+                    self._cond.wait(remaining)
+                pieces, done, error = self._pieces[sent:], self._done, self._error
+            sent += len(pieces)
+            yield from pieces
+            if error is not None:
+                raise error
+            if done and sent == len(self._pieces):
+                return
+
+    def text(self, timeout: float = GENERATION_TIMEOUT) -> str:
+        return "".join(self.stream(timeout))
+
+
+class AnswerGenerator:
+    """Bounded queue, worker threads, micro-batching and answer cache in front of a backend"""
+
+    def __init__(self, backend: LLMBackend = None, workers: int = LLM_WORKERS, max_queue: int = MAX_QUEUE,
+                 max_batch: int = MAX_BATCH, batch_window: float = BATCH_WINDOW,
+                 timeout: float = GENERATION_TIMEOUT):
+        self.backend = backend if backend is not None else backend_from_env()
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.timeout = timeout
+        self.cache = QueryCache(ttls={"llm": CACHE_TTL})
+        self.wait_latency = LatencyHistogram()
+        self.generate_latency = LatencyHistogram()
+        self.max_queue_depth = 0
+        self.batches = 0
+        self.batched = 0
+        self.joined = 0
+        self.rejected = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._in_flight = {}  # key -> Generation queued or being generated
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        # Started on first use: threads running before engine_api.py forks would not exist in the workers
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"llm-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, question: str, segment_ids: list, contexts: list) -> Generation:
+        """A Generation answering ``question`` from ``contexts``; raises LLMOverloaded
+
+        ``segment_ids`` name the retrieved segments the contexts came from;
+        with the normalized question they make up the cache key.
+        """
+        key = QueryCache.make_key("llm", question, tuple(segment_ids))
+        self._start()
+        with self._lock:
+            # Answers are cached before they leave _in_flight, so one of the two always has them
+            text = self.cache.get(key)
+            if text is not None:
+                generation = Generation(key, None)
+                generation.cached = True
+                generation.finish(text)
+                return generation
+            generation = self._in_flight.get(key)
+            if generation is not None:
+                self.joined += 1
+                return generation
+            generation = Generation(key, build_prompt(question, contexts))
+            try:
+                self._queue.put_nowait(generation)
+            except queue.Full:
+                self.rejected += 1
+                raise LLMOverloaded("Too many answers are being generated; try again in a moment") from None
+            self._in_flight[key] = generation
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return generation
+
+    def _next_batch(self) -> list:
+        """The oldest waiting request plus whatever joins it within the batch window"""
+        batch = [self._queue.get()]
+        limit = min(self.max_batch, self.backend.max_batch)
+        closes_at = time.perf_counter() + self.batch_window
+        while len(batch) < limit:
+            remaining = closes_at - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            self._run(self._next_batch())
+
+    def _run(self, batch: list):
+        start = time.perf_counter()
+        for generation in batch:
+            generation.wait_ms = (start - generation.submitted) * 1000
+            self.wait_latency.observe(generation.wait_ms)
+        try:
+            texts = self.backend.generate([g.prompt for g in batch], lambda i, piece: batch[i].emit(piece))
+            error = None
+        except Exception as e:
+            error = e if isinstance(e, LLMError) else LLMError(f"{self.backend.name}: {e}")
+        generate_ms = (time.perf_counter() - start) * 1000
+        self.generate_latency.observe(generate_ms)
+
+        if error is None:
+            for generation, text in zip(batch, texts):
+                self.cache.put(generation.key, text)
+        with self._lock:
+            self.batches += 1
+            self.batched += len(batch)
+            if error is not None:
+                self.errors += len(batch)
+            for generation in batch:
+                del self._in_flight[generation.key]
+        for i, generation in enumerate(batch):
+            generation.generate_ms = generate_ms
+            if error is not None:
+                generation.fail(error)
+            else:
+                generation.finish(texts[i])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": len(self._in_flight),
+                "batches": self.batches,
+                "mean_batch": self.batched / self.batches if self.batches else None,
+                "joined": self.joined,
+                "rejected": self.rejected,
+                "errors": self.errors,
+                "wait": self.wait_latency.snapshot(),
+                "generate": self.generate_latency.snapshot(),
+                "cache": self.cache.stats(),
+            }
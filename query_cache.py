@@ -0,0 +1,115 @@
+"""Process-wide cache of search results, keyed by normalized question.
+
+A key must only merge questions that get the same results, so callers pick
+the normalization the search behind it applies itself: ``normalize_query``
+(Arabic spelling folded) for searches over Arabic-normalized tokens,
+``lexical_query`` for searches that only see lowercased words, or the
+question verbatim.
+
+Students keep asking the same few questions, so transcript and web results
+are cached for everyone.  The cache holds at most ``max_entries`` results
+and evicts the least recently used one when full.  Each kind of result has
+its own time-to-live, and transcript results are tied to the corpus version
+they were computed from, so a refreshed index never serves stale hits.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from arabic_text import TOKEN_PATTERN, normalize_arabic
+
+DEFAULT_MAX_ENTRIES = 512
+# Seconds a cached result stays valid, per kind of result
+DEFAULT_TTLS = {
+    "video": 30 * 60,
+    "web": 6 * 60 * 60,
+}
+
+
+def normalize_query(question: str) -> str:
+    """Cache key form of a question: normalized spelling, no punctuation, single spaces"""
+    return " ".join(TOKEN_PATTERN.findall(normalize_arabic(question)))
+
+
+def lexical_query(question: str) -> str:
+    """Cache key form that keeps the spelling: lowercased words in order, no punctuation"""
+    return " ".join(TOKEN_PATTERN.findall(question.lower()))
+
+
+def verbatim_query(question: str) -> str:
+    return question
+
+
+class QueryCache:
+    """Bounded LRU cache with a TTL per kind of result"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttls: dict = None):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._entries = OrderedDict()  # key -> (expires_at, version, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(kind: str, question: str, *params, form=normalize_query) -> tuple:
+        return (kind, form(question)) + params
+
+    def get(self, key: tuple, version=None):
+        """Cached value, or None on a miss
+
+        Entries stored under a different ``version`` (e.g. an older corpus)
+        count as misses and are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_version, value = entry
+                if expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                elif entry_version != version:
+                    del self._entries[key]
+                    self.invalidations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value, version=None):
+        """Store a value, evicting the least recently used entry if full"""
+        ttl = self.ttls.get(key[0], min(self.ttls.values()))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, kind: str = None, where=None):
+        """Drop every entry, or only those of one kind (and for which ``where(key)`` holds)"""
+        with self._lock:
+            keys = [k for k in self._entries if (kind is None or k[0] == kind) and (where is None or where(k))]
+            for k in keys:
+                del self._entries[k]
+            self.invalidations += len(keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
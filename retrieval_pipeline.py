@@ -0,0 +1,140 @@
+"""Transcript search plus the web fallback, sequential or speculative.
+
+Sequential is the app's original order: search the transcripts and, only if
+nothing passed the threshold, search the web -- so a transcript miss pays
+for both searches back to back.  Speculative starts the web search on a
+worker thread at the same time as the transcript search when the question
+looks like a miss (most of its words are not in the transcript vocabulary,
+which caps the score of every retrieval mode), and cancels or discards it as
+soon as the transcripts answer.  Both strategies give the same answers;
+speculation only removes the wait between the two searches.  An overall
+deadline bounds how long a question waits for the web, and per-stage
+timings are kept for p50/p95 reporting.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from arabic_text import tokenize
+
+STRATEGIES = {
+    "speculative": "Speculative (web in parallel)",
+    "sequential": "Sequential (web after transcripts)",
+}
+STAGES = ("video", "web", "web_wait", "total")
+# Seconds a question may take in total, web search included
+DEFAULT_DEADLINE = 6.0
+# Start the web search early when fewer question words than this are in the transcripts
+SPECULATE_BELOW = 0.5
+# Timings kept per stage for the percentiles
+TIMING_WINDOW = 1000
+
+
+def vocabulary_coverage(question: str, vocabulary) -> float:
+    """Share of the question's normalized words that occur in the transcripts"""
+    tokens = tokenize(question)
+    if not tokens:
+        return 0.0
+    return sum(token in vocabulary for token in tokens) / len(tokens)
+
+
+class RetrievalOrchestrator:
+    """Runs one question's searches on a shared thread pool and times each stage"""
+
+    def __init__(self, deadline: float = DEFAULT_DEADLINE, speculate_below: float = SPECULATE_BELOW,
+                 max_workers: int = 4):
+        self.deadline = deadline
+        self.speculate_below = speculate_below
+        self.timings = {stage: deque(maxlen=TIMING_WINDOW) for stage in STAGES}
+        self.speculated = 0
+        self.discarded = 0
+        self.deadline_hits = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="retrieval")
+
+    def retrieve(self, question: str, search_video, search_web=None, coverage: float = None,
+                 strategy: str = "speculative") -> dict:
+        """Transcript results, or web results when the transcripts have none
+
+        ``search_video`` runs on the calling thread; ``search_web`` runs on
+        the pool and must not touch the UI.  ``coverage`` (see
+        vocabulary_coverage) decides whether speculation is worth it; without
+        it the web is only searched after a transcript miss.  Web errors are
+        returned in ``error`` rather than raised.
+        """
+        start = time.perf_counter()
+        deadline_at = start + self.deadline
+        outcome = {
+            "video_results": [],
+            "web_results": [],
+            "strategy": strategy,
+            "speculated": False,
+            "deadline_hit": False,
+            "error": None,
+            "timings": {},
+        }
+
+        web_future = None
+        if (strategy == "speculative" and search_web is not None
+                and coverage is not None and coverage < self.speculate_below):
+            web_future = self._submit_web(search_web, question)
+            outcome["speculated"] = True
+
+        stage_start = time.perf_counter()
+        outcome["video_results"] = search_video(question)
+        outcome["timings"]["video"] = (time.perf_counter() - stage_start) * 1000
+
+        if outcome["video_results"]:
+            if web_future is not None:
+                # Not started yet: never runs; already running: its result is ignored
+                web_future.cancel()
+                with self._lock:
+                    self.discarded += 1
+        elif search_web is not None:
+            if web_future is None:
+                web_future = self._submit_web(search_web, question)
+            stage_start = time.perf_counter()
+            try:
+                outcome["web_results"] = web_future.result(timeout=max(0.0, deadline_at - stage_start))
+            except FutureTimeout:
+                outcome["deadline_hit"] = True
+                with self._lock:
+                    self.deadline_hits += 1
+            except Exception as e:
+                outcome["error"] = e
+            outcome["timings"]["web_wait"] = (time.perf_counter() - stage_start) * 1000
+
+        outcome["timings"]["total"] = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if outcome["speculated"]:
+                self.speculated += 1
+            for stage, ms in outcome["timings"].items():
+                self.timings[stage].append(ms)
+        return outcome
+
+    def _submit_web(self, search_web, question: str):
+        def timed_search():
+            stage_start = time.perf_counter()
+            try:
+                return search_web(question)
+            finally:
+                with self._lock:
+                    self.timings["web"].append((time.perf_counter() - stage_start) * 1000)
+        return self._pool.submit(timed_search)
+
+    def stats(self) -> dict:
+        """p50/p95 per stage over the recent questions, plus speculation counters"""
+        with self._lock:
+            samples = {stage: list(times) for stage, times in self.timings.items()}
+            stats = {"speculated": self.speculated, "discarded": self.discarded,
+                     "deadline_hits": self.deadline_hits}
+        for stage, times in samples.items():
+            stats[stage] = {
+                "count": len(times),
+                "p50_ms": statistics.median(times) if times else None,
+                "p95_ms": statistics.quantiles(times, n=20)[-1] if len(times) > 1 else (times[0] if times else None),
+            }
+        return stats
@@ -0,0 +1,106 @@
+"""Timestamp-aware store of the transcript segments.
+
+The files in ./transcriptions are named by their start second in the video
+(0.txt, 30.txt, ... 1020.txt).  SegmentStore parses those offsets and keeps
+the segments sorted in NumPy arrays, so "which segment plays at second t"
+and "the segments around it" are binary searches instead of corpus scans.
+"""
+import re
+
+import numpy as np
+
+OFFSET_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\.txt$')
+# Used for the last segment's end when there is nothing to measure a gap from
+DEFAULT_SEGMENT_SECONDS = 30.0
+
+
+def parse_offset(filename: str):
+    """Start second encoded in a transcript filename, or None"""
+    match = OFFSET_PATTERN.match(filename)
+    return float(match.group(1)) if match else None
+
+
+def format_timestamp(seconds: float) -> str:
+    """mm:ss, or h:mm:ss for videos longer than an hour"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class SegmentStore:
+    """Segments sorted by start time
+
+    ``doc_ids[i]`` is the position in the corpus of the i-th segment in time
+    order, with its span in ``starts[i]``..``ends[i]``.  Transcripts whose
+    names carry no offset are left out.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, doc_ids: np.ndarray, filenames: list):
+        self.starts = starts
+        self.ends = ends
+        self.doc_ids = doc_ids
+        self._position_of = {filenames[doc_id]: pos for pos, doc_id in enumerate(doc_ids)}
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def build(cls, transcriptions):
+        filenames = [t["filename"] for t in transcriptions]
+        timed = [(offset, doc_id) for doc_id, fn in enumerate(filenames)
+                 if (offset := parse_offset(fn)) is not None]
+        timed.sort()
+
+        starts = np.array([offset for offset, _ in timed], dtype=np.float64)
+        doc_ids = np.array([doc_id for _, doc_id in timed], dtype=np.int32)
+        ends = np.empty_like(starts)
+        if len(starts):
+            # Each segment runs until the next one starts; the last one gets the typical gap
+            ends[:-1] = starts[1:]
+            gaps = np.diff(starts)
+            ends[-1] = starts[-1] + (float(np.median(gaps)) if len(gaps) else DEFAULT_SEGMENT_SECONDS)
+        return cls(starts, ends, doc_ids, filenames)
+
+    def position_at(self, t: float):
+        """Time-order position of the segment playing at second t, or None"""
+        pos = int(np.searchsorted(self.starts, t, side="right")) - 1
+        if pos < 0 or t >= self.ends[pos]:
+            return None
+        return pos
+
+    def segment_at(self, t: float):
+        """Corpus position of the segment playing at second t, or None"""
+        pos = self.position_at(t)
+        return None if pos is None else int(self.doc_ids[pos])
+
+    def window(self, t: float, before: int = 1, after: int = 1) -> list:
+        """Corpus positions of the segment at t and its neighbours, in time order"""
+        pos = self.position_at(t)
+        if pos is None:
+            return []
+        return self.doc_ids[max(0, pos - before):pos + after + 1].tolist()
+
+    def neighbours(self, filename: str, before: int = 1, after: int = 1) -> list:
+        """Corpus positions of a segment and the ones around it, in time order"""
+        pos = self._position_of.get(filename)
+        if pos is None:
+            return []
+        return self.doc_ids[max(0, pos - before):pos + after + 1].tolist()
+
+    def span(self, filename: str):
+        """(start_sec, end_sec) of a segment, or None if its name has no offset"""
+        pos = self._position_of.get(filename)
+        if pos is None:
+            return None
+        return float(self.starts[pos]), float(self.ends[pos])
+
+    def annotate(self, results: list) -> list:
+        """Add start_sec/end_sec to the metadata of search results"""
+        for result in results:
+            span = self.span(result["metadata"]["source"])
+            if span is not None:
+                result["metadata"]["start_sec"], result["metadata"]["end_sec"] = span
+        return results
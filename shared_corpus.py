@@ -0,0 +1,63 @@
+"""Immutable, process-wide snapshot of the transcripts and their search index.
+
+Every Streamlit session references the same Corpus object instead of keeping
+its own copy in st.session_state.  A reload builds a new Corpus and swaps the
+reference in one assignment; queries already running keep the snapshot they
+started with.  Versions are unique within the process, so results cached
+for one corpus never match another, even one of a shard loaded again.
+"""
+import itertools
+import time
+
+_versions = itertools.count(1)
+
+
+def next_version() -> int:
+    """A corpus version no other Corpus of this process has"""
+    return next(_versions)
+
+
+class Corpus:
+    """Read-only transcripts plus the search indexes built from them
+
+    Behaves like the old list of transcription dicts (len, iteration,
+    indexing), so search functions can take either.
+    """
+
+    __slots__ = (
+        "transcriptions", "index", "keyword_index", "bm25_index", "segments", "windows",
+        "dense_index", "total_words", "version", "loaded_at"
+    )
+
+    def __init__(self, transcriptions, index, version: int = 0, keyword_index=None, bm25_index=None,
+                 segments=None, windows=None, dense_index=None):
+        transcriptions = tuple(transcriptions)
+        set_attr = object.__setattr__
+        set_attr(self, "transcriptions", transcriptions)
+        set_attr(self, "index", index)
+        set_attr(self, "keyword_index", keyword_index)
+        set_attr(self, "bm25_index", bm25_index)
+        set_attr(self, "segments", segments)
+        set_attr(self, "windows", windows)
+        set_attr(self, "dense_index", dense_index)
+        set_attr(self, "total_words", sum(t["word_count"] for t in transcriptions))
+        set_attr(self, "version", version)
+        set_attr(self, "loaded_at", time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Corpus is read-only; build a new one and swap it in")
+
+    def __len__(self):
+        return len(self.transcriptions)
+
+    def __iter__(self):
+        return iter(self.transcriptions)
+
+    def __getitem__(self, i):
+        return self.transcriptions[i]
+
+    def __bool__(self):
+        return bool(self.transcriptions)
+
+
+EMPTY_CORPUS = Corpus((), None)
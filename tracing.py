@@ -0,0 +1,230 @@
+"""Per-request tracing spans, process-wide metrics and a slow-request profiler.
+
+Every chat answer gets a Trace: named, timed spans for the stages it went
+through (load, retrieve, fallback, compose, and render in the app).
+Finished traces are folded into a Metrics registry of one process: a
+latency histogram per span name plus labelled counters (answers by source,
+i.e. the fallback rate, and errors by stage).  ``Metrics.prometheus``
+renders them, together with the cache and backend counters the engine
+already keeps, in the Prometheus text format; engine_api.py serves that at
+GET /metrics.  With several forked workers each keeps its own registry and
+a scrape is answered by one of them (its pid is the ``worker`` label).
+
+SlowRequestProfiler is opt-in: it runs cProfile over requests (one at a
+time; the others are not profiled) and writes the stats of any request
+slower than its threshold to ``folder``, to be read with pstats or
+snakeviz.
+
+    VIDEO_CHAT_PROFILE_MS=500 streamlit run video_chat_lite.py
+    python engine_api.py --profile-slow-ms 500 --profile-dir ./profiles
+    python -m pstats profiles/<file>.prof
+"""
+import cProfile
+import os
+import threading
+import time
+import uuid
+
+from web_search import LatencyHistogram
+
+METRIC_PREFIX = "video_chat"
+PROFILE_FOLDER = r"./profiles"
+
+
+class SpanHistogram(LatencyHistogram):
+    """LatencyHistogram with buckets down to a millisecond, for in-process stages"""
+
+    BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Trace:
+    """Timed spans of one request"""
+
+    def __init__(self, name: str = "answer"):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []  # (name, start_ms, duration_ms) relative to the start of the request
+
+    def add(self, name: str, ms: float, start: float = None):
+        """Record a span measured elsewhere; ``start`` is a perf_counter value"""
+        offset = ((start if start is not None else time.perf_counter() - ms / 1000) - self.started) * 1000
+        self.spans.append((name, offset, ms))
+
+    def span(self, name: str):
+        """Context manager that records the time spent in its block"""
+        return _Span(self, name)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def durations(self) -> dict:
+        """Milliseconds per span name, repeated spans added up"""
+        totals = {}
+        for name, _, ms in self.spans:
+            totals[name] = totals.get(name, 0.0) + ms
+        return totals
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "total_ms": self.total_ms(),
+            "spans": [{"name": name, "start_ms": start, "ms": ms} for name, start, ms in self.spans],
+        }
+
+
+class _Span:
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, (time.perf_counter() - self.start) * 1000, self.start)
+        return False
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """Span latency histograms and labelled counters of one process"""
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self.spans = {}  # span name -> SpanHistogram
+        self.counters = {}  # (name, ((label, value), ...)) -> count
+        self.last_trace = None
+        self._lock = threading.Lock()
+
+    def observe_span(self, name: str, ms: float):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = SpanHistogram()
+        histogram.observe(ms)
+
+    def observe(self, trace: Trace):
+        """Fold a finished trace into the span histograms"""
+        for name, ms in trace.durations().items():
+            self.observe_span(name, ms)
+        self.observe_span("total", trace.total_ms())
+        self.last_trace = trace.to_dict()
+
+    def incr(self, name: str, n: int = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def total(self, name: str, **labels) -> int:
+        """Sum of the counters called ``name`` whose labels include ``labels``"""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(n for (counter, counter_labels), n in self.counters.items()
+                       if counter == name and wanted <= set(counter_labels))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+        return {
+            "spans": {name: histogram.snapshot() for name, histogram in spans.items()},
+            "counters": {name + _labels(dict(labels)): n for (name, labels), n in sorted(counters.items())},
+            "last_trace": self.last_trace,
+        }
+
+    def prometheus(self, samples: list = ()) -> str:
+        """Prometheus text exposition of the histograms, counters and extra ``samples``
+
+        ``samples`` are (name, type, labels, value) tuples of metrics kept
+        elsewhere, e.g. ("query_cache_hits_total", "counter", {}, 12).
+        """
+        worker = {"worker": os.getpid()}
+        lines = []
+        with self._lock:
+            spans = sorted(self.spans.items())
+            counters = sorted(self.counters.items())
+
+        name = f"{self.prefix}_stage_duration_ms"
+        lines += [f"# HELP {name} Time spent per request in each stage, milliseconds", f"# TYPE {name} histogram"]
+        for stage, histogram in spans:
+            snapshot = histogram.snapshot()
+            cumulative = 0
+            for bound, n in snapshot["buckets"].items():
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(dict(worker, stage=stage, le=bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(dict(worker, stage=stage))} {histogram.total_ms:.3f}")
+            lines.append(f"{name}_count{_labels(dict(worker, stage=stage))} {snapshot['count']}")
+
+        typed = set()
+        rows = [(counter, "counter", dict(labels), n) for (counter, labels), n in counters] + list(samples)
+        for metric, kind, labels, value in sorted(rows, key=lambda row: row[0]):
+            if value is None:
+                continue
+            full_name = f"{self.prefix}_{metric}"
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f"# TYPE {full_name} {kind}")
+            lines.append(f"{full_name}{_labels(dict(worker, **labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """cProfile over requests, keeping the profiles of those slower than ``threshold_ms``"""
+
+    def __init__(self, threshold_ms: float, folder: str = PROFILE_FOLDER):
+        self.threshold_ms = threshold_ms
+        self.folder = folder
+        self.profiled = 0
+        self.slow = 0
+        self.last_profile = None  # path of the newest dumped profile
+        # cProfile measures one thread, and only one profiler may be active at a time
+        self._busy = threading.Lock()
+
+    def start(self):
+        """A running profiler for this request, or None while another one is profiled"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool is already active in this interpreter
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, trace: Trace):
+        """Stop ``profile``; write it out if ``trace`` was slow.  The path, or None"""
+        profile.disable()
+        self._busy.release()
+        self.profiled += 1
+        total_ms = trace.total_ms()
+        if total_ms < self.threshold_ms:
+            return None
+        self.slow += 1
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"{time.strftime('%Y%m%d-%H%M%S')}-{trace.id}-{total_ms:.0f}ms.prof")
+        profile.dump_stats(path)
+        self.last_profile = path
+        return path
+
+    def stats(self) -> dict:
+        return {"threshold_ms": self.threshold_ms, "profiled": self.profiled, "slow": self.slow,
+                "last_profile": self.last_profile}
+
+
+def profiler_from_env():
+    """SlowRequestProfiler when VIDEO_CHAT_PROFILE_MS is set (folder: VIDEO_CHAT_PROFILE_DIR), else None"""
+    threshold = os.environ.get("VIDEO_CHAT_PROFILE_MS")
+    if not threshold:
+        return None
+    return SlowRequestProfiler(float(threshold), os.environ.get("VIDEO_CHAT_PROFILE_DIR", PROFILE_FOLDER))
@@ -0,0 +1,319 @@
+"""Persistent TF-IDF index over the video transcriptions.
+
+Raw n-gram counts are stored per transcript in ./tfidf_index (next to
+./transcriptions).  The 1000-feature vocabulary, IDF weights and normalized
+document matrix are derived from those counts with a few vectorized
+operations, so changing one transcript only re-tokenizes that transcript.
+At query time only the question is transformed.  ``scores`` rates every
+document with one sparse dot product.  ``top_k`` (used by ``search``) reads
+the postings of the question's terms instead, most promising term first,
+and skips the rest once they can no longer lift a new document past the
+threshold or the k-th score; it returns exactly what exhaustive scoring
+would.
+"""
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+INDEX_FOLDER = r"./tfidf_index"
+INDEX_VERSION = 3
+
+# Same settings the app has always used for smart_text_search
+MAX_FEATURES = 1000
+NGRAM_RANGE = (1, 2)
+MIN_SIMILARITY = 0.05
+# Rounding margin for score bounds: pruning must never drop a document that exact scoring keeps
+BOUND_SLACK = 1e-9
+# Below this many documents one dot product over all of them beats walking postings
+PRUNE_MIN_DOCUMENTS = 2000
+
+
+def content_hash(content: str) -> str:
+    """SHA-1 of a transcript's text"""
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def fingerprint_from_hashes(pairs) -> str:
+    """Fingerprint of (filename, content hash) pairs, in order"""
+    digest = hashlib.sha1()
+    for filename, sha1 in pairs:
+        digest.update(filename.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(sha1.encode("ascii"))
+    return digest.hexdigest()
+
+
+def counts_digest(counts) -> str:
+    """SHA-1 of a CSR count matrix's arrays, to tell its saved file from another save's"""
+    digest = hashlib.sha1()
+    for array in (counts.data, counts.indices, counts.indptr):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def corpus_fingerprint(transcriptions: list) -> str:
+    """Hash of the transcript set (names and contents, in order)"""
+    return fingerprint_from_hashes((t["filename"], content_hash(t["content"])) for t in transcriptions)
+
+
+def count_terms(contents: list, terms: list, term_ids: dict):
+    """Raw n-gram counts for some documents, growing the shared vocabulary
+
+    New terms are appended to ``terms``/``term_ids`` so existing column
+    numbers never change.
+    """
+    counter = CountVectorizer(ngram_range=NGRAM_RANGE)
+    try:
+        local_counts = counter.fit_transform(contents)
+    except ValueError:
+        # Nothing but empty/stop-word documents
+        return sparse.csr_matrix((len(contents), len(terms)), dtype=np.int64)
+
+    local_to_global = np.empty(len(counter.vocabulary_), dtype=np.int64)
+    for term, local_col in counter.vocabulary_.items():
+        col = term_ids.get(term)
+        if col is None:
+            col = len(terms)
+            term_ids[term] = col
+            terms.append(term)
+        local_to_global[local_col] = col
+
+    local_counts = local_counts.tocoo()
+    return sparse.csr_matrix(
+        (local_counts.data.astype(np.int64), (local_counts.row, local_to_global[local_counts.col])),
+        shape=(len(contents), len(terms))
+    )
+
+
+class TfidfIndex:
+    """Per-transcript n-gram counts plus the derived TF-IDF matrix"""
+
+    def __init__(self, terms: list, counts, filenames: list, fingerprint: str):
+        self.terms = terms
+        self.counts = counts.tocsr()
+        self.filenames = filenames
+        self.fingerprint = fingerprint
+        self._select_features()
+        # A fixed-vocabulary CountVectorizer needs no fitting, so queries only tokenize
+        self._counter = CountVectorizer(vocabulary=self.vocabulary, ngram_range=NGRAM_RANGE)
+
+    def __len__(self):
+        return self.counts.shape[0]
+
+    def _select_features(self):
+        """Keep the most frequent terms and weight them like TfidfVectorizer"""
+        totals = np.asarray(self.counts.sum(axis=0)).ravel()
+        present = np.flatnonzero(totals)
+        # Alphabetical column order, then the same argsort TfidfVectorizer uses,
+        # so ties at the cut-off resolve exactly as they did before
+        present = present[np.argsort(np.array([self.terms[i] for i in present], dtype=object))]
+        if len(present) > MAX_FEATURES:
+            present = present[(-totals[present]).argsort()[:MAX_FEATURES]]
+
+        kept = self.counts[:, present].tocsr()
+        n_docs = kept.shape[0]
+        doc_freq = np.bincount(kept.indices, minlength=len(present))
+        # Smooth IDF, as in sklearn's default TfidfTransformer
+        self.idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1.0
+        weighted = kept.multiply(self.idf).tocsr().astype(np.float64)
+        # normalize() rejects a matrix with no rows (an empty transcripts folder)
+        self.matrix = normalize(weighted) if n_docs else weighted
+        self.vocabulary = {self.terms[col]: i for i, col in enumerate(present)}
+        # Column-major copy (each term's postings) and each term's top weight, for top_k
+        self.postings = self.matrix.tocsc()
+        self.max_weights = np.zeros(self.matrix.shape[1])
+        if self.postings.nnz:
+            self.max_weights = self.postings.max(axis=0).toarray().ravel()
+
+    @classmethod
+    def build(cls, transcriptions: list):
+        """Count n-grams in every transcript and derive the TF-IDF matrix"""
+        terms = []
+        counts = count_terms([t["content"] for t in transcriptions], terms, {})
+        return cls(terms, counts, [t["filename"] for t in transcriptions], corpus_fingerprint(transcriptions))
+
+    def updated(self, changed: list, removed: set, fingerprint: str):
+        """New index with ``changed`` transcripts (re)counted and ``removed`` filenames dropped
+
+        Only the changed transcripts are tokenized; untouched rows are reused.
+        Changed transcripts move to the end, so callers must order their
+        transcript list by the new index's ``filenames``.
+        """
+        changed_names = {t["filename"] for t in changed}
+        keep_rows = [i for i, fn in enumerate(self.filenames) if fn not in removed and fn not in changed_names]
+
+        terms = list(self.terms)
+        term_ids = {term: col for col, term in enumerate(terms)}
+        new_counts = count_terms([t["content"] for t in changed], terms, term_ids) if changed else None
+
+        kept = self.counts[keep_rows]
+        kept = sparse.csr_matrix((kept.data, kept.indices, kept.indptr), shape=(len(keep_rows), len(terms)))
+        counts = sparse.vstack([kept, new_counts]).tocsr() if new_counts is not None else kept
+        filenames = [self.filenames[i] for i in keep_rows] + [t["filename"] for t in changed]
+        return TfidfIndex(terms, counts, filenames, fingerprint)
+
+    def save(self, folder: str = INDEX_FOLDER):
+        """Write the raw counts (CSR .npz) and term list to disk
+
+        Both files are written to temporary names and renamed into place, so
+        neither is ever seen half written.  Forked workers may save into the
+        same folder at once: the metadata records the shape and digest of its
+        counts, and ``load`` rejects a counts file from another save.
+        """
+        os.makedirs(folder, exist_ok=True)
+        meta = {
+            "version": INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "filenames": self.filenames,
+            "terms": self.terms,
+            "shape": list(self.counts.shape),
+            "counts_sha1": counts_digest(self.counts)
+        }
+        suffix = f".{os.getpid()}.tmp"
+        counts_path = os.path.join(folder, "counts.npz")
+        # A file object, since save_npz appends ".npz" to other names
+        with open(counts_path + suffix, "wb") as f:
+            sparse.save_npz(f, self.counts)
+        os.replace(counts_path + suffix, counts_path)
+        meta_path = os.path.join(folder, "meta.json")
+        with open(meta_path + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + suffix, meta_path)
+
+    @classmethod
+    def load(cls, folder: str = INDEX_FOLDER):
+        """Load a saved index, or return None if there is no usable one"""
+        meta_path = os.path.join(folder, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                return None
+            counts = sparse.load_npz(os.path.join(folder, "counts.npz")).tocsr()
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+
+        # The counts must be the ones this metadata was saved with, not a concurrent save's
+        if (list(counts.shape) != meta["shape"] or counts.shape[0] != len(meta["filenames"])
+                or counts.shape[1] != len(meta["terms"]) or counts_digest(counts) != meta["counts_sha1"]):
+            return None
+        return cls(meta["terms"], counts, meta["filenames"], meta["fingerprint"])
+
+    def transform(self, question: str):
+        """TF-IDF vector for the question, using the stored vocabulary"""
+        counts = self._counter.transform([question]).astype(np.float64)
+        return normalize(counts.multiply(self.idf).tocsr())
+
+    def scores(self, question: str) -> np.ndarray:
+        """Cosine similarity of the question against every document"""
+        question_vector = self.transform(question)
+        # Rows are already L2-normalized, so the dot product is the cosine
+        return (self.matrix @ question_vector.T).toarray().ravel()
+
+    def top_k_exhaustive(self, question: str, k: int = 3, min_score: float = MIN_SIMILARITY):
+        """(rows, scores) of the best ``k`` documents above ``min_score``, scoring every document"""
+        return _select(self.scores(question), np.arange(len(self)), k, min_score)
+
+    def top_k(self, question: str, k: int = 3, min_score: float = MIN_SIMILARITY):
+        """Same as ``top_k_exhaustive``, reading only the postings that can change the answer
+
+        Term-at-a-time: terms are taken in order of the most they can add to
+        any document (question weight x the term's top weight), and their
+        postings are added into partial scores.  Partial scores only grow,
+        so once the terms left add up to no more than ``min_score``, or less
+        than the k-th partial score, a document none of the read postings
+        contains cannot make the results and the rest of the postings are
+        skipped.  Candidates whose partial score plus that remainder cannot
+        reach the bar are dropped; the others are scored exactly, with the
+        same row dot products as ``scores``.
+        """
+        no_results = np.empty(0, dtype=np.int64), np.empty(0)
+        if len(self) == 0 or not self.vocabulary or k <= 0:
+            return no_results
+        if len(self) < PRUNE_MIN_DOCUMENTS:
+            return self.top_k_exhaustive(question, k, min_score)
+        query = self.transform(question)
+        terms, weights = query.indices, query.data
+        if not len(terms):
+            return no_results
+
+        bounds = weights * self.max_weights[terms]
+        order = np.argsort(-bounds, kind="stable")
+        # remaining[i]: the most that terms order[i:] can add to any one document
+        remaining = np.append(np.cumsum(bounds[order][::-1])[::-1], 0.0)
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+
+        docs, partial = np.empty(0, dtype=indices.dtype), np.empty(0)
+        kth = -np.inf
+        read = 0
+        while read < len(order):
+            if remaining[read] + BOUND_SLACK <= min_score or remaining[read] + BOUND_SLACK < kth:
+                break
+            position = order[read]
+            start, end = indptr[terms[position]], indptr[terms[position] + 1]
+            docs, slots = np.unique(np.concatenate([docs, indices[start:end]]), return_inverse=True)
+            partial = np.bincount(slots, weights=np.concatenate([partial, data[start:end] * weights[position]]),
+                                  minlength=len(docs))
+            if len(partial) >= k:
+                kth = np.partition(partial, len(partial) - k)[len(partial) - k]
+            read += 1
+
+        upper = partial + remaining[read] + BOUND_SLACK
+        docs = docs[(upper > min_score) & (upper >= kth)]
+        if not len(docs):
+            return no_results
+        exact = (self.matrix[docs] @ query.T).toarray().ravel()
+        return _select(exact, docs, k, min_score)
+
+    def search(self, question: str, transcriptions: list, top_k: int = 3, min_score: float = MIN_SIMILARITY):
+        """Top matching transcripts, in the same format as smart_text_search
+
+        ``transcriptions`` must be in the same order as ``self.filenames``.
+        Equal scores rank the earlier transcript first.
+        """
+        if len(self) == 0 or not self.vocabulary:
+            return []
+
+        rows, similarities = self.top_k(question, top_k, min_score)
+        return [{
+            "text": transcriptions[idx]["content"],
+            "metadata": {"source": transcriptions[idx]["filename"]},
+            "score": float(score),
+            "word_count": transcriptions[idx]["word_count"]
+        } for idx, score in zip(rows.tolist(), similarities)]
+
+
+def _select(scores: np.ndarray, rows: np.ndarray, k: int, min_score: float):
+    """(rows, scores) of the ``k`` highest scores above ``min_score``; ties go to the lower row"""
+    above = np.flatnonzero(scores > min_score)
+    if len(above) > k:
+        # argpartition finds the k-th score; every score tied with it stays for the tie-break
+        kth = scores[above[np.argpartition(-scores[above], k - 1)[k - 1]]]
+        above = above[scores[above] >= kth]
+    ranked = above[np.lexsort((rows[above], -scores[above]))][:k]
+    return rows[ranked], scores[ranked]
+
+
+def load_or_build_index(transcriptions: list, folder: str = INDEX_FOLDER) -> TfidfIndex:
+    """Reuse the saved index if the transcript set is unchanged, otherwise rebuild it"""
+    fingerprint = corpus_fingerprint(transcriptions)
+    index = TfidfIndex.load(folder)
+    if index is not None and index.fingerprint == fingerprint:
+        return index
+
+    index = TfidfIndex.build(transcriptions)
+    try:
+        index.save(folder)
+    except OSError:
+        # Read-only deployments still work, they just refit on the next start
+        pass
+    return index
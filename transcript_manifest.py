@@ -0,0 +1,292 @@
+"""File manifest and incremental index updates for ./transcriptions.
+
+The manifest records path, size, mtime and content hash for every transcript
+file.  A refresh only re-reads files whose size or mtime changed and only
+re-indexes files whose content hash changed; deleted files are dropped.
+The first refresh starts from the compiled corpus snapshot when it still
+matches the folder (see corpus_snapshot.py).
+
+    python transcript_manifest.py              # refresh once and print the counts
+    python transcript_manifest.py --watch 10   # keep refreshing every 10 seconds
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from bm25_index import BM25Index
+from chunking import WindowIndex
+from corpus_snapshot import load_snapshot, snapshot_path
+from dense_index import DENSE_FOLDER, DenseIndex
+from keyword_index import KeywordIndex
+from segment_store import SegmentStore
+from shared_corpus import EMPTY_CORPUS, Corpus, next_version
+from transcript_index import INDEX_FOLDER, TfidfIndex, content_hash, fingerprint_from_hashes
+
+TRANSCRIPTIONS_FOLDER = r"./transcriptions"
+MANIFEST_FILE = "manifest.json"
+
+
+def load_manifest(index_folder: str, fingerprint: str) -> dict:
+    """Saved manifest, if it describes the index with this fingerprint"""
+    try:
+        with open(os.path.join(index_folder, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if saved.get("fingerprint") != fingerprint:
+        return {}
+    return saved.get("files", {})
+
+
+def save_manifest(index_folder: str, fingerprint: str, manifest: dict):
+    """Write the manifest next to the index it describes"""
+    os.makedirs(index_folder, exist_ok=True)
+    tmp_path = os.path.join(index_folder, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint, "files": manifest}, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(index_folder, MANIFEST_FILE))
+
+
+class TranscriptUpdater:
+    """Keeps a shared Corpus in sync with the transcriptions folder
+
+    Each refresh that finds changes builds a new Corpus and swaps it in with
+    a single assignment, so readers can keep using the old one while a
+    refresh runs.
+    """
+
+    def __init__(self, folder: str = TRANSCRIPTIONS_FOLDER, index_folder: str = INDEX_FOLDER,
+                 dense_folder: str = DENSE_FOLDER):
+        self.folder = folder
+        self.index_folder = index_folder
+        self.dense_folder = dense_folder
+        self.manifest = {}  # filename -> {"path", "size", "mtime", "sha1"}
+        self.errors = []  # (filename, error) pairs from the last refresh
+        self.last_refresh = None
+        self.last_stats = {"added": 0, "updated": 0, "removed": 0}
+        self.corpus = EMPTY_CORPUS
+        self.from_snapshot = False  # whether the current corpus came from the compiled snapshot
+        self._lock = threading.Lock()
+
+    @property
+    def transcriptions(self) -> tuple:
+        return self.corpus.transcriptions
+
+    @property
+    def index(self):
+        return self.corpus.index
+
+    def refresh_if_stale(self, max_age: float):
+        """Refresh unless the last refresh was less than max_age seconds ago"""
+        if self.last_refresh is not None and time.monotonic() - self.last_refresh < max_age:
+            return None
+        return self.refresh()
+
+    def refresh(self) -> dict:
+        """Pick up added, changed and removed files; returns the counts"""
+        with self._lock:
+            return self._refresh()
+
+    def _scan(self):
+        """Read new or modified files; returns (documents, hashes, manifest)"""
+        previous = {t["filename"]: t for t in self.transcriptions}
+        documents, hashes, manifest = {}, {}, {}
+        self.errors = []
+
+        if not os.path.exists(self.folder):
+            return documents, hashes, manifest
+
+        for fn in sorted(os.listdir(self.folder)):
+            if not fn.endswith(".txt"):
+                continue
+            path = os.path.join(self.folder, fn)
+            try:
+                stat = os.stat(path)
+                entry = self.manifest.get(fn)
+                if (entry and fn in previous and entry["size"] == stat.st_size
+                        and entry["mtime"] == stat.st_mtime_ns):
+                    # Unchanged on disk: no need to read it again
+                    manifest[fn] = entry
+                    documents[fn] = previous[fn]
+                    hashes[fn] = entry["sha1"]
+                    continue
+
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+            except (OSError, UnicodeDecodeError) as e:
+                self.errors.append((fn, str(e)))
+                if fn in previous:
+                    # Keep serving the last good version
+                    manifest[fn] = self.manifest[fn]
+                    documents[fn] = previous[fn]
+                    hashes[fn] = self.manifest[fn]["sha1"]
+                continue
+
+            sha1 = content_hash(content)
+            manifest[fn] = {"path": path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": sha1}
+            if content:
+                documents[fn] = {
+                    "filename": fn,
+                    "content": content,
+                    "word_count": len(content.split())
+                }
+                hashes[fn] = sha1
+
+        return documents, hashes, manifest
+
+    def _load_snapshot(self) -> bool:
+        """Start from the compiled snapshot if it matches the folder"""
+        loaded = load_snapshot(snapshot_path(self.index_folder), self.folder)
+        if loaded is None:
+            return False
+        parts, self.manifest, hashes = loaded
+        self.errors = []
+        transcriptions = parts["transcriptions"]
+        self.corpus = Corpus(version=next_version(),
+                             dense_index=self._dense_index(transcriptions, hashes), **parts)
+        self.from_snapshot = True
+        return True
+
+    def _refresh(self) -> dict:
+        index = self.index
+        if self.last_refresh is None and self._load_snapshot():
+            self.last_refresh = time.monotonic()
+            self.last_stats = {"added": 0, "updated": 0, "removed": 0}
+            return self.last_stats
+        if self.last_refresh is None:
+            # First refresh: start from the saved index and its manifest
+            index = TfidfIndex.load(self.index_folder)
+            if index is not None:
+                self.manifest = load_manifest(self.index_folder, index.fingerprint)
+
+        documents, hashes, manifest = self._scan()
+        indexed_manifest = self.manifest
+
+        # Content hashes of what the index currently holds
+        indexed = {}
+        if index is not None:
+            indexed = {fn: indexed_manifest.get(fn, {}).get("sha1") for fn in index.filenames}
+            if fingerprint_from_hashes((fn, indexed[fn] or "") for fn in index.filenames) != index.fingerprint:
+                # No manifest for this index; compare against what is on disk now
+                on_disk = [(fn, hashes.get(fn, "")) for fn in index.filenames]
+                if fingerprint_from_hashes(on_disk) == index.fingerprint:
+                    indexed = dict(on_disk)
+                else:
+                    index, indexed = None, {}
+
+        added = [fn for fn in documents if fn not in indexed]
+        updated = [fn for fn in documents if fn in indexed and indexed[fn] != hashes[fn]]
+        removed = {fn for fn in indexed if fn not in documents}
+        stats = {"added": len(added), "updated": len(updated), "removed": len(removed)}
+
+        if index is None:
+            index = TfidfIndex.build([documents[fn] for fn in documents])
+        elif added or updated or removed:
+            changed = [documents[fn] for fn in added + updated]
+            kept = [fn for fn in index.filenames if fn not in removed and fn not in updated]
+            order = kept + added + updated
+            index = index.updated(changed, removed, fingerprint_from_hashes((fn, hashes[fn]) for fn in order))
+
+        if index is not self.index:
+            self.from_snapshot = False
+            transcriptions = [documents[fn] for fn in index.filenames]
+            self.corpus = Corpus(
+                transcriptions, index, next_version(),
+                segments=SegmentStore.build(transcriptions),
+                dense_index=self._dense_index(transcriptions),
+                **self._token_indexes(transcriptions, set(added) | set(updated))
+            )
+            try:
+                index.save(self.index_folder)
+                save_manifest(self.index_folder, index.fingerprint, manifest)
+            except OSError:
+                # Read-only deployments still work, they just re-index on the next start
+                pass
+
+        # Only now: a refresh that raised is retried on the next call, not after max_age
+        self.manifest = manifest
+        self.last_refresh = time.monotonic()
+        self.last_stats = stats
+        return stats
+
+    def _token_indexes(self, transcriptions: list, changed: set) -> dict:
+        """Keyword, BM25 and window indexes of a new corpus, tokenizing only what the current one lacks
+
+        TfidfIndex.updated lists the unchanged transcripts first, in their old
+        order; those keep their tokens and only the rest are tokenized.
+        """
+        previous = self.corpus
+        rows = {t["filename"]: row for row, t in enumerate(previous)}
+        keep_rows = []
+        for t in transcriptions:
+            row = rows.get(t["filename"])
+            if row is None or t["filename"] in changed:
+                break
+            keep_rows.append(row)
+        fresh = transcriptions[len(keep_rows):]
+
+        if not keep_rows or None in (previous.keyword_index, previous.bm25_index, previous.windows):
+            return {"keyword_index": KeywordIndex.build(transcriptions), "bm25_index": BM25Index.build(transcriptions),
+                    "windows": WindowIndex.build(transcriptions)}
+        return {"keyword_index": previous.keyword_index.updated(keep_rows, fresh),
+                "bm25_index": previous.bm25_index.updated(keep_rows, fresh),
+                "windows": previous.windows.updated(keep_rows, fresh, [t["filename"] for t in transcriptions])}
+
+    def _dense_index(self, transcriptions, hashes: list = None):
+        """Dense vectors for a new corpus, embedding only new or changed transcripts
+
+        ``hashes`` (content hashes in corpus order, when known) let saved
+        vectors that already match be used without hashing every transcript.
+        """
+        previous = self.corpus.dense_index
+        if previous is None:
+            # Saved vectors (e.g. converted from faiss_index) are memory-mapped, not re-embedded
+            previous = DenseIndex.load(self.dense_folder)
+        if (hashes is not None and previous is not None and previous.hashes == hashes
+                and previous.filenames == [t["filename"] for t in transcriptions]):
+            return previous
+        try:
+            if previous is None:
+                dense_index = DenseIndex.build(transcriptions)
+            else:
+                dense_index = previous.updated(transcriptions)
+        except (OSError, ValueError) as e:
+            # Embedding server down: the other retrieval modes keep working
+            self.errors.append((self.dense_folder, str(e)))
+            return None
+
+        if dense_index is not previous:
+            try:
+                dense_index.save(self.dense_folder)
+            except OSError:
+                pass
+        return dense_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the transcript index incrementally")
+    parser.add_argument("--folder", default=TRANSCRIPTIONS_FOLDER)
+    parser.add_argument("--index-folder", default=INDEX_FOLDER)
+    parser.add_argument("--dense-folder", default=DENSE_FOLDER)
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="keep refreshing at this interval instead of exiting")
+    args = parser.parse_args()
+
+    updater = TranscriptUpdater(args.folder, args.index_folder, args.dense_folder)
+    while True:
+        start = time.perf_counter()
+        stats = updater.refresh()
+        elapsed = (time.perf_counter() - start) * 1000
+        for fn, error in updater.errors:
+            print(f"❌ Error loading {fn}: {error}")
+        print(f"✅ {len(updater.transcriptions)} transcripts | added {stats['added']}, "
+              f"updated {stats['updated']}, removed {stats['removed']} ({elapsed:.0f} ms)")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,35 @@
 import streamlit as st
 import time
 import os
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+from conversation import Conversation
+from engine import RETRIEVAL_MODES, VideoChatEngine, format_response
+from engine_api import EngineAPIError, EngineClient
+from llm_answer import ANSWER_MODES, DEFAULT_ANSWER_MODE
+from retrieval_pipeline import STRATEGIES
+from segment_store import format_timestamp
+from tracing import Metrics
 
-# Try to import web search
-try:
-    from ddgs import DDGS
-    WEB_SEARCH_AVAILABLE = True
-except ImportError:
-    WEB_SEARCH_AVAILABLE = False
-    st.warning("Web search not available. Install ddgs package for web search functionality.")
+# Start of this script run, for the "rerun" span
+RERUN_STARTED = time.perf_counter()
+
+# Retrieval and responses come from engine.py: in this process, or from a
+# running engine_api.py server when VIDEO_CHAT_ENGINE_URL is set. Videos come
+# from ./library/library.json, or the bundled ./transcriptions without one. Web search
+# backend: WEB_SEARCH_BACKEND "cached" (DuckDuckGo behind an on-disk cache),
+# "ddgs" or "fixture" (recorded results from WEB_SEARCH_FIXTURES, for offline runs).
+# Generated answers: LLM_BACKEND "ollama" (LLM_MODEL on a local Ollama server) or "stub"
+@st.cache_resource
+def get_engine():
+    """Process-wide engine, or a client of the engine server"""
+    url = os.environ.get("VIDEO_CHAT_ENGINE_URL")
+    if url:
+        return EngineClient(url)
+    return VideoChatEngine()
+
+@st.cache_resource
+def get_ui_metrics():
+    """Spans measured in the app process: reruns and drawing answers"""
+    return Metrics()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -111,218 +128,78 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- Initialize Session State ---
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Recent messages plus a bounded summary of older ones (see conversation.py)
+if "conversation" not in st.session_state:
+    st.session_state.conversation = Conversation()
 if "processing" not in st.session_state:
     st.session_state.processing = False
 if "transcriptions_loaded" not in st.session_state:
     st.session_state.transcriptions_loaded = False
-if "transcriptions_data" not in st.session_state:
-    st.session_state.transcriptions_data = []
+if "retrieval_mode" not in st.session_state:
+    st.session_state.retrieval_mode = "hybrid"
+if "video_start_time" not in st.session_state:
+    st.session_state.video_start_time = 0
+if "retrieval_strategy" not in st.session_state:
+    st.session_state.retrieval_strategy = "speculative"
+if "video_id" not in st.session_state:
+    st.session_state.video_id = None
+if "library_scope" not in st.session_state:
+    st.session_state.library_scope = False
+if "answer_mode" not in st.session_state:
+    st.session_state.answer_mode = DEFAULT_ANSWER_MODE
+if "debug" not in st.session_state:
+    st.session_state.debug = os.environ.get("VIDEO_CHAT_DEBUG") == "1"
 
-@st.cache_data
-def load_transcriptions():
-    """Load transcription files"""
-    transcriptions = []
-    folder = r"./transcriptions"
-    
-    if not os.path.exists(folder):
-        return []
-    
-    for fn in os.listdir(folder):
-        if fn.endswith(".txt"):
-            try:
-                with open(os.path.join(folder, fn), 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:
-                        transcriptions.append({
-                            "filename": fn,
-                            "content": content,
-                            "word_count": len(content.split())
-                        })
-            except Exception as e:
-                st.error(f"Error loading {fn}: {e}")
-                continue
-    
-    return transcriptions
+def play_from(seconds: float, video_id: str = None):
+    """Jump the video player to a timestamp, switching videos if needed"""
+    if video_id:
+        st.session_state.video_id = video_id
+    st.session_state.video_start_time = int(seconds)
 
-def smart_text_search(question: str, transcriptions: list, top_k: int = 3):
-    """Smart text search using TF-IDF similarity"""
-    if not transcriptions:
-        return []
-    
-    try:
-        # Prepare documents
-        documents = [t["content"] for t in transcriptions]
-        documents.append(question)  # Add question as last document
-        
-        # Create TF-IDF vectorizer
-        vectorizer = TfidfVectorizer(
-            max_features=1000,
-            stop_words=None,  # Keep Arabic stop words
-            ngram_range=(1, 2)  # Use unigrams and bigrams
-        )
-        
-        # Fit and transform
-        tfidf_matrix = vectorizer.fit_transform(documents)
-        
-        # Calculate similarity between question and each document
-        question_vector = tfidf_matrix[-1]  # Last document is the question
-        doc_vectors = tfidf_matrix[:-1]     # All except question
-        
-        similarities = cosine_similarity(question_vector, doc_vectors).flatten()
-        
-        # Get top results
-        top_indices = np.argsort(similarities)[::-1][:top_k]
-        
-        results = []
-        for idx in top_indices:
-            if similarities[idx] > 0.05:  # Minimum similarity threshold
-                results.append({
-                    "text": transcriptions[idx]["content"],
-                    "metadata": {"source": transcriptions[idx]["filename"]},
-                    "score": float(similarities[idx]),
-                    "word_count": transcriptions[idx]["word_count"]
-                })
-        
-        return results
-        
-    except Exception as e:
-        st.error(f"Error in smart text search: {e}")
-        # Fallback to simple keyword search
-        return simple_keyword_search(question, transcriptions, top_k)
-
-def simple_keyword_search(question: str, transcriptions: list, top_k: int = 3):
-    """Simple keyword-based search as fallback"""
-    if not transcriptions:
-        return []
-    
-    # Extract keywords from question
-    question_words = set(re.findall(r'\b\w+\b', question.lower()))
-    
-    results = []
-    for trans in transcriptions:
-        content_words = set(re.findall(r'\b\w+\b', trans["content"].lower()))
-        
-        # Calculate word overlap
-        overlap = len(question_words.intersection(content_words))
-        score = overlap / len(question_words) if question_words else 0
-        
-        if score > 0.1:  # Minimum threshold
-            results.append({
-                "text": trans["content"],
-                "metadata": {"source": trans["filename"]},
-                "score": score,
-                "word_count": trans["word_count"]
-            })
-    
-    # Sort by score and return top results
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+def select_video():
+    """Start a newly selected video from the beginning"""
+    st.session_state.video_start_time = 0
 
-def search_web(question: str, max_results: int = 3):
-    """Search web using DuckDuckGo"""
-    if not WEB_SEARCH_AVAILABLE:
-        return []
-    
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(question, max_results=max_results))
-        
-        web_results = []
-        for r in results:
-            if r.get("body") and r.get("href"):
-                web_results.append({
-                    "title": r.get("title", ""),
-                    "body": r.get("body", ""),
-                    "href": r.get("href", ""),
-                    "snippet": r.get("body", "")[:300] + "..." if len(r.get("body", "")) > 300 else r.get("body", "")
-                })
-        
-        return web_results
-        
-    except Exception as e:
-        st.error(f"Web search error: {e}")
-        return []
-
-def generate_response(question: str, video_results: list, web_results: list = None):
-    """Generate response based on search results"""
-    response_parts = []
-    
-    if video_results:
-        response_parts.append("بناءً على محتوى الفيديو:")
-        
-        for i, result in enumerate(video_results[:2], 1):
-            response_parts.append(f"\n📄 **من الملف {result['metadata']['source']}**")
+# --- Load transcriptions ---
+# One shared corpus per video and engine process, re-checked for changed files on every run
+try:
+    videos = {video["id"]: video for video in get_engine().videos()}
+    if st.session_state.video_id not in videos:
+        st.session_state.video_id = next(iter(videos))
+    current_video = videos[st.session_state.video_id]
+    
+    if not st.session_state.transcriptions_loaded:
+        with st.spinner("📁 Loading video transcriptions..."):
+            status = get_engine().status(current_video["id"])
+            st.session_state.transcriptions_loaded = True
             
-            # Extract relevant snippet
-            text = result['text']
-            if len(text) > 400:
-                # Try to find relevant portion
-                words = question.lower().split()
-                best_snippet = text[:400]
-                
-                for word in words:
-                    if word in text.lower():
-                        pos = text.lower().find(word)
-                        start = max(0, pos - 200)
-                        end = min(len(text), pos + 200)
-                        best_snippet = text[start:end]
-                        if start > 0:
-                            best_snippet = "..." + best_snippet
-                        if end < len(text):
-                            best_snippet = best_snippet + "..."
-                        break
-                
-                response_parts.append(f"{best_snippet}")
+            if status["files"]:
+                st.success(f"✅ Loaded {status['files']} transcription files ({status['total_words']:,} words total)")
             else:
-                response_parts.append(text)
-            
-            response_parts.append("")
-    
-    if web_results and not video_results:
-        response_parts.append("بناءً على البحث في الإنترنت:")
-        
-        for i, result in enumerate(web_results[:2], 1):
-            response_parts.append(f"\n🌐 **{result.get('title', 'مصدر ويب')}**")
-            response_parts.append(result['snippet'])
-            response_parts.append("")
-    
-    if not video_results and not web_results:
-        response_parts.append("عذراً، لم أجد معلومات متعلقة بسؤالك في محتوى الفيديو أو الإنترنت.")
-        response_parts.append("\n💡 نصائح للحصول على نتائج أفضل:")
-        response_parts.append("• استخدم كلمات مختلفة أو مرادفات")
-        response_parts.append("• اطرح أسئلة أكثر تحديداً")
-        response_parts.append("• جرب السؤال باللغة العربية إذا كان متعلقاً بالفيديو")
-    
-    full_text = "\n".join(response_parts)
-    
-    # Format with proper Arabic direction
-    formatted_text = f'<div class="arabic-text">{full_text}</div>'
-    return formatted_text
+                st.warning("⚠️ No transcription files found in ./transcriptions folder")
+    else:
+        status = get_engine().status(current_video["id"])
+except EngineAPIError as e:
+    st.error(f"❌ {e}")
+    st.stop()
 
-# --- Load transcriptions ---
-if not st.session_state.transcriptions_loaded:
-    with st.spinner("📁 Loading video transcriptions..."):
-        st.session_state.transcriptions_data = load_transcriptions()
-        st.session_state.transcriptions_loaded = True
-        
-        if st.session_state.transcriptions_data:
-            total_words = sum(t["word_count"] for t in st.session_state.transcriptions_data)
-            st.success(f"✅ Loaded {len(st.session_state.transcriptions_data)} transcription files ({total_words:,} words total)")
-        else:
-            st.warning("⚠️ No transcription files found in ./transcriptions folder")
+for fn, e in status["load_errors"]:
+    st.error(f"Error loading {fn}: {e}")
+
+WEB_SEARCH_AVAILABLE = status["web_search_available"]
+if not WEB_SEARCH_AVAILABLE:
+    st.warning("Web search not available. Install ddgs package for web search functionality.")
 
 # --- Main App ---
 # Header
 st.markdown('<h1 class="main-header">🎥 Video Chat Assistant</h1>', unsafe_allow_html=True)
 
 # Success message
-if st.session_state.transcriptions_data:
+if status["files"]:
     st.markdown(f"""
     <div class="success-box">
         <strong>✅ App is ready!</strong><br>
-        📁 Loaded {len(st.session_state.transcriptions_data)} transcription files<br>
+        📁 Loaded {status['files']} transcription files<br>
         🌐 Web search {'✅ available' if WEB_SEARCH_AVAILABLE else '❌ not available'}
     </div>
     """, unsafe_allow_html=True)
@@ -331,22 +208,109 @@ if st.session_state.transcriptions_data:
 with st.sidebar:
     st.markdown('<div class="sidebar-info">', unsafe_allow_html=True)
     st.markdown("### 📊 System Status")
-    st.write(f"💬 Total messages: {len(st.session_state.messages)}")
-    st.write(f"📁 Video files: {len(st.session_state.transcriptions_data)} loaded")
+    st.write(f"💬 Total messages: {len(st.session_state.conversation)}")
+    st.write(f"📁 Video files: {status['files']} loaded")
     st.write(f"🌐 Web search: {'✅ Available' if WEB_SEARCH_AVAILABLE else '❌ Not available'}")
+    try:
+        engine_stats = get_engine().stats()
+    except EngineAPIError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    library_stats = engine_stats["library"]
+    st.write(f"📚 Library: {library_stats['videos']} videos, {library_stats['loaded']} loaded")
+    st.caption(f"Shards {library_stats['loaded_mb']:.1f} / {library_stats['budget_mb']:.0f} MB · "
+               f"loads {library_stats['loads']} · evictions {library_stats['evictions']}")
+    cache_stats = engine_stats["query_cache"]
+    st.write(f"🗃️ Query cache: {cache_stats['entries']} entries, {cache_stats['hit_rate']:.0%} hit rate")
+    st.caption(f"Hits {cache_stats['hits']} · misses {cache_stats['misses']} · "
+               f"evictions {cache_stats['evictions']} · expired {cache_stats['expirations']} · "
+               f"invalidated {cache_stats['invalidations']}")
+    for web_stats in engine_stats["web_backends"]:
+        if web_stats["count"]:
+            st.caption(f"🌐 {web_stats['name']}: {web_stats['count']} searches · "
+                       f"p50 ≤{web_stats['p50_ms']:g} ms · p95 ≤{web_stats['p95_ms']:g} ms · "
+                       f"timeouts {web_stats['timeouts']} · errors {web_stats['errors']}")
+    pipeline_stats = engine_stats["pipeline"]
+    if pipeline_stats["total"]["count"]:
+        st.caption(f"⚡ Answer retrieval: p50 {pipeline_stats['total']['p50_ms']:.0f} ms · "
+                   f"p95 {pipeline_stats['total']['p95_ms']:.0f} ms · "
+                   f"speculative web searches {pipeline_stats['speculated']} "
+                   f"({pipeline_stats['discarded']} discarded) · "
+                   f"deadline hits {pipeline_stats['deadline_hits']}")
+    llm_stats = engine_stats["llm"]
+    if llm_stats["batches"]:
+        st.caption(f"🤖 {llm_stats['backend']}: queue {llm_stats['queue_depth']} (max {llm_stats['max_queue_depth']}) · "
+                   f"wait p95 ≤{llm_stats['wait']['p95_ms']:g} ms · "
+                   f"generation p50 ≤{llm_stats['generate']['p50_ms']:g} ms · "
+                   f"{llm_stats['batches']} batches of {llm_stats['mean_batch']:.1f} · "
+                   f"cache hits {llm_stats['cache']['hits']} · rejected {llm_stats['rejected']}")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Video being watched; questions go to its transcripts
+    st.selectbox(
+        "🎬 Video",
+        options=list(videos),
+        format_func=lambda video_id: videos[video_id]["title"],
+        key="video_id",
+        on_change=select_video
+    )
+    st.checkbox("📚 Search all videos", key="library_scope")
+    st.checkbox("🐞 Debug timings", key="debug")
+    # Per-stage latencies: the engine's stages and, measured here, drawing the page
+    if st.session_state.debug:
+        with st.expander("🐞 Pipeline metrics", expanded=True):
+            tracing = engine_stats["tracing"]
+            spans = dict(tracing["spans"], **get_ui_metrics().snapshot()["spans"])
+            for name, span in spans.items():
+                st.caption(f"{name}: {span['count']} · p50 ≤{span['p50_ms']:g} ms · p95 ≤{span['p95_ms']:g} ms")
+            answers = tracing["answers"]
+            if sum(answers.values()):
+                st.caption(f"Answers from video {answers['video']} · web {answers['web']} · none {answers['none']} "
+                           f"· fallback rate {(answers['web'] + answers['none']) / sum(answers.values()):.0%}")
+            for name, count in tracing["counters"].items():
+                if name.startswith("errors_total"):
+                    st.caption(f"❌ {name}: {count}")
+            profiler = engine_stats["profiler"]
+            if profiler:
+                st.caption(f"🔬 Profiled {profiler['profiled']} answers, {profiler['slow']} over "
+                           f"{profiler['threshold_ms']:g} ms · last: {profiler['last_profile'] or '-'}")
+    
+    # Retrieval mode for video transcriptions
+    st.selectbox(
+        "🔎 Retrieval mode",
+        options=list(RETRIEVAL_MODES),
+        format_func=lambda mode: RETRIEVAL_MODES[mode][0],
+        key="retrieval_mode"
+    )
+    
+    # When the web fallback starts
+    st.selectbox(
+        "🌐 Web fallback",
+        options=list(STRATEGIES),
+        format_func=STRATEGIES.get,
+        key="retrieval_strategy"
+    )
+    
+    # Snippets as they are, or an answer the local LLM writes from them
+    st.selectbox(
+        "🤖 Answer",
+        options=list(ANSWER_MODES),
+        format_func=ANSWER_MODES.get,
+        key="answer_mode"
+    )
+    
     # Clear chat button
     if st.button("🗑️ Clear Chat", use_container_width=True):
-        st.session_state.messages = []
+        st.session_state.conversation = Conversation()
         st.success("Chat cleared!")
         st.rerun()
     
     # Test search button
     if st.button("🔍 Test Search", use_container_width=True):
-        if st.session_state.transcriptions_data:
+        if status["files"]:
             test_query = "المناعة في النبات"
-            results = smart_text_search(test_query, st.session_state.transcriptions_data, top_k=2)
+            results = get_engine().search(test_query, st.session_state.retrieval_mode, top_k=2,
+                                          video_id=current_video["id"])
             st.write(f"Test query: '{test_query}'")
             st.write(f"Found {len(results)} results")
             for i, r in enumerate(results):
@@ -354,6 +318,11 @@ with st.sidebar:
         else:
             st.error("No transcriptions loaded")
     
+    # Re-scan the transcriptions folder now
+    if st.button("🔄 Refresh Transcripts", use_container_width=True):
+        stats = get_engine().refresh(current_video["id"])
+        st.write(f"Added {stats['added']}, updated {stats['updated']}, removed {stats['removed']} files")
+    
     # Instructions
     st.markdown("### 📝 How to use")
     st.markdown("""
@@ -379,18 +348,29 @@ with col1:
     
     # Video container
     st.markdown('<div class="video-container">', unsafe_allow_html=True)
-    st.video("https://youtu.be/4oaHltuDrL8")
+    st.video(current_video["url"], start_time=st.session_state.video_start_time)
     st.markdown('</div>', unsafe_allow_html=True)
     
-    st.markdown("**Video:** Plant Immunity Education")
+    st.markdown(f"**Video:** {current_video['title']}")
+
+    # What is being said where the player starts (the segment at that second and its neighbours)
+    segments = get_engine().transcript_at(st.session_state.video_start_time, current_video["id"])
+    if segments:
+        with st.expander(f"📜 Transcript at {format_timestamp(st.session_state.video_start_time)}"):
+            for segment in segments:
+                stamp = format_timestamp(segment["start_sec"])
+                if segment["current"]:
+                    st.markdown(f'**{stamp}** <div class="arabic-text">{segment["content"]}</div>',
+                                unsafe_allow_html=True)
+                else:
+                    st.caption(f"{stamp}  {segment['content']}")
     
     # Video information
     with st.expander("📋 About this video"):
-        if st.session_state.transcriptions_data:
-            total_words = sum(t["word_count"] for t in st.session_state.transcriptions_data)
+        if status["files"]:
             st.write(f"""
-            This educational video has been transcribed into {len(st.session_state.transcriptions_data)} text files 
-            containing {total_words:,} words total. The app can search through this content to answer your questions
+            This educational video has been transcribed into {status['files']} text files 
+            containing {status['total_words']:,} words total. The app can search through this content to answer your questions
             about plant immunity and related topics discussed in the video.
             
             **Content includes:** Plant immunity mechanisms, biochemical defense systems, and educational explanations in Arabic.
@@ -405,8 +385,15 @@ with col2:
     chat_container = st.container()
     
     with chat_container:
-        # Display chat messages
-        for message in st.session_state.messages:
+        conversation = st.session_state.conversation
+        # Older messages survive only as one-line summaries
+        if conversation.summary:
+            with st.expander(f"🗂️ Earlier in this chat ({conversation.condensed} messages condensed)"):
+                for line in conversation.summary:
+                    st.caption(line)
+        
+        # Display the recent messages
+        for message in conversation.messages:
             with st.chat_message(message["role"]):
                 # Show source indicator for assistant messages
                 if message["role"] == "assistant" and "source" in message:
@@ -421,88 +408,119 @@ with col2:
                                   unsafe_allow_html=True)
                 
                 st.markdown(message["content"], unsafe_allow_html=True)
+                if "query" in message:
+                    st.caption(f"🔁 Searched as: {message['query']}")
+                
+                # Time to first rendered part vs the whole answer
+                if st.session_state.debug and "timings" in message:
+                    timings = message["timings"]
+                    caption = (f"⏱ first part {timings['first_part_ms']:.0f} ms · "
+                               f"complete {timings['total_ms']:.0f} ms · "
+                               f"retrieval {timings.get('retrieval_ms', 0):.0f} ms")
+                    if "llm_generate_ms" in timings:
+                        caption += (f" · LLM queue {timings['llm_wait_ms']:.0f} ms · "
+                                    f"generation {timings['llm_generate_ms']:.0f} ms")
+                    st.caption(caption)
+                    if "spans" in timings:
+                        st.caption("🧭 " + " · ".join(f"{name} {ms:.1f} ms" for name, ms in timings["spans"].items()))
                 
                 # Show sources if available
                 if message["role"] == "assistant" and "sources" in message and message["sources"]:
                     with st.expander("📚 Sources & Details", expanded=False):
                         if message.get("source") == "video" or message.get("source") == "simple":
                             for i, source in enumerate(message["sources"], 1):
-                                st.write(f"**File:** {source.get('metadata', {}).get('source', 'Unknown')}")
+                                metadata = source.get('metadata', {})
+                                if "video_title" in metadata:
+                                    st.write(f"**Video:** {metadata['video_title']}")
+                                st.write(f"**File:** {metadata.get('source', 'Unknown')}")
                                 st.write(f"**Words:** {source.get('word_count', 'Unknown')}")
+                                if "start_sec" in metadata:
+                                    st.button(
+                                        f"▶️ Play from {format_timestamp(metadata['start_sec'])}",
+                                        key=f"play_{message['n']}_{i}",
+                                        on_click=play_from,
+                                        args=(metadata["start_sec"], metadata.get("video_id"))
+                                    )
                                 if i < len(message["sources"]):
                                     st.divider()
                         else:  # web sources
                             for i, result in enumerate(message["sources"], 1):
                                 st.markdown(f"**{i}.** [{result.get('title', 'Web Source')}]({result.get('href', '#')})")
 
+    get_ui_metrics().observe_span("rerun", (time.perf_counter() - RERUN_STARTED) * 1000)
+
     # Chat input
     if not st.session_state.processing:
         if prompt := st.chat_input("Ask about the video content or any topic..."):
             st.session_state.processing = True
             
-            # Add user message
-            st.session_state.messages.append({"role": "user", "content": prompt})
+            # Follow-ups ("why?", "اشرحها أكثر") are searched with the previous question's topic
+            query = conversation.standalone_question(prompt)
+            conversation.add_user(prompt, query)
             
             with chat_container:
                 with st.chat_message("user"):
                     st.markdown(prompt)
+                    if query != prompt:
+                        st.caption(f"🔁 Searched as: {query}")
 
-            # Generate response
-            with st.spinner("🔍 Searching..."):
-                # Search video transcriptions first
-                video_results = []
-                if st.session_state.transcriptions_data:
-                    video_results = smart_text_search(prompt, st.session_state.transcriptions_data, top_k=3)
-                
-                # Search web if no good video results
-                web_results = []
-                if not video_results and WEB_SEARCH_AVAILABLE:
-                    with st.spinner("🌐 Searching the web..."):
-                        web_results = search_web(prompt, max_results=3)
-                
-                # Generate response
-                assistant_response = generate_response(prompt, video_results, web_results)
-                
-                # Determine source and prepare data
-                if video_results:
-                    source = "video"
-                    sources = video_results
-                    status_msg = '<div class="arabic-text">✅ **من محتوى الفيديو**</div>'
-                    full_response = f"{assistant_response}\n\n{status_msg}"
-                elif web_results:
-                    source = "web"
-                    sources = web_results
-                    status_msg = '<div class="arabic-text">🌐 **من البحث على الإنترنت**</div>'
-                    full_response = f"{assistant_response}\n\n{status_msg}"
-                else:
-                    source = "none"
-                    sources = []
-                    full_response = assistant_response
-
-            # Display response with typing effect
+            # Stream the response: each part is shown as soon as the engine yields it
             with chat_container:
                 with st.chat_message("assistant"):
                     message_placeholder = st.empty()
+                    started = time.perf_counter()
+                    first_part_ms = None
+                    render_ms = 0.0
+                    streamed = ""
                     
-                    # For HTML content, display directly without typing effect
-                    if '<div class="arabic-text">' in full_response:
-                        message_placeholder.markdown(full_response, unsafe_allow_html=True)
-                    else:
-                        # Typing effect for plain text
-                        displayed_response = ""
-                        for chunk in full_response.split():
-                            displayed_response += chunk + " "
-                            time.sleep(0.03)
-                            message_placeholder.markdown(displayed_response + "▌")
-                        message_placeholder.markdown(full_response)
+                    with st.spinner("🔍 Searching..."):
+                        # Video transcriptions, with the web as fallback when nothing matches
+                        try:
+                            for event in get_engine().answer_stream(
+                                    query, st.session_state.retrieval_mode, st.session_state.retrieval_strategy,
+                                    current_video["id"], "library" if st.session_state.library_scope else "video",
+                                    st.session_state.answer_mode):
+                                if "part" in event:
+                                    if first_part_ms is None:
+                                        first_part_ms = (time.perf_counter() - started) * 1000
+                                    streamed += event["part"]
+                                    render_start = time.perf_counter()
+                                    message_placeholder.markdown(format_response(streamed + "▌"), unsafe_allow_html=True)
+                                    render_ms += (time.perf_counter() - render_start) * 1000
+                                else:
+                                    answer = event["done"]
+                        except EngineAPIError as e:
+                            answer = {"content": f"❌ {e}", "source": "none", "sources": [], "errors": [],
+                                      "warnings": [], "timings": {}}
+                    
+                    full_response = answer["content"]
+                    render_start = time.perf_counter()
+                    message_placeholder.markdown(full_response, unsafe_allow_html=True)
+                    render_ms += (time.perf_counter() - render_start) * 1000
+                    get_ui_metrics().observe_span("render", render_ms)
+                    total_ms = (time.perf_counter() - started) * 1000
+            
+            for error in answer["errors"]:
+                st.error(error)
+            for warning in answer["warnings"]:
+                st.warning(warning)
+
+            timings = {
+                "first_part_ms": first_part_ms if first_part_ms is not None else total_ms,
+                "total_ms": total_ms,
+                "retrieval_ms": answer["timings"].get("total", 0),
+            }
+            if "llm_generate" in answer["timings"]:
+                timings["llm_wait_ms"] = answer["timings"]["llm_wait"]
+                timings["llm_generate_ms"] = answer["timings"]["llm_generate"]
+            if "trace" in answer:
+                spans = {}
+                for span in answer["trace"]["spans"]:
+                    spans[span["name"]] = spans.get(span["name"], 0.0) + span["ms"]
+                timings["spans"] = dict(spans, render=render_ms)
 
-            # Save message to session state
-            st.session_state.messages.append({
-                "role": "assistant", 
-                "content": full_response,
-                "source": source,
-                "sources": sources
-            })
+            # Save the answer; its sources are kept as references, without their text
+            conversation.add_assistant(full_response, answer["source"], answer["sources"], timings)
             
             st.session_state.processing = False
             st.rerun()
@@ -0,0 +1,256 @@
+"""Library of videos, each with its own transcript folder and index shard.
+
+    library/
+        library.json            {"videos": [{"id", "title", "url"}, ...]}
+        <id>/transcriptions/    that video's transcript segments
+        <id>/tfidf_index/       its TF-IDF index and manifest (written on first load)
+        <id>/dense_index/       its dense vectors
+
+A shard (one TranscriptUpdater and its Corpus) is loaded the first time its
+video is searched and kept in least-recently-used order.  When the estimated
+size of the loaded shards passes the memory budget, the least recently used
+ones are dropped; their indexes stay on disk, so loading one again reads the
+saved TF-IDF index and maps the dense vectors instead of re-indexing.  A
+library-wide search does not evict: shards it loads beyond the budget serve
+that one search and are dropped again, so a scan over hundreds of videos
+leaves the shards of the videos being watched in memory.
+Without library/library.json the library is the single bundled video in
+./transcriptions.
+
+    python video_library.py list
+    python video_library.py add VIDEO_ID URL --title "..." --from FOLDER
+    python video_library.py build
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from dense_index import DENSE_FOLDER
+from transcript_index import INDEX_FOLDER
+from transcript_manifest import TRANSCRIPTIONS_FOLDER, TranscriptUpdater
+
+LIBRARY_FOLDER = r"./library"
+LIBRARY_FILE = "library.json"
+MEMORY_BUDGET_MB = 512
+FANOUT_WORKERS = 4
+# The video the app shipped with, served from the flat ./transcriptions layout
+DEFAULT_VIDEO = {"id": "plant-immunity", "title": "Plant Immunity Education", "url": "https://youtu.be/4oaHltuDrL8"}
+
+
+def load_library(root: str = LIBRARY_FOLDER):
+    """Videos listed in root/library.json, or None without one"""
+    path = os.path.join(root, LIBRARY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        videos = json.load(f)["videos"]
+    ids = [v["id"] for v in videos]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate video ids in {path}")
+    return videos
+
+
+def save_library(root: str, videos: list):
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, LIBRARY_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"videos": videos}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(root, LIBRARY_FILE))
+
+
+def _nbytes(obj) -> int:
+    """Array bytes held directly by an index object (numpy and scipy.sparse attributes)"""
+    total = 0
+    for value in getattr(obj, "__dict__", {}).values():
+        if isinstance(value, np.ndarray):
+            # Memory-mapped vectors count too: their pages become resident as they are searched
+            total += value.nbytes
+        elif hasattr(value, "indptr"):
+            total += value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    return total
+
+
+def corpus_nbytes(corpus) -> int:
+    """Rough resident size of a Corpus: transcript text plus index arrays
+
+    Vocabulary dicts are not counted, so this underestimates small shards;
+    it is meant for comparing shards against a budget, not for exact sizes.
+    """
+    total = sum(sys.getsizeof(t["content"]) for t in corpus)
+    for index in (corpus.index, corpus.keyword_index, corpus.bm25_index, corpus.segments, corpus.dense_index):
+        total += _nbytes(index)
+    if corpus.windows is not None:
+        total += _nbytes(corpus.windows) + _nbytes(corpus.windows.bm25)
+        total += sum(sys.getsizeof(text) for text in corpus.windows.texts)
+    return total
+
+
+class VideoLibrary:
+    """Video catalogue plus its lazily loaded, budget-bounded index shards"""
+
+    def __init__(self, root: str = LIBRARY_FOLDER, memory_budget_mb: float = MEMORY_BUDGET_MB,
+                 max_workers: int = FANOUT_WORKERS):
+        self.root = root
+        self.memory_budget = int(memory_budget_mb * 2 ** 20)
+        videos = load_library(root)
+        self.flat = videos is None
+        self.videos = OrderedDict((v["id"], v) for v in (videos if videos is not None else [DEFAULT_VIDEO]))
+        self._shards = OrderedDict()  # video id -> TranscriptUpdater, least recently used first
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="library")
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def default_video_id(self) -> str:
+        return next(iter(self.videos))
+
+    def video(self, video_id: str) -> dict:
+        if video_id not in self.videos:
+            raise ValueError(f"Unknown video: {video_id}")
+        return self.videos[video_id]
+
+    def folders(self, video_id: str) -> tuple:
+        """(transcriptions, TF-IDF index, dense index) folders of one video"""
+        if self.flat:
+            return TRANSCRIPTIONS_FOLDER, INDEX_FOLDER, DENSE_FOLDER
+        shard = os.path.join(self.root, video_id)
+        return (os.path.join(shard, "transcriptions"), os.path.join(shard, "tfidf_index"),
+                os.path.join(shard, "dense_index"))
+
+    def updater(self, video_id: str) -> TranscriptUpdater:
+        """The video's shard; a new one is empty until its first refresh"""
+        self.video(video_id)
+        with self._lock:
+            updater = self._shards.get(video_id)
+            if updater is None:
+                updater = TranscriptUpdater(*self.folders(video_id))
+                self._shards[video_id] = updater
+                self.loads += 1
+            else:
+                self._shards.move_to_end(video_id)
+            return updater
+
+    def corpus(self, video_id: str, max_age: float, force_refresh: bool = False, evict: bool = True):
+        """(corpus, refresh counts or None) of one video, loading its shard if needed
+
+        With ``evict=False`` a shard that does not fit the budget is dropped
+        again right away instead of pushing out the least recently used ones.
+        """
+        updater = self.updater(video_id)
+        stats = updater.refresh() if force_refresh else updater.refresh_if_stale(max_age)
+        if stats is not None:
+            self._account(video_id, updater, evict)
+        return updater.corpus, stats
+
+    def _account(self, video_id: str, updater: TranscriptUpdater, evict: bool = True):
+        """Record a shard's size and evict least recently used shards over the budget"""
+        size = corpus_nbytes(updater.corpus)
+        with self._lock:
+            if self._shards.get(video_id) is not updater:
+                return
+            self._sizes[video_id] = size
+            if not evict and len(self._shards) > 1 and sum(self._sizes.values()) > self.memory_budget:
+                del self._shards[video_id]
+                del self._sizes[video_id]
+                self.evictions += 1
+                return
+            while len(self._shards) > 1 and sum(self._sizes.values()) > self.memory_budget:
+                oldest = next(iter(self._shards))
+                if oldest == video_id:
+                    break
+                # Queries still holding its Corpus keep it alive until they finish
+                del self._shards[oldest]
+                self._sizes.pop(oldest, None)
+                self.evictions += 1
+
+    def map(self, fn, video_ids=None) -> list:
+        """fn(video_id) for every video (or ``video_ids``) in parallel, in library order"""
+        video_ids = list(self.videos if video_ids is None else video_ids)
+        if len(video_ids) == 1:
+            return [fn(video_ids[0])]
+        return list(self._pool.map(fn, video_ids))
+
+    def loaded_corpus(self, video_id: str):
+        """Corpus of a shard that is in memory, or None; never loads or evicts one"""
+        with self._lock:
+            updater = self._shards.get(video_id)
+        return updater.corpus if updater is not None else None
+
+    def loaded(self) -> list:
+        """Ids of the shards in memory, least recently used first"""
+        with self._lock:
+            return list(self._shards)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "videos": len(self.videos),
+                "loaded": len(self._shards),
+                "loaded_mb": sum(self._sizes.values()) / 2 ** 20,
+                "budget_mb": self.memory_budget / 2 ** 20,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+def add_video(root: str, video_id: str, url: str, title: str = None, source: str = None):
+    """Register a video in root/library.json, copying its transcripts from ``source``"""
+    videos = load_library(root) or []
+    if any(v["id"] == video_id for v in videos):
+        raise ValueError(f"Video {video_id} is already in the library")
+    if os.sep in video_id or "/" in video_id or video_id in ("", ".", ".."):
+        raise ValueError(f"Invalid video id: {video_id!r}")
+    folder = os.path.join(root, video_id, "transcriptions")
+    if source:
+        shutil.copytree(source, folder)
+    else:
+        os.makedirs(folder, exist_ok=True)
+    videos.append({"id": video_id, "title": title or video_id, "url": url})
+    save_library(root, videos)
+    return folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the multi-video library")
+    parser.add_argument("--root", default=LIBRARY_FOLDER)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="list the videos and their transcript counts")
+    add = commands.add_parser("add", help="add a video and copy its transcripts")
+    add.add_argument("video_id")
+    add.add_argument("url")
+    add.add_argument("--title")
+    add.add_argument("--from", dest="source", help="folder of transcript .txt files")
+    commands.add_parser("build", help="build or refresh every video's index shard")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        folder = add_video(args.root, args.video_id, args.url, args.title, args.source)
+        print(f"✅ Added {args.video_id}; transcripts in {folder}")
+        return
+
+    library = VideoLibrary(args.root)
+    for video_id, video in library.videos.items():
+        folder = library.folders(video_id)[0]
+        if args.command == "list":
+            count = len([fn for fn in os.listdir(folder) if fn.endswith(".txt")]) if os.path.isdir(folder) else 0
+            print(f"{video_id:>20}  {count:>5} files  {video['url']}  {video['title']}")
+        else:
+            updater = TranscriptUpdater(*library.folders(video_id))
+            stats = updater.refresh()
+            for fn, error in updater.errors:
+                print(f"❌ Error loading {fn}: {error}")
+            print(f"✅ {video_id}: {len(updater.transcriptions)} transcripts | added {stats['added']}, "
+                  f"updated {stats['updated']}, removed {stats['removed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Reranking of web results against the question.
+
+The question and every result body are embedded in one batched call (only
+texts missing from the embedding cache are sent) and scored with a single
+matrix-vector product.  Embeddings are cached by text hash, so results that
+come back for a repeated or similar question are not embedded again.
+Without an embedder -- or when it fails -- results are ranked lexically by
+the share of the question's normalized words they contain.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from arabic_text import tokenize
+
+DEFAULT_CACHE_ENTRIES = 4096
+
+
+def text_key(embedder_name: str, text: str) -> str:
+    """Cache key of one text's embedding"""
+    return hashlib.sha1(f"{embedder_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Bounded LRU map from text hash to embedding vector"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def embed(self, embedder, texts: list) -> np.ndarray:
+        """Embeddings of ``texts``, calling the embedder once for the uncached ones"""
+        keys = [text_key(embedder.name, text) for text in texts]
+        vectors = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._vectors.get(key)
+                if vector is not None:
+                    self._vectors.move_to_end(key)
+                    vectors[i] = vector
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Duplicate texts in one batch are embedded once
+            pending = {keys[i]: texts[i] for i in missing}
+            embedded = dict(zip(pending, embedder.embed(list(pending.values()))))
+            with self._lock:
+                for key, vector in embedded.items():
+                    self._vectors[key] = vector
+                    self._vectors.move_to_end(key)
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+            for i in missing:
+                vectors[i] = embedded[keys[i]]
+        return np.vstack(vectors)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+def lexical_scores(question: str, texts: list) -> np.ndarray:
+    """Share of the question's normalized words that occur in each text"""
+    question_words = set(tokenize(question))
+    if not question_words:
+        return np.zeros(len(texts))
+    return np.array([len(question_words.intersection(tokenize(text))) / len(question_words)
+                     for text in texts])
+
+
+class WebReranker:
+    """Orders web results by similarity to the question"""
+
+    def __init__(self, cache: EmbeddingCache = None):
+        self.cache = EmbeddingCache() if cache is None else cache
+        self.errors = 0
+
+    def scores(self, question: str, results: list, embedder=None) -> np.ndarray:
+        """Similarity of every result (title + body) to the question"""
+        texts = [f"{r.get('title', '')}\n{r.get('body', '')}" for r in results]
+        if embedder is not None:
+            try:
+                vectors = self.cache.embed(embedder, [question] + texts)
+                # Rows are L2-normalized, so one product gives every cosine
+                return vectors[1:] @ vectors[0]
+            except (OSError, ValueError):
+                # Embedding server unavailable: rank lexically instead
+                self.errors += 1
+        return lexical_scores(question, texts)
+
+    def rerank(self, question: str, results: list, embedder=None, top_n: int = None) -> list:
+        """Results sorted by similarity (stable on ties), each with a ``score``"""
+        if not results:
+            return []
+        scores = self.scores(question, results, embedder)
+        order = np.argsort(-scores, kind="stable")[:top_n]
+        return [dict(results[i], score=float(scores[i])) for i in order]
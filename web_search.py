@@ -0,0 +1,332 @@
+"""Pluggable web-search backends for the transcript-miss fallback.
+
+Every backend shares the same interface: ``search(question, max_results)``
+returns cleaned result dicts (title, body, href, snippet), enforces a
+timeout and a limit on concurrent calls, and records its latencies in a
+histogram.  Three implementations:
+
+- DDGSBackend: live DuckDuckGo search (the app's original behaviour)
+- SQLiteCacheBackend: persistent on-disk cache in front of another backend
+- FixtureBackend: serves recorded results from a JSON file, for offline
+  tests and deterministic load tests
+
+    python web_search.py export cache.sqlite3 fixtures.json   # record fixtures from the cache
+"""
+import bisect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from query_cache import normalize_query
+
+DEFAULT_TIMEOUT = 8.0
+DEFAULT_MAX_CONCURRENCY = 4
+CACHE_PATH = r"./web_cache.sqlite3"
+CACHE_TTL = 7 * 24 * 60 * 60
+FIXTURES_PATH = r"./benchmarks/web_fixtures.json"
+SNIPPET_CHARS = 300
+
+
+class WebSearchError(Exception):
+    """A web search failed; the message is safe to show to the user"""
+
+
+class WebSearchTimeout(WebSearchError):
+    """The backend did not answer (or free a slot) within its timeout"""
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed millisecond buckets"""
+
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)  # last bucket is +Inf
+        self.total_ms = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, ms: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS_MS, ms)] += 1
+            self.total_ms += ms
+            self.count += 1
+
+    def percentile(self, p: float):
+        """Upper bound of the bucket holding the p-th percentile (None if empty)"""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(self.BUCKETS_MS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "buckets": dict(zip([str(b) for b in self.BUCKETS_MS] + ["+Inf"], self.counts)),
+        }
+
+
+def clean_results(raw_results: list) -> list:
+    """Keep results with a body and link, adding a short snippet"""
+    web_results = []
+    for r in raw_results:
+        if r.get("body") and r.get("href"):
+            body = r.get("body", "")
+            web_results.append({
+                "title": r.get("title", ""),
+                "body": body,
+                "href": r.get("href", ""),
+                "snippet": body[:SNIPPET_CHARS] + "..." if len(body) > SNIPPET_CHARS else body
+            })
+    return web_results
+
+
+class WebSearchBackend:
+    """Base class: timeout, concurrency limit and latency histogram
+
+    Subclasses implement ``_search(question, max_results)`` returning raw
+    result dicts with title/body/href.
+    """
+
+    name = "base"
+    available = True
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.timeouts = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"web-{self.name}")
+
+    def search(self, question: str, max_results: int = 3) -> list:
+        """Cleaned results, or WebSearchError/WebSearchTimeout"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            raise WebSearchTimeout(f"{self.name}: too many searches in progress")
+
+        try:
+            future = self._pool.submit(self._search, question, max_results)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the call really finishes, even after we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            remaining = max(0.0, self.timeout - (time.perf_counter() - start))
+            raw_results = future.result(timeout=remaining)
+        except FutureTimeout:
+            self.timeouts += 1
+            raise WebSearchTimeout(f"{self.name}: no answer within {self.timeout:.0f}s") from None
+        except WebSearchError:
+            self.errors += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            raise WebSearchError(f"{self.name}: {e}") from e
+        finally:
+            self.latency.observe((time.perf_counter() - start) * 1000)
+
+        return clean_results(raw_results)
+
+    def _search(self, question: str, max_results: int) -> list:
+        raise NotImplementedError
+
+    def backends(self) -> list:
+        """This backend and any it wraps, outermost first"""
+        return [self]
+
+    def stats(self) -> dict:
+        return dict(self.latency.snapshot(), errors=self.errors, timeouts=self.timeouts)
+
+
+class DDGSBackend(WebSearchBackend):
+    """Live DuckDuckGo text search"""
+
+    name = "ddgs"
+
+    def __init__(self, **kwargs):
+        try:
+            from ddgs import DDGS
+        except ImportError:
+            try:
+                from duckduckgo_search import DDGS
+            except ImportError:
+                DDGS = None
+        self._ddgs_class = DDGS
+        self.available = DDGS is not None
+        super().__init__(**kwargs)
+
+    def _search(self, question: str, max_results: int) -> list:
+        if self._ddgs_class is None:
+            raise WebSearchError("ddgs package is not installed")
+        with self._ddgs_class(timeout=int(self.timeout)) as ddgs:
+            return list(ddgs.text(question, max_results=max_results))
+
+
+class SQLiteCacheBackend(WebSearchBackend):
+    """Persistent cache of another backend's results, keyed by normalized question
+
+    The database is opened on the first search.  When it cannot be read or
+    written (e.g. a read-only deployment), searches go to the inner backend
+    uncached instead of failing.
+    """
+
+    name = "sqlite-cache"
+
+    def __init__(self, inner: WebSearchBackend, path: str = CACHE_PATH, ttl: float = CACHE_TTL, **kwargs):
+        self.inner = inner
+        self.path = path
+        self.ttl = ttl
+        self.available = inner.available
+        self.hits = 0
+        self.misses = 0
+        self._table_ready = False
+        kwargs.setdefault("timeout", inner.timeout)
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads
+        db = sqlite3.connect(self.path, timeout=self.timeout)
+        if not self._table_ready:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS web_results ("
+                " query TEXT NOT NULL, max_results INTEGER NOT NULL,"
+                " results TEXT NOT NULL, stored_at REAL NOT NULL,"
+                " PRIMARY KEY (query, max_results))"
+            )
+            self._table_ready = True
+        return db
+
+    def search(self, question: str, max_results: int = 3) -> list:
+        """Cached results, else the inner backend's (which applies its own limits)
+
+        Lookups are local and fast, so they skip the concurrency limit and
+        never wait behind slow misses.
+        """
+        start = time.perf_counter()
+        try:
+            try:
+                results = self._lookup(question, max_results)
+            except sqlite3.Error:
+                # Unusable cache file: search without it, like a read-only TF-IDF index folder
+                self.errors += 1
+                results = None
+            if results is not None:
+                self.hits += 1
+                return results
+
+            self.misses += 1
+            results = self.inner.search(question, max_results)
+            if results:
+                try:
+                    self._store(question, max_results, results)
+                except sqlite3.Error:
+                    self.errors += 1
+            return results
+        finally:
+            self.latency.observe((time.perf_counter() - start) * 1000)
+
+    def _lookup(self, question: str, max_results: int):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT results, stored_at FROM web_results WHERE query = ? AND max_results = ?",
+                (normalize_query(question), max_results)
+            ).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def _store(self, question: str, max_results: int, results: list):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO web_results VALUES (?, ?, ?, ?)",
+                (normalize_query(question), max_results, json.dumps(results, ensure_ascii=False), time.time())
+            )
+
+    def export_fixtures(self, fixtures_path: str):
+        """Write every cached answer to a fixture file for FixtureBackend"""
+        with self._connect() as db:
+            rows = db.execute("SELECT query, results FROM web_results ORDER BY query").fetchall()
+        fixtures = {query: json.loads(results) for query, results in rows}
+        with open(fixtures_path, "w", encoding="utf-8") as f:
+            json.dump(fixtures, f, ensure_ascii=False, indent=2)
+        return len(fixtures)
+
+    def backends(self) -> list:
+        return [self] + self.inner.backends()
+
+    def stats(self) -> dict:
+        return dict(super().stats(), hits=self.hits, misses=self.misses)
+
+
+class FixtureBackend(WebSearchBackend):
+    """Recorded results served from a JSON file: {normalized question: [results]}
+
+    ``latency`` adds an artificial delay (seconds) so load tests can mimic a
+    real search engine without the network.
+    """
+
+    name = "fixture"
+
+    def __init__(self, path: str = FIXTURES_PATH, latency: float = 0.0, **kwargs):
+        self.path = path
+        self.delay = latency
+        self.fixtures = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.fixtures = {normalize_query(q): results for q, results in json.load(f).items()}
+        super().__init__(**kwargs)
+
+    def _search(self, question: str, max_results: int) -> list:
+        if self.delay:
+            time.sleep(self.delay)
+        return self.fixtures.get(normalize_query(question), [])[:max_results]
+
+
+def create_backend(kind: str = "cached", **kwargs) -> WebSearchBackend:
+    """Backend by name: "ddgs", "cached" (DuckDuckGo behind the SQLite cache) or "fixture"
+
+    Keyword arguments go to the backend constructor (path=, latency=,
+    timeout=, max_concurrency=).
+    """
+    if kind == "ddgs":
+        return DDGSBackend(**kwargs)
+    if kind == "fixture":
+        return FixtureBackend(**kwargs)
+    if kind == "cached":
+        path = kwargs.pop("path", CACHE_PATH)
+        return SQLiteCacheBackend(DDGSBackend(**kwargs), path=path)
+    raise ValueError(f"Unknown web search backend: {kind}")
+
+
+def backend_from_env() -> WebSearchBackend:
+    """Backend named by WEB_SEARCH_BACKEND (default "cached"); fixtures from WEB_SEARCH_FIXTURES"""
+    kind = os.environ.get("WEB_SEARCH_BACKEND", "cached")
+    if kind == "fixture":
+        return create_backend(kind, path=os.environ.get("WEB_SEARCH_FIXTURES", FIXTURES_PATH))
+    return create_backend(kind)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "export":
+        print("usage: python web_search.py export CACHE.sqlite3 FIXTURES.json")
+        sys.exit(2)
+    count = SQLiteCacheBackend(DDGSBackend(), path=sys.argv[2]).export_fixtures(sys.argv[3])
+    print(f"✅ Wrote {count} recorded searches to {sys.argv[3]}")